@@ -0,0 +1,154 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file is the benchmark script, it measures the scan and export speed on a synthetic library
+# * the library is generated by utils_generator (or reused if it already exists)
+# * every phase is timed separately :
+#   walk : the folder tree walk with utils_file.walk_tree, without reading the tags
+#   tag : the tag reads of all the audio files, one at a time
+#   build : build_collection, walk and tag reads and the bigtree nodes
+#   aggregate : the first computation of the aggregates of the collection (node_classes.AggregateNode)
+#   write : write_collection, the ".col" file written by utils_writer
+# the results are printed as JSON on the standard output (the debug prints go to the error output)
+# so the runs of two commits can be compared
+# example : python benchmark.py --library /tmp/library --depth 4 --fan-out 10 --files 10 --output before.json
+##################################################################
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import main_functions
+import utils_file
+import utils_format
+import utils_generator
+import utils_tag
+
+# the phases, in the run order
+PHASES = ("walk", "tag", "build", "aggregate", "write")
+
+# private method git_commit
+# Returns the current git commit of the sources, or None outside of a git clone
+def __git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# private method walk
+# Walks the library like build_collection, without reading the tags
+# returns : (folder count, audio file paths)
+def __walk(sLibraryPath :str):
+    iFolders = 0
+    paths = []
+
+    def enterFolder(parent, entry):
+        nonlocal iFolders
+        iFolders += 1
+        return parent
+
+    for parent, entry in utils_file.walk_tree(sLibraryPath, True, enterFolder):
+        if utils_format.format_of(entry.name):
+            paths.append(entry.path)
+    return iFolders, paths
+
+# function run_benchmark
+# Runs the phases on the library and returns the results
+# param sLibraryPath : the library root folder
+# param phases : the phases to run, among PHASES (aggregate and write need build)
+# param fastTags : True to read the tags with utils_tag.read_tags_fast
+# param workers : the tag reads in flight of build_collection
+# returns : a dict {"phases": {phase: {"seconds": s, "filesPerSecond": n}}, "files": n, "folders": n}
+def run_benchmark(sLibraryPath :str, phases=PHASES, fastTags :bool = False, workers :int = 0):
+    results = {}
+    timer = time.perf_counter
+
+    start = timer()
+    iFolders, paths = __walk(sLibraryPath)
+    walkSeconds = timer() - start
+    if "walk" in phases:
+        results["walk"] = walkSeconds
+
+    if "tag" in phases:
+        readTags = utils_tag.read_tags_fast if fastTags else utils_tag.read_tags
+        start = timer()
+        for sPath in paths:
+            readTags(sPath)
+        results["tag"] = timer() - start
+
+    collection = None
+    if "build" in phases or "aggregate" in phases or "write" in phases:
+        start = timer()
+        collection = main_functions.build_collection(sLibraryPath, None, workers, fastTags=fastTags)
+        results["build"] = timer() - start
+
+        if "aggregate" in phases:
+            start = timer()
+            collection.aggregates()
+            results["aggregate"] = timer() - start
+
+        if "write" in phases:
+            with tempfile.TemporaryDirectory() as sTempPath:
+                start = timer()
+                main_functions.write_collection(collection, os.path.join(sTempPath, "benchmark.col"), False)
+                results["write"] = timer() - start
+
+    return {"files": len(paths), "folders": iFolders,
+            "phases": {phase: {"seconds": round(seconds, 6),
+                               "filesPerSecond": round(len(paths) / seconds, 1) if seconds > 0 else None}
+                       for phase, seconds in results.items()}}
+
+# end def run_benchmark
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of the scan and export phases on a synthetic library")
+    parser.add_argument("--library", required=True, help="the library folder, generated if it does not exist")
+    parser.add_argument("--depth", type=int, default=3, help="the folder levels, the root is the level 1")
+    parser.add_argument("--fan-out", type=int, default=10, help="the sub folders of every folder")
+    parser.add_argument("--files", type=int, default=10, help="the audio files of every folder")
+    parser.add_argument("--artists", type=int, default=100, help="the amount of distinct artists")
+    parser.add_argument("--albums", type=int, default=1000, help="the amount of distinct albums")
+    parser.add_argument("--genres", type=int, default=20, help="the amount of distinct genres")
+    parser.add_argument("--years", type=int, default=50, help="the amount of distinct years")
+    parser.add_argument("--flac-ratio", type=float, default=0.5, help="the part of the files written as flac")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--phases", default=",".join(PHASES), help="the phases to run, among " + ", ".join(PHASES))
+    parser.add_argument("--fast-tags", action="store_true", help="read the tags with utils_tag.read_tags_fast")
+    parser.add_argument("--workers", type=int, default=0, help="the tag reads in flight of build_collection")
+    parser.add_argument("--output", help="also write the JSON results in this file")
+    args = parser.parse_args()
+
+    phases = [phase.strip() for phase in args.phases.split(",") if phase.strip()]
+    for phase in phases:
+        if phase not in PHASES:
+            parser.error("unknown phase " + phase)
+
+    parameters = {"depth": args.depth, "fanOut": args.fan_out, "files": args.files, "artists": args.artists,
+                  "albums": args.albums, "genres": args.genres, "years": args.years, "flacRatio": args.flac_ratio,
+                  "seed": args.seed}
+    report = {"commit": __git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+              "library": dict(parameters, path=args.library), "fastTags": args.fast_tags, "workers": args.workers}
+
+    # the debug prints of main_functions would break the JSON of the standard output
+    with contextlib.redirect_stdout(sys.stderr):
+        if not os.path.exists(args.library):
+            print("[benchmark] generating " + str(utils_generator.library_size(args.depth, args.fan_out, args.files)[1])
+                  + " files in [" + args.library + "]")
+            start = time.perf_counter()
+            report["library"]["generated"] = utils_generator.generate_library(args.library, **parameters)
+            report["library"]["generated"]["seconds"] = round(time.perf_counter() - start, 6)
+        report.update(run_benchmark(args.library, phases, args.fast_tags, args.workers))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            outputFile.write(text + "\n")
+
+# end main
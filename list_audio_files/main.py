@@ -1,39 +1,138 @@
-##################################################################
-# How to write a audio file (mp3, flac) collection in a export file?
-# Let's export the audio files list having tags (in a base path) in a export file...
-#
-# The structure of folders and files is loaded in a CollectionNode
-# a CollectionNode is a kind of tree using bigtree
-# bigtree is a python library, see https://github.com/kayjan/bigtree
-# a Collection Node contains one or many VolumeNode
-# a VolumeNode is a folder under the root (1st level)
-# a VolumeNode contains folders handled as FolderNode and audio files handled as FileNode
-# a FolderNode contains folders and files
-# the audio files as FileNode have tags retrieved with TinyTag
-# TinyTag is a audio file tag python library, see https://github.com/tinytag/tinytag
-#
-# 14/01/2025 : the collection is written in a col file following the MAC standards
-# MAC Mpeg Audio Collection is a audio file collection manager, see https://mac.sourceforge.net/
-##################################################################
-
-import main_functions
-import node_classes
-
-if __name__ == '__main__':
-    print("[main][debug] begin")
-
-    # TODO change the base path of the audio files collection
-    basePath = "G:/00 collection/00 best of"
-    # TODO change the path of the file to write in
-    colFilePath = "G:/00 collection/20250111.col"
-
-    collectionNode :node_classes.CollectionNode = main_functions.build_collection(basePath)
-
-    print("[main][debug] build_collection done : collection " + collectionNode.name + " has " + str(collectionNode.fileCount) + " files")
-
-    main_functions.write_collection(collectionNode, colFilePath, False)
-    print("[debug][main] end")
-
-
-
-# end main
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+# Let's export the audio files list having tags (in a base path) in a export file...
+#
+# The structure of folders and files is loaded in a CollectionNode
+# a CollectionNode is a kind of tree using bigtree
+# bigtree is a python library, see https://github.com/kayjan/bigtree
+# a Collection Node contains one or many VolumeNode
+# a VolumeNode is a folder under the root (1st level)
+# a VolumeNode contains folders handled as FolderNode and audio files handled as FileNode
+# a FolderNode contains folders and files
+# the audio files as FileNode have tags retrieved with TinyTag
+# TinyTag is a audio file tag python library, see https://github.com/tinytag/tinytag
+#
+# 14/01/2025 : the collection is written in a col file following the MAC standards
+# MAC Mpeg Audio Collection is a audio file collection manager, see https://mac.sourceforge.net/
+##################################################################
+
+import argparse
+import main_functions
+import node_classes
+import pipeline_functions
+import utils_cache
+import utils_errors
+import utils_filter
+import utils_reader
+import utils_snapshot
+import utils_state
+import utils_stats
+import utils_watch
+
+if __name__ == '__main__':
+    print("[main][debug] begin")
+
+    # TODO change the base path of the audio files collection
+    # or give a list of paths, every path is a volume and the disks are scanned concurrently
+    basePath = "G:/00 collection/00 best of"
+    # TODO change the path of the file to write in, replaced once written
+    # a ".col.gz", ".col.bz2" or ".col.xz" path is compressed (see utils_compress), utils_reader reads it as it is
+    colFilePath = "G:/00 collection/20250111.col"
+    # TODO change the path of the tag cache, the tags of the unchanged files are not read again
+    tagCachePath = "G:/00 collection/tags.sqlite"
+    # TODO change the amount of tag reads in flight (0 reads the tags one at a time, 16-64 on network storage)
+    tagWorkers = 0
+    # TODO fast mode : only the tag regions are read, the duration of some VBR mp3 is estimated
+    fastTags = False
+    # TODO pipeline mode : the walk, the tag reads (tagWorkers in flight, at least 1) and the tree assembly overlap
+    pipeline = False
+    # TODO streaming mode : the col file is written during the scan, without keeping the tree in memory
+    streaming = False
+    # TODO compact mode : the files are stored in the columns of table_classes instead of one bigtree Node each
+    compact = False
+    # TODO incremental mode : the previous col file is updated, only the changed folders are scanned again
+    # the folder modification times are recorded in the state file, next to the col files
+    previousColFilePath = None
+    folderStatePath = "G:/00 collection/folders.json"
+    # TODO watch mode : the collection is kept in memory and the col file rewritten a few seconds after every change
+    watch = False
+    # TODO snapshot : the scanned collection is also saved in a binary snapshot, reloaded with utils_snapshot.load_snapshot
+    # without scanning again (None to skip)
+    snapshotPath = None
+    # TODO tolerant mode : a failing file (30 s timeout, 1 retry) or a special entry is recorded in the error report
+    # instead of aborting the scan, the failing files are skipped
+    tolerant = False
+    errorReportPath = "G:/00 collection/errors.json"
+    # TODO lazy mode : the structure is built from the directory and stat information only,
+    # the tags are read in batch (tagWorkers in flight, at least 1) before writing
+    lazyTags = False
+    # TODO filters : the rules evaluated during the walk, the excluded folders are not listed (None to scan everything)
+    # see utils_filter.ScanFilter, example : utils_filter.ScanFilter(exclude=utils_filter.SYSTEM_EXCLUDES, skipHidden=True)
+    # the command line options (--exclude, --skip-system, --max-depth... see utils_filter.add_arguments) replace it
+    scanFilter = None
+    # TODO profiling : the cProfile and tracemalloc reports are printed at the end of the scan and of the writing
+    profile = False
+
+    parser = argparse.ArgumentParser(description="Writes the audio file collection of the base path in a col file")
+    utils_filter.add_arguments(parser)
+    args = parser.parse_args()
+    scanFilter = utils_filter.from_arguments(args) or scanFilter
+
+    # the progress of the scan is printed every second, the phase times and counters at the end of the scan
+    # and of the writing, the ETA expects the file count of the last col file
+    expectedFiles = utils_reader.read_file_count(colFilePath if previousColFilePath is None else previousColFilePath)
+    stats = utils_stats.ScanStats(utils_stats.print_progress, expectedFiles, profile=profile, traceMemory=profile)
+
+    tagCache = utils_cache.TagCache(tagCachePath)
+    if watch:
+        watcher = utils_watch.CollectionWatcher(basePath, colFilePath, tagCache, folderStatePath=folderStatePath,
+                                                scanFilter=scanFilter)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            watcher.close()
+        tagCache.close()
+    elif streaming:
+        main_functions.stream_collection(basePath, colFilePath, tagCache, scanFilter=scanFilter)
+        tagCache.close()
+    else:
+        folderState = utils_state.FolderState.load(folderStatePath)
+        if compact:
+            collectionNode = main_functions.build_table_collection(basePath, tagCache, scanFilter)
+        elif pipeline:
+            collectionNode = pipeline_functions.pipeline_collection(basePath, None, tagCache, max(tagWorkers, 1),
+                                                                    fastTags=fastTags, stats=stats, scanFilter=scanFilter,
+                                                                    folderState=folderState)
+        elif previousColFilePath is not None:
+            previousCollection = utils_reader.read_collection(previousColFilePath)
+            collectionNode = main_functions.rescan_collection(basePath, previousCollection, folderState, tagCache,
+                                                              scanFilter)
+        else:
+            errors = utils_errors.ScanErrors(workers=max(tagWorkers, 1)) if tolerant else None
+            collectionNode :node_classes.CollectionNode = main_functions.build_collection(basePath, tagCache, tagWorkers,
+                                                                                           folderState=folderState,
+                                                                                           fastTags=fastTags, stats=stats,
+                                                                                           errors=errors,
+                                                                                           lazyTags=lazyTags,
+                                                                                           scanFilter=scanFilter)
+            if lazyTags:
+                # the tag cache is closed below, the tags are read before
+                main_functions.load_tags(collectionNode, max(tagWorkers, 1))
+            if errors is not None:
+                errors.save(errorReportPath)
+                errors.close()
+        tagCache.close()
+
+        print("[main][debug] build_collection done : collection " + collectionNode.name + " has " + str(collectionNode.fileCount) + " files")
+
+        main_functions.write_collection(collectionNode, colFilePath, False, stats=stats)
+        if snapshotPath is not None:
+            utils_snapshot.save_snapshot(collectionNode, snapshotPath)
+        # the folder state matches the written col file, it is the previous state of the next incremental run
+        if not compact:
+            folderState.save(folderStatePath)
+    print("[debug][main] end")
+
+
+
+# end main
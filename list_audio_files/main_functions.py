@@ -1,182 +1,748 @@
-##################################################################
-# How to write a audio file (mp3, flac) collection in a export file?
-#
-# This file gathers the main functions called by the main script
-# * buildCollection(collectionPath)
-# * write_collection(collection, colFilePath, test)
-# and some other private methods dedicated
-# to build the complete collection (__build_volume, __build_folder)
-# and to write (__write_volume, __write_folder, __write_file)
-##################################################################
-
-import utils_file
-import utils_writer
-import os
-import node_classes
-from tinytag import TinyTag
-
-# private method build_folder
-# Adds the folders (as FolderNode) and files (as FileNode) in sPath to the parent folderNode
-# param sPath : the volume path
-# param folderNode : the FolderNode to process
-def __build_folder(sPath, folderNode ):
-    #print("[debug][build_folder] beginning in sPath=" + sPath)
-
-    # let's find the relative path of sPath, example "dir_c" if sPath = "G:/dir_a/dir_b/dir_c"
-    rPath = utils_file.relativePath(sPath)
-
-    childrenList = os.listdir(sPath)
-
-    #print("[debug][build_folder] adding the childs in sPath : " + sPath + ", len=" + str(len(childrenList)))
-    for i in childrenList:
-
-        iPath = os.path.join(sPath, i)
-
-        if os.path.isfile(iPath):
-            # TODO : only flac and mp3 are handled
-            if i.endswith(".flac") or i.endswith(".mp3"):
-                #print("[debug][build_folder] adding fileNode : " + i)
-                # loading the audio tags with TinyTag
-                tag = TinyTag.get(iPath)
-                fileNode = node_classes.FileNode(i, tag.filesize, tag.duration, tag.samplerate, tag.title, tag.artist, tag.album, tag.track, tag.year, tag.comment, tag.genre, tag.bitdepth, tag.channels, parent=folderNode)
-                #build_file(fileNode, iPath)
-        elif os.path.isdir(iPath):
-            #print("[debug][build_folder] adding folder [" + i +"]")
-            subFolderNode = node_classes.FolderNode(i, parent=folderNode)
-            __build_folder(iPath, subFolderNode)
-        else:
-            # unexpected case, then raise an exception
-            print("[ERROR][build_folder] Unexpected item in [" + i + "]")
-            raise Exception("[ERROR][build_folder] Unexpected item in [" + i + "]")
-
-
-# private method build_volume
-# Builds the volume in sPath as a VolumeNode and add it to collectionNode
-# a VolumeNode is like a FolderNode but at the 1st level (under the root)
-# param sPath : the volume path
-# param collectionNode : the processed CollectionNode parent of the VolumeNode
-def __build_volume(sPath :str, collectionNode):
-    #print("[debug][build_volume] beginning in sPath=" + sPath)
-
-    # let's find the relative path of sPath, example "dir_c" if sPath = "G:/dir_a/dir_b/dir_c"
-    rPath = utils_file.relativePath(sPath)
-
-    # at first level under collectionNode only volumes
-    volumeNode = node_classes.VolumeNode(rPath, parent=collectionNode)
-    #print("[debug][build_volume] creating volumeNode [" + rPath + "]")
-
-    childrenList = os.listdir(sPath)
-
-    #print("[debug][build_volume] adding the childs in sPath : " + sPath + ", len=" + str(len(childrenList)))
-    for i in childrenList:
-        iPath = os.path.join(sPath, i)
-        if os.path.isfile(iPath):
-            # TODO : only flac and mp3 are handled
-            if i.endswith(".flac") or i.endswith(".mp3"):
-                #print("[debug][build_volume] adding fileNode : " + i )
-                tag = TinyTag.get(iPath)
-                fileNode = node_classes.FileNode(i, tag.filesize, tag.duration, tag.samplerate, tag.title, tag.artist, tag.album, tag.track, tag.year, tag.comment, tag.genre, tag.bitdepth, tag.channels, parent=volumeNode)
-        elif os.path.isdir(iPath):
-            #print("[debug][build_volume] adding folderNode [" + i +"]")
-            folderNode = node_classes.FolderNode(i, parent=volumeNode)
-            __build_folder(iPath, folderNode)
-        else:
-            # unexpected case, then raise an exception
-            print("[ERROR][build_volume] Unexpected item in [" + i + "]")
-            raise Exception("[ERROR][build_volume] Unexpected item in [" + i + "]")
-
-
-# function build_collection
-# Builds a audio file collection in a CollectionNode processed with Volume nodes, Folder nodes and File nodes
-# param sBasePath : the root folder path
-# returns : a processed CollectionNode
-def build_collection(sBasePath :str):
-    print("[debug][build_collection] beginning in [" + sBasePath + "]")
-    # let's create a new CollectionNode
-    collection = node_classes.CollectionNode("AudioCollection")
-    # and we add the volumes
-    __build_volume(sBasePath, collection)
-    print("[debug][build_collection] returns collection [" + collection.name + "]")
-    return collection
-
-# end def build_collection(sBasePath)
-
-# private method write_file
-# Writes audio file as a FileNode in a colFile ".col" file
-# param fileNode : the fileNode to write
-# param colFile : the col file to write in, as a stream
-def __write_file(fileNode: node_classes.FileNode, colFile):
-    utils_writer.write_file_line(colFile, fileNode)
-# end def write_file
-
-# private method write_folder
-# Writes folder as a FolderNode in a colFile ".col" file
-# param folderNode : the folderNode to write
-# param colFile : the col file to write in, as a stream
-def __write_folder(folderNode: node_classes.FolderNode, colFile):
-    #write the folder in colFile
-    utils_writer.write_folder_line(colFile, folderNode)
-    # itemList contains Folders and files
-    itemList = folderNode.children
-    # for every folder childs
-    for i in itemList :
-        if isinstance(i, node_classes.FolderNode):
-            # write the folderNode in colFile
-            __write_folder(i, colFile)
-        elif isinstance(i, node_classes.FileNode):
-            # write the fileNode in colFile
-            __write_file(i, colFile)
-        else:
-            print("[ERROR][write_collection] unknow [" + i.name + "]")
-            raise Exception("[ERROR][write_collection] unknow [" + i.name + "]")
-
-#end def write_folder
-
-# private method write_volume
-# Writes volume as a VolumeNode in a colFile ".col" file
-# param volumeNode : the volumeNode to write
-# param colFile : the col file to write in, as a stream
-def __write_volume(volumeNode: node_classes.VolumeNode, colFile):
-    # write the volume in colFile
-    utils_writer.write_volume_line(colFile, volumeNode)
-    # itemList contains Folders and files
-    itemList = volumeNode.children
-    # for every volume childs
-    for i in itemList :
-        if isinstance(i, node_classes.FolderNode):
-            #write the folderNode in colFile
-            __write_folder(i, colFile)
-        elif isinstance(i, node_classes.FileNode):
-            # write the fileNode in colFile
-            __write_file(i, colFile)
-        else:
-            print("[ERROR][write_collection] unknow [" + i.name + "]")
-            raise Exception("[ERROR][write_collection] unknow [" + i.name + "]")
-
-# end def write_volume(sBasePath)
-
-# function write_collection
-# Writes a audio file collection as a CollectionNode in a ".col" file whose path is sColFilePath
-# param collectionNode : the collectionNode to write
-# param sColFilePath : the col file path to write in
-# param test : if test mode, we only display the collection structure
-# see https://bigtree.readthedocs.io/en/stable/gettingstarted/demo/tree/
-def write_collection(collectionNode : node_classes.CollectionNode, sColFilePath :str, test :bool):
-
-    if test:
-        # if test mode, we only display the collection structure
-        collectionNode.show()
-    else:
-        # we open the file for writing
-        colFile = open(sColFilePath, "x")
-        # we write the collection line in the colFile
-        utils_writer.write_collection_line(colFile, collectionNode)
-        volumeList = collectionNode.children
-        #print("[debug][write_collection] writing the volume children, len = [" + str(len(volumeList)))
-        for v in volumeList :
-            __write_volume(v, colFile)
-
-        # we close the file
-        colFile.close()
-
-# end def write_collection
\ No newline at end of file
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the main functions called by the main script
+# * buildCollection(collectionPath(s), tagCache, workers, useProcesses, folderState, ..., scanFilter)
+# * write_collection(collection, colFilePath, test)
+# * rescan_collection(basePath, collection, folderState, tagCache, scanFilter), updating only the changed folders
+# * update_folder(path, folderNode, folderState, tagCache, changedNames, scanFilter), updating one folder (see utils_watch)
+# * build_table_collection(basePath, tagCache), building the compact model of table_classes
+# * stream_collection(basePath, colFilePath, tagCache), scanning and writing without building the tree
+# * read_file_tags(entry, tagCache, fastTags, stats), the tags of one audio file, from the cache or read
+# * load_tags(node, workers), reading in batch the tags of the LazyFileNodes of a tree built with lazyTags
+# and some other private methods dedicated
+# to build the complete collection (__build_volume, __build_folder, __build_file)
+# the collection is written in one walk of utils_visit.walk_collection
+##################################################################
+
+import utils_file
+import utils_filter
+import utils_format
+import utils_writer
+import utils_visit
+import utils_tag
+import utils_cache
+import utils_errors
+import utils_state
+import utils_stats
+import os
+import time
+import concurrent.futures
+import functools
+import shutil
+import struct
+import tempfile
+import node_classes
+import table_classes
+
+# private method build_file
+# Adds the audio file in entry as a FileNode to the parent node
+# the tags are taken from tagCache when the file did not change, else they are read with TinyTag
+# param entry : the os.DirEntry of the audio file
+# param parentNode : the FolderNode or VolumeNode parent of the FileNode
+# param tagCache : the TagCache to use, or None
+# param fastTags : True to read the tags with utils_tag.read_tags_fast
+# param stats : the utils_stats.ScanStats to update, or None
+# param errors : the utils_errors.ScanErrors of the tolerant mode, or None
+# returns : the FileNode, None if the file failed and is skipped (tolerant mode)
+def __build_file(entry, parentNode, tagCache, fastTags=False, stats=None, errors=None):
+    tags = read_file_tags(entry, tagCache, fastTags, stats, errors)
+    if tags is None:
+        return None
+    return node_classes.FileNode(entry.name, *tags, parent=parentNode)
+
+# function read_file_tags
+# Reads the tags of the audio file in entry, from tagCache when the file did not change, else with TinyTag
+# param entry : the os.DirEntry of the audio file
+# param tagCache : the TagCache to use, or None
+# param fastTags : True to read the tags with utils_tag.read_tags_fast, the cached estimated durations are then kept
+# param stats : the utils_stats.ScanStats to update (tag time, stat calls, cache hits, tag errors), or None
+# param errors : the utils_errors.ScanErrors of the tolerant mode, or None to raise the tag errors
+# returns : the tags tuple (see utils_tag.read_tags), in tolerant mode the partial tags of a failing file
+#           (they are not cached) or None if it is skipped
+def read_file_tags(entry, tagCache, fastTags=False, stats=None, errors=None):
+    readTags = utils_tag.read_tags_fast if fastTags else utils_tag.read_tags
+    st = None
+    if tagCache is not None:
+        # the stat information of the DirEntry is reused
+        try:
+            st = entry.stat()
+        except OSError as error:
+            if errors is None:
+                raise
+            # a file removed or unreadable since the listing fails like a tag read
+            tags, failed = errors.failed(entry.path, error, 1)
+            return tags
+        tags = tagCache.get(entry.path, st, not fastTags)
+        if stats is not None:
+            stats.count("statCalls")
+            stats.count("cacheMisses" if tags is None else "cacheHits")
+        if tags is not None:
+            return tags
+    start = time.perf_counter()
+    failed = False
+    try:
+        if errors is None:
+            tags = readTags(entry.path)
+        else:
+            tags, failed = errors.read_tags(readTags, entry.path, st)
+    except Exception:
+        if stats is not None:
+            stats.count("tagErrors")
+        raise
+    finally:
+        if stats is not None:
+            stats.add_time("tag", time.perf_counter() - start)
+    if tagCache is not None and not failed:
+        tagCache.put(entry.path, st, tags)
+    return tags
+
+# private method read_path_tags
+# The loader of the LazyFileNodes : reads the tags of the audio file in sPath, from tagCache when the file did not change
+# param tagCache : the TagCache to use, or None
+# param fastTags : True to read the tags with utils_tag.read_tags_fast
+# param sPath : the audio file path
+# returns : the tags tuple (see utils_tag.read_tags)
+def __read_path_tags(tagCache, fastTags, sPath :str):
+    st = None
+    if tagCache is not None:
+        st = os.stat(sPath)
+        tags = tagCache.get(sPath, st, not fastTags)
+        if tags is not None:
+            return tags
+    tags = utils_tag.read_tags_fast(sPath) if fastTags else utils_tag.read_tags(sPath)
+    if tagCache is not None:
+        tagCache.put(sPath, st, tags)
+    return tags
+
+# function load_tags
+# Reads the tags of the LazyFileNodes under node which are not loaded yet, workers at once
+# a LazyFileNode reads its own tags on the first access, this reads them in batch instead (before writing, for example)
+# param node : the CollectionNode, or any node of the tree
+# param workers : the amount of tag reads in flight
+# returns : the amount of files loaded
+def load_tags(node, workers :int = 8):
+    lazyNodes = []
+    # bigtree descendants is recursive, a deep tree is walked with a stack
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, node_classes.LazyFileNode):
+            if not current.loaded:
+                lazyNodes.append(current)
+        else:
+            stack.extend(current.children)
+    if lazyNodes:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            # every node is loaded once, by one thread
+            for _ in executor.map(node_classes.LazyFileNode.load, lazyNodes):
+                pass
+    if isinstance(node, node_classes.CollectionNode):
+        # every file of the collection is loaded, write_collection does not walk it again
+        node.lazyTags = False
+    if not lazyNodes:
+        return 0
+    print("[debug][load_tags] " + str(len(lazyNodes)) + " files loaded")
+    return len(lazyNodes)
+
+# end def load_tags
+
+# private method build_folder
+# Adds the folders (as FolderNode) and files (as FileNode) under sPath to the parent folderNode
+# the whole tree under sPath is walked with utils_file.walk_tree (no recursion)
+# param sPath : the folder path
+# param folderNode : the FolderNode (or VolumeNode) to process
+# param tagCache : the TagCache to use, or None
+# param tagPool : the utils_tag.TagPool reading the tags, or None to read them inline
+# param folderState : the utils_state.FolderState recording the folder modification times, or None
+# param fastTags : True to read the tags with utils_tag.read_tags_fast (without tagPool, else see TagPool)
+# param stats : the utils_stats.ScanStats to update, or None
+#               the walk time is the time of the walk without the inline tag reads
+# param errors : the utils_errors.ScanErrors of the tolerant mode, or None to raise at the first bad file or entry
+# param loader : the loader of the LazyFileNodes (see __read_path_tags), or None to read the tags during the walk
+# param scanFilter : the utils_filter.ScanFilter of the walk, its relative paths are from sPath, or None
+def __build_folder(sPath, folderNode, tagCache=None, tagPool=None, folderState=None, fastTags=False, stats=None,
+                   errors=None, loader=None, scanFilter=None):
+    #print("[debug][build_folder] beginning in sPath=" + sPath)
+    start = time.perf_counter()
+    # the seconds spent in the inline tag reads, they are not part of the walk
+    tagSeconds = 0.0
+
+    if tagPool is None:
+        # the parents given by the walker are the FolderNodes
+        rootParent = folderNode
+        enterFolder = lambda parentNode, entry: node_classes.FolderNode(entry.name, parent=parentNode)
+        leaveFolder = None
+    else:
+        # with a tag pool, the parents given by the walker are the layouts of the TagPool
+        # and the children are attached once their tags are read
+        def enterFolder(layout, entry):
+            subFolderNode = node_classes.FolderNode(entry.name)
+            tagPool.add_folder(layout, subFolderNode)
+            return tagPool.new_layout(subFolderNode)
+        rootParent = tagPool.new_layout(folderNode)
+        leaveFolder = tagPool.close_layout
+
+    if folderState is not None:
+        # the modification time of every sub folder is recorded before the sub folder is listed
+        def recordFolder(parent, entry, enterFolder=enterFolder):
+            folderState.record(entry.path, entry.stat().st_mtime_ns)
+            if stats is not None:
+                stats.count("statCalls")
+            return enterFolder(parent, entry)
+        enterFolder = recordFolder
+
+    if stats is not None:
+        def countFolder(parent, entry, enterFolder=enterFolder):
+            stats.count("directories")
+            return enterFolder(parent, entry)
+        enterFolder = countFolder
+
+    onError = None if errors is None else errors.folder
+    for parent, entry in utils_file.walk_tree(sPath, rootParent, enterFolder, leaveFolder, onError, scanFilter):
+        if entry.is_file():
+            # the audio files of the formats of utils_format
+            if utils_format.format_of(entry.name):
+                #print("[debug][build_folder] adding fileNode : " + entry.name)
+                # loading the audio tags with TinyTag (or from the cache)
+                if loader is not None:
+                    # the size of the stat only, the tags are read on the first access
+                    node_classes.LazyFileNode(entry.name, entry.stat().st_size, entry.path, loader, parent=parent)
+                elif tagPool is None:
+                    tagStart = time.perf_counter()
+                    __build_file(entry, parent, tagCache, fastTags, stats, errors)
+                    tagSeconds += time.perf_counter() - tagStart
+                else:
+                    tagPool.add_file(parent, entry)
+                if stats is not None:
+                    stats.count("files")
+        elif errors is not None:
+            # a broken symlink, a socket, a FIFO... is recorded and skipped
+            errors.special(entry)
+        else:
+            # unexpected case, then raise an exception
+            print("[ERROR][build_folder] Unexpected item in [" + entry.path + "]")
+            raise Exception("[ERROR][build_folder] Unexpected item in [" + entry.path + "]")
+
+    if stats is not None:
+        stats.add_time("walk", time.perf_counter() - start - tagSeconds)
+
+# private method build_volume
+# Builds the volume in sPath as a VolumeNode and add it to collectionNode
+# a VolumeNode is like a FolderNode but at the 1st level (under the root)
+# param sPath : the volume path
+# param collectionNode : the processed CollectionNode parent of the VolumeNode, or None to build it without parent
+# param tagCache : the TagCache to use, or None
+# param tagPool : the utils_tag.TagPool reading the tags, or None to read them inline
+# param folderState : the utils_state.FolderState recording the folder modification times, or None
+# param rPath : the volume name, the relative path of sPath if None
+# param fastTags : True to read the tags with utils_tag.read_tags_fast
+# param stats : the utils_stats.ScanStats to update, or None
+# param errors : the utils_errors.ScanErrors of the tolerant mode, or None
+# param loader : the loader of the LazyFileNodes, or None
+# param scanFilter : the utils_filter.ScanFilter of the walk, or None
+# returns : the VolumeNode
+def __build_volume(sPath :str, collectionNode, tagCache=None, tagPool=None, folderState=None, rPath=None, fastTags=False,
+                   stats=None, errors=None, loader=None, scanFilter=None):
+    #print("[debug][build_volume] beginning in sPath=" + sPath)
+
+    if rPath is None:
+        # let's find the relative path of sPath, example "dir_c" if sPath = "G:/dir_a/dir_b/dir_c"
+        rPath = utils_file.relativePath(sPath)
+
+    # at first level under collectionNode only volumes
+    volumeNode = node_classes.VolumeNode(rPath, parent=collectionNode)
+    #print("[debug][build_volume] creating volumeNode [" + rPath + "]")
+
+    if folderState is not None:
+        folderState.record(sPath, os.stat(sPath).st_mtime_ns)
+        if stats is not None:
+            stats.count("statCalls")
+    if stats is not None:
+        stats.count("directories")
+    # the volume content is built like a folder content
+    __build_folder(sPath, volumeNode, tagCache, tagPool, folderState, fastTags, stats, errors, loader, scanFilter)
+    return volumeNode
+
+# function volume_names
+# Returns the names of the volumes of the roots : the relative path of the root,
+# or the whole path if it is empty (a drive root like "G:/") or if another root has the same relative path
+# param basePaths : the root folder paths
+def volume_names(basePaths):
+    names = [utils_file.relativePath(sPath) for sPath in basePaths]
+    return [name if name and names.count(name) == 1 else os.path.normpath(sPath)
+            for name, sPath in zip(names, basePaths)]
+
+# private method build_device_volumes
+# Builds the volumes of the roots on the same device, one after the other
+# param basePaths : the root folder paths
+# param names : the volume names
+# param tagCache, workers, useProcesses, folderState, fastTags, stats, errors : see build_collection
+# param loader : the loader of the LazyFileNodes (lazyTags), or None
+# param scanFilter : the utils_filter.ScanFilter of the walk, or None
+# returns : the VolumeNodes, without parent, in the basePaths order
+def __build_device_volumes(basePaths, names, tagCache, workers, useProcesses, folderState, fastTags, stats, errors,
+                           loader=None, scanFilter=None):
+    tagPool = None
+    if workers > 0 and loader is None:
+        tagPool = utils_tag.TagPool(workers, useProcesses, tagCache, fastTags, stats, errors)
+    try:
+        volumes = [__build_volume(sPath, None, tagCache, tagPool, folderState, name, fastTags, stats, errors, loader,
+                                  scanFilter)
+                   for sPath, name in zip(basePaths, names)]
+        if tagPool is not None:
+            # waits for the last tag reads, the other FileNodes are attached during the walk
+            tagPool.join()
+    except BaseException:
+        if tagPool is not None:
+            tagPool.cancel()
+        raise
+    return volumes
+
+# function build_collection
+# Builds a audio file collection in a CollectionNode processed with Volume nodes, Folder nodes and File nodes
+# with several roots, every root is a VolumeNode and the roots are scanned concurrently,
+# one thread per device (the roots on the same device are scanned one after the other)
+# the volumes are in the order of the roots
+# param sBasePath : the root folder path, or a list of root folder paths
+# param tagCache : optional utils_cache.TagCache, only the new or changed files are read with TinyTag
+#                  and the deleted files are evicted from the cache
+# param workers : if > 0, the walk only records the audio files and their tags are read
+#                 in a pool keeping workers reads in flight (useful on network storage), per device
+# param useProcesses : if True the tags are read in a process pool instead of a thread pool
+# param folderState : optional utils_state.FolderState recording the folder modification times,
+#                     to rescan the collection later with rescan_collection
+# param fastTags : if True the tags are read from the metadata regions only (see utils_tag.read_tags_fast),
+#                  the duration of some VBR mp3 is then estimated, see FileNode.durationEstimated
+# param stats : optional utils_stats.ScanStats to fill (progress callback, profilers...), a new one if None
+# param errors : optional utils_errors.ScanErrors, the tolerant mode : the tag reads have a timeout and retries,
+#                the failing files, the special entries and the folders which can not be listed are recorded
+#                in its report instead of aborting the scan (with useProcesses, the reads are not timed out)
+# param lazyTags : if True only the structure is built, from the directory and stat information : the files are
+#                  LazyFileNodes reading their tags on the first access (or in batch with load_tags, workers is then
+#                  not used), so the counts and the sizes are known without reading any tag
+#                  the tag cache must stay open until the tags are loaded, and the files of the cache are not evicted
+# param scanFilter : optional utils_filter.ScanFilter, the include/exclude rules, maximum depth and size limits
+#                    evaluated during the walk (the relative paths are from every root)
+#                    the files of the tag cache skipped by the filter are evicted like the deleted ones
+# returns : a processed CollectionNode, its stats attribute is the utils_stats.ScanStats of the scan
+def build_collection(sBasePath, tagCache :utils_cache.TagCache = None, workers :int = 0, useProcesses :bool = False,
+                     folderState :utils_state.FolderState = None, fastTags :bool = False,
+                     stats :utils_stats.ScanStats = None, errors :utils_errors.ScanErrors = None, lazyTags :bool = False,
+                     scanFilter :utils_filter.ScanFilter = None):
+    basePaths = [sBasePath] if isinstance(sBasePath, str) else list(sBasePath)
+    print("[debug][build_collection] beginning in [" + ", ".join(basePaths) + "]")
+    if lazyTags and errors is not None:
+        raise ValueError("[ERROR][build_collection] the tolerant mode does not read the tags, it can not be lazy")
+    loader = functools.partial(__read_path_tags, tagCache, fastTags) if lazyTags else None
+    if stats is None:
+        stats = utils_stats.ScanStats()
+    if errors is not None and errors.stats is None:
+        errors.stats = stats
+    stats.start()
+    # let's create a new CollectionNode
+    collection = node_classes.CollectionNode("AudioCollection")
+
+    # the roots grouped by device, in the roots order
+    devices = {}
+    for i, sPath in enumerate(basePaths):
+        devices.setdefault(os.stat(sPath).st_dev, []).append(i)
+        stats.count("statCalls")
+
+    names = volume_names(basePaths) if len(basePaths) > 1 else [None]
+    volumes = [None] * len(basePaths)
+    if len(devices) == 1:
+        volumes = __build_device_volumes(basePaths, names, tagCache, workers, useProcesses, folderState, fastTags, stats,
+                                         errors, loader, scanFilter)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(devices)) as executor:
+            futures = {executor.submit(__build_device_volumes, [basePaths[i] for i in indexes], [names[i] for i in indexes],
+                                       tagCache, workers, useProcesses, folderState, fastTags, stats, errors, loader,
+                                       scanFilter): indexes
+                       for indexes in devices.values()}
+            for future in concurrent.futures.as_completed(futures):
+                for i, volumeNode in zip(futures[future], future.result()):
+                    volumes[i] = volumeNode
+    # and we add the volumes, in a deterministic order
+    collection.children = volumes
+    collection.lazyTags = lazyTags
+    # the aggregates of every node are computed once, here, write_collection reads them
+    # without the durations of the lazy files, they would be read
+    start = time.perf_counter()
+    if lazyTags:
+        collection.counts()
+    else:
+        collection.aggregates()
+    stats.add_time("aggregate", time.perf_counter() - start)
+
+    if tagCache is not None and not lazyTags:
+        for sPath in basePaths:
+            tagCache.evict(sPath)
+        print("[debug][build_collection] tag cache : " + str(tagCache.hits) + " hits, " + str(tagCache.misses)
+              + " misses, " + str(tagCache.evicted) + " evicted")
+    stats.stop()
+    collection.stats = stats
+    if errors is not None:
+        print(str(errors))
+    print("[debug][build_collection] returns collection [" + collection.name + "]")
+    return collection
+
+# end def build_collection(sBasePath)
+
+# private method match_children
+# Pairs the entries of a folder listing with the previous children of its node
+# a child read from a ".col" file has the name written in the file, which is not always the real name
+# (new lines, characters of another encoding, see utils_writer.col_name) : an entry without a child of its name
+# is paired with the first child left of the same kind having the same written name
+# param entries : the os.DirEntry of the folder
+# param children : the previous children of the folder node
+# returns : {entry name: previous child}
+def __match_children(entries, children):
+    byName = {}
+    for child in children:
+        byName.setdefault(child.name, child)
+    matched = {}
+    paired = set()
+    left = []
+    for entry in entries:
+        child = byName.get(entry.name)
+        if child is not None and id(child) not in paired:
+            matched[entry.name] = child
+            paired.add(id(child))
+        else:
+            left.append(entry)
+    if left:
+        byColName = {}
+        for child in children:
+            if id(child) not in paired:
+                key = (isinstance(child, node_classes.FolderNode), utils_writer.col_name(child.name))
+                byColName.setdefault(key, []).append(child)
+        for entry in left:
+            candidates = byColName.get((entry.is_dir(), utils_writer.col_name(entry.name)))
+            if candidates:
+                matched[entry.name] = candidates.pop(0)
+    return matched
+
+# private method rescan_folder
+# Rebuilds the direct children of a changed folder : the entries are listed again,
+# the existing FileNodes and FolderNodes are kept, the new ones are built and the deleted ones detached
+# the kept children are paired with the entries by match_children, and take the real name of their entry
+# param sPath : the folder path
+# param folderNode : the FolderNode (or VolumeNode) to rebuild
+# param tagCache : the TagCache to use, or None
+# param folderState : the utils_state.FolderState of the rescan
+# param stack : the (path, FolderNode, root length, depth) still to check, the kept sub folders are added
+# param changedNames : the names of the files modified in place, their tags are read again
+# param scanFilter : the utils_filter.ScanFilter of the walk, the rejected entries are dropped, or None
+# param iRootLength : the length of the root path with its final separator (see utils_filter.relative_path)
+# param iDepth : the depth of the sub folders of sPath, 1 for the root
+def __rescan_folder(sPath, folderNode, tagCache, folderState, stack, changedNames=(), scanFilter=None, iRootLength=0,
+                    iDepth=1):
+    children = []
+    with os.scandir(sPath) as it:
+        entries = list(it)
+    previous = __match_children(entries, folderNode.children)
+    for entry in entries:
+        if entry.is_file():
+            # the audio files of the formats of utils_format
+            if utils_format.format_of(entry.name):
+                if scanFilter is not None and not scanFilter.accept_file(entry, utils_filter.relative_path(entry, iRootLength)):
+                    continue
+                child = previous.get(entry.name)
+                # with a tag cache, the unchanged files are checked against their size and mtime
+                if not isinstance(child, node_classes.FileNode) or tagCache is not None or entry.name in changedNames:
+                    child = node_classes.FileNode(entry.name, *read_file_tags(entry, tagCache))
+                elif child.name != entry.name:
+                    child.name = entry.name
+                children.append(child)
+        elif entry.is_dir():
+            sRelativePath = None
+            if scanFilter is not None:
+                sRelativePath = utils_filter.relative_path(entry, iRootLength)
+                if not scanFilter.accept_folder(entry, sRelativePath, iDepth):
+                    continue
+            child = previous.get(entry.name)
+            if isinstance(child, node_classes.FolderNode):
+                if child.name != entry.name:
+                    child.name = entry.name
+                stack.append((entry.path, child, iRootLength, iDepth + 1))
+            else:
+                # a new folder is built completely, the rules see its paths from the root
+                child = node_classes.FolderNode(entry.name)
+                folderState.record(entry.path, entry.stat().st_mtime_ns)
+                __build_folder(entry.path, child, tagCache, None, folderState,
+                               scanFilter=None if scanFilter is None else scanFilter.subtree(sRelativePath))
+            children.append(child)
+        else:
+            # unexpected case, then raise an exception
+            print("[ERROR][rescan_folder] Unexpected item in [" + entry.path + "]")
+            raise Exception("[ERROR][rescan_folder] Unexpected item in [" + entry.path + "]")
+    # the children are in the directory order, like build_collection
+    # the same children are not assigned again, so the totals of the folders are kept (read from a ".col" file)
+    previousChildren = folderNode.children
+    if len(children) != len(previousChildren) or any(child is not previousChild
+                                                     for child, previousChild in zip(children, previousChildren)):
+        folderNode.children = children
+
+# function rescan_collection
+# Updates a collection scanned before, only revisiting the changed folders
+# a folder whose modification time did not change has the same entries, its FileNodes are kept
+# and only its sub folders are checked (one stat each, no listing, no tag read)
+# the paths are the real ones : the sub folders are found by the folder paths of the previous state,
+# a folder having a sub folder whose name read from a ".col" file is not its real name (see utils_writer.col_name)
+# is listed to find it, without reading its tags again
+# the folders whose modification time changed are listed again (see rescan_folder)
+# the tags of the files modified in place, in an unchanged folder, are not read again
+# the deleted files are not evicted from tagCache, the unchanged files are not looked up
+# a collection read from a ".col" file has rounded values (see utils_reader.read_collection),
+# so the totals of the changed folders and of their parents are exact within this rounding
+# param sBasePath : the root folder path (or the list of root folder paths), as given to build_collection
+# param collectionNode : the previous collection, from build_collection or utils_reader.read_collection
+# param folderState : the utils_state.FolderState of the previous scan, its current times are recorded
+# param tagCache : optional utils_cache.TagCache
+# param scanFilter : optional utils_filter.ScanFilter, the one of the previous scan : the entries of the changed folders
+#                    are filtered like build_collection does, the unchanged folders keep their filtered children
+# returns : the updated collectionNode
+def rescan_collection(sBasePath, collectionNode :node_classes.CollectionNode, folderState :utils_state.FolderState,
+                      tagCache :utils_cache.TagCache = None, scanFilter :utils_filter.ScanFilter = None):
+    basePaths = [sBasePath] if isinstance(sBasePath, str) else list(sBasePath)
+    print("[debug][rescan_collection] beginning in [" + ", ".join(basePaths) + "]")
+    # the volumes are in the order of the roots, with the length of their root path and the depth of their sub folders
+    stack = [(sPath, volumeNode, len(os.path.join(sPath, "")), 1)
+             for sPath, volumeNode in zip(basePaths, collectionNode.children)]
+    iChanged = 0
+    iChecked = 0
+    iRelisted = 0
+    while stack:
+        sPath, folderNode, iRootLength, iDepth = stack.pop()
+        iChecked += 1
+        mtime = os.stat(sPath).st_mtime_ns
+        folderState.record(sPath, mtime)
+        if folderState.changed(sPath, mtime):
+            iChanged += 1
+            __rescan_folder(sPath, folderNode, tagCache, folderState, stack, (), scanFilter, iRootLength, iDepth)
+            continue
+        folders = [child for child in folderNode.children if isinstance(child, node_classes.FolderNode)]
+        paths = [os.path.join(sPath, child.name) for child in folders]
+        if all(sFolderPath in folderState.previous for sFolderPath in paths) and len(set(paths)) == len(paths):
+            stack.extend((sFolderPath, child, iRootLength, iDepth + 1) for sFolderPath, child in zip(paths, folders))
+        else:
+            # a sub folder name is not the real one (read from a ".col" file, see match_children) :
+            # the folder is listed to find the real names, its nodes are kept
+            iRelisted += 1
+            __rescan_folder(sPath, folderNode, tagCache, folderState, stack, (), scanFilter, iRootLength, iDepth)
+    print("[debug][rescan_collection] " + str(iChanged) + " changed folders of " + str(iChecked) + " checked, "
+          + str(iRelisted) + " listed for their names")
+    return collectionNode
+
+# end def rescan_collection
+
+# function update_folder
+# Updates one folder of a collection after a change notified by utils_watch : its entries are listed again,
+# the new files and folders are built, the deleted ones detached, the unchanged files and sub folders kept
+# param sPath : the folder path
+# param folderNode : the FolderNode (or VolumeNode) of sPath
+# param folderState : the utils_state.FolderState recording the folder modification times
+# param tagCache : optional utils_cache.TagCache
+# param changedNames : the names of the files of the folder modified in place, their tags are read again
+# param scanFilter : optional utils_filter.ScanFilter of the collection, the rejected entries are dropped
+# param iRootLength : the length of the root path of sPath with its final separator (see utils_filter.relative_path)
+# param iDepth : the depth of the sub folders of sPath, 1 for a root
+def update_folder(sPath :str, folderNode, folderState :utils_state.FolderState, tagCache :utils_cache.TagCache = None,
+                  changedNames=(), scanFilter :utils_filter.ScanFilter = None, iRootLength :int = 0, iDepth :int = 1):
+    folderState.record(sPath, os.stat(sPath).st_mtime_ns)
+    # the kept sub folders are not checked, they have their own notifications
+    __rescan_folder(sPath, folderNode, tagCache, folderState, [], changedNames, scanFilter, iRootLength, iDepth)
+
+# end def update_folder
+
+# function build_table_collection
+# Builds a audio file collection in the compact model of table_classes :
+# the files are rows of a FileTable instead of FileNodes, for the collections too large for bigtree
+# the TableCollection can be written with write_collection
+# param sBasePath : the root folder path
+# param tagCache : optional utils_cache.TagCache
+# param scanFilter : optional utils_filter.ScanFilter of the walk (see build_collection)
+# returns : a processed table_classes.TableCollection
+def build_table_collection(sBasePath :str, tagCache :utils_cache.TagCache = None,
+                           scanFilter :utils_filter.ScanFilter = None):
+    print("[debug][build_table_collection] beginning in [" + sBasePath + "]")
+    collection = table_classes.TableCollection("AudioCollection")
+    volume = collection.add_volume(utils_file.relativePath(sBasePath))
+
+    # the parents given by the walker are the TableFolders, closed once walked (files added, totals computed)
+    enterFolder = lambda folder, entry: folder.add_folder(entry.name)
+    leaveFolder = lambda folder: folder.close()
+    for folder, entry in utils_file.walk_tree(sBasePath, volume, enterFolder, leaveFolder, scanFilter=scanFilter):
+        if entry.is_file():
+            # the audio files of the formats of utils_format
+            if utils_format.format_of(entry.name):
+                folder.add_file(entry.name, read_file_tags(entry, tagCache))
+        else:
+            # unexpected case, then raise an exception
+            print("[ERROR][build_table_collection] Unexpected item in [" + entry.path + "]")
+            raise Exception("[ERROR][build_table_collection] Unexpected item in [" + entry.path + "]")
+
+    if tagCache is not None:
+        tagCache.evict(sBasePath)
+    print("[debug][build_table_collection] returns collection [" + collection.name + "] with "
+          + str(len(collection.table)) + " files")
+    return collection
+
+# end def build_table_collection
+
+# function write_collection
+# Writes a audio file collection as a CollectionNode in a ".col" file whose path is sColFilePath
+# param collectionNode : the collectionNode (or table_classes.TableCollection) to write
+# param sColFilePath : the col file path to write in, an existing file is replaced once the new one is complete
+# param test : if test mode, we only display the collection structure
+# param encoding : the encoding of the col file, utils_writer.COL_ENCODING if None
+# param stats : the utils_stats.ScanStats to add the write time to (for instance collectionNode.stats), a new one if None
+# param compression : the compression of the col file (see utils_writer.ColWriter), by its extension if None
+# param encodingErrors : the error handler of the encoding, utils_writer.COL_ENCODING_ERRORS if None
+# returns : the utils_stats.ScanStats
+# see https://bigtree.readthedocs.io/en/stable/gettingstarted/demo/tree/
+def write_collection(collectionNode : node_classes.CollectionNode, sColFilePath :str, test :bool, encoding :str = None,
+                     stats :utils_stats.ScanStats = None, compression :str = None, encodingErrors :str = None):
+    if stats is None:
+        stats = utils_stats.ScanStats()
+    stats.start()
+    start = time.perf_counter()
+
+    if test:
+        # if test mode, we only display the collection structure
+        collectionNode.show()
+    else:
+        # the tags of the lazy files not read yet are read in batch, not one by one by the writer
+        # only a collection built with lazyTags has such files, the other ones are not walked for them
+        if getattr(collectionNode, "lazyTags", False):
+            load_tags(collectionNode)
+        # we open the file for writing, the lines are buffered and written in large chunks
+        # the file is closed (it replaces the col file) at the end of the with block, or dropped on an error
+        with utils_writer.ColWriter(sColFilePath, encoding, compression=compression,
+                                    encodingErrors=encodingErrors) as colFile:
+            # one line per node, in pre-order, the depth is counted by the walk
+            for kind, iDepth, node in utils_visit.walk_collection(collectionNode):
+                if kind == utils_visit.VISIT_FILE:
+                    utils_writer.write_file_line(colFile, node, iDepth)
+                elif kind == utils_visit.VISIT_FOLDER:
+                    utils_writer.write_folder_line(colFile, node, iDepth)
+                elif kind == utils_visit.VISIT_VOLUME:
+                    utils_writer.write_volume_line(colFile, node)
+                else:
+                    utils_writer.write_collection_line(colFile, node)
+
+    stats.add_time("write", time.perf_counter() - start)
+    stats.stop()
+    return stats
+
+# end def write_collection
+
+# the index record of a folder line of stream_collection, at the position of its enter sequence :
+# (offset in the body, position of the line in the line spool, length of the encoded line)
+__FOLDER_RECORD = struct.Struct("<QQQ")
+
+# private method stream_leave_folder
+# Ends a folder of stream_collection : its line is spooled with its position in the body
+# and its totals are added to the parent folder, like AggregateNode does
+# param frame : the folder frame (see stream_collection)
+# param spool : the binary files (index, lines) of the folder lines, the index record of the folder is written
+#               at its enter sequence, the lines are appended in the leave order
+def __stream_leave_folder(frame, spool):
+    parent = frame["parent"]
+    if parent is None:
+        # the volume line is written by stream_collection
+        return
+    indexFile, lineFile = spool
+    line = utils_writer.format_folder_line(frame["level"], frame["name"], frame["size"], frame["duration"],
+                                           frame["folderCount"], frame["fileCount"]).encode("utf-8", "surrogateescape")
+    indexFile.seek((frame["seq"] - 1) * __FOLDER_RECORD.size)
+    indexFile.write(__FOLDER_RECORD.pack(frame["offset"], lineFile.tell(), len(line)))
+    lineFile.write(line)
+    parent["size"] += frame["size"]
+    parent["duration"] += frame["duration"]
+    parent["folderCount"] += frame["folderCount"] + 1
+    parent["fileCount"] += frame["fileCount"]
+
+# function stream_collection
+# Scans sBasePath and writes the ".col" file at the same time, without building the CollectionNode
+# only the frames of the current folder path are kept in memory : the file lines are spooled in a temporary body file,
+# the folder lines (which need the subtree totals) in a temporary line file as the folders are left,
+# with an index file giving for every folder, by enter sequence, its offset in the body and its line
+# the folders are entered in the pre-order of the tree with growing body offsets, so the index read in order
+# gives the folder lines in the order of the col file : they are inserted at their offset once the walk is done
+# the written file is the same, byte for byte, as build_collection followed by write_collection
+# param sBasePath : the root folder path
+# param sColFilePath : the col file path to write in
+# param tagCache : optional utils_cache.TagCache
+# param encoding : the encoding of the col file, utils_writer.COL_ENCODING if None
+# param scanFilter : optional utils_filter.ScanFilter of the walk (see build_collection)
+# param compression : the compression of the col file (see utils_writer.ColWriter), by its extension if None
+# param encodingErrors : the error handler of the encoding, utils_writer.COL_ENCODING_ERRORS if None
+def stream_collection(sBasePath :str, sColFilePath :str, tagCache :utils_cache.TagCache = None, encoding :str = None,
+                      scanFilter :utils_filter.ScanFilter = None, compression :str = None,
+                      encodingErrors :str = None):
+    print("[debug][stream_collection] beginning in [" + sBasePath + "]")
+    # the volume is the root frame, its children are at the level 2 (depth 3 - 1)
+    volume = {"name": utils_file.relativePath(sBasePath), "level": 1, "parent": None, "offset": 0, "seq": 0,
+              "size": 0, "duration": 0, "folderCount": 0, "fileCount": 0}
+    # the body length in characters, the body is written in a temporary file next to the col file
+    bodyLength = 0
+    seq = 0
+
+    def enterFolder(parent, entry):
+        nonlocal seq
+        seq += 1
+        return {"name": entry.name, "level": parent["level"] + 1, "parent": parent, "offset": bodyLength, "seq": seq,
+                "size": 0, "duration": 0, "folderCount": 0, "fileCount": 0}
+
+    sTempFolderPath = os.path.dirname(os.path.abspath(sColFilePath))
+    with tempfile.TemporaryFile("w+", encoding="utf-8", errors="surrogateescape", newline="",
+                                dir=sTempFolderPath) as body, \
+            tempfile.TemporaryFile("w+b", dir=sTempFolderPath) as indexFile, \
+            tempfile.TemporaryFile("w+b", dir=sTempFolderPath) as lineFile:
+        leaveFolder = lambda frame: __stream_leave_folder(frame, (indexFile, lineFile))
+        for frame, entry in utils_file.walk_tree(sBasePath, volume, enterFolder, leaveFolder, scanFilter=scanFilter):
+            if entry.is_file():
+                # the audio files of the formats of utils_format
+                if utils_format.format_of(entry.name):
+                    # a FileNode without parent, released once its line is written
+                    fileNode = node_classes.FileNode(entry.name, *read_file_tags(entry, tagCache))
+                    line = utils_writer.format_file_line(frame["level"] + 1, fileNode)
+                    body.write(line)
+                    bodyLength += len(line)
+                    frame["size"] += fileNode.size
+                    frame["duration"] += fileNode.duration
+                    frame["fileCount"] += 1
+            else:
+                # unexpected case, then raise an exception
+                print("[ERROR][stream_collection] Unexpected item in [" + entry.path + "]")
+                raise Exception("[ERROR][stream_collection] Unexpected item in [" + entry.path + "]")
+
+        # we open the file for writing, like write_collection
+        with utils_writer.ColWriter(sColFilePath, encoding, compression=compression,
+                                    encodingErrors=encodingErrors) as colFile:
+            colFile.write(utils_writer.format_collection_line(volume["size"], volume["duration"],
+                                                              volume["folderCount"], volume["fileCount"]))
+            colFile.write(utils_writer.format_volume_line(volume["name"], volume["size"], volume["duration"],
+                                                          volume["folderCount"], volume["fileCount"]))
+            # the body is copied, the folder lines inserted at their offset, in the enter order
+            body.seek(0)
+            indexFile.seek(0)
+            position = 0
+            for i in range(seq):
+                offset, iLinePosition, iLineLength = __FOLDER_RECORD.unpack(indexFile.read(__FOLDER_RECORD.size))
+                while position < offset:
+                    chunk = body.read(min(offset - position, 1 << 20))
+                    colFile.write(chunk)
+                    position += len(chunk)
+                lineFile.seek(iLinePosition)
+                colFile.write(lineFile.read(iLineLength).decode("utf-8", "surrogateescape"))
+            shutil.copyfileobj(body, colFile, 1 << 20)
+
+    if tagCache is not None:
+        tagCache.evict(sBasePath)
+
+    print("[debug][stream_collection] " + str(volume["fileCount"]) + " files written in [" + sColFilePath + "]")
+
+# end def stream_collection
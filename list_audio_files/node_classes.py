@@ -1,284 +1,488 @@
-##################################################################
-# How to write a audio file (mp3, flac) collection in a export file?
-#
-# This file gathers the classes allowing to build the collection
-# These classes are implementing bigtree
-# bigtree is a python library, see https://github.com/kayjan/bigtree
-# * class CollectionNode(Node)
-#   a Collection Node contains one or many VolumeNode
-# * class VolumeNode(Node)
-#   a VolumeNode is a folder under the root (1st level)
-#   a VolumeNode contains folders handled as FolderNode and audio files handled as FileNode
-# * class FolderNode(Node)
-#   a FolderNode contains folders and files
-# * class FileNode
-#   the audio files are handled as FileNode
-##################################################################
-
-from bigtree import Node
-
-"""
-@attribute name : File name (max. 250 characters)
-@attribute size : Size (kilobytes)
-@attribute duration : Duration (seconds), a negative number means "VBR" - coded with variable bit rate
-@attribute sampleRate : Sample Rate (without last 0 - e.g. 4410)
-Kanal mode : 
-    Stereo = 1
-    Joint Stereo = 2
-    Dual Channel = 3
-    Mono = 4
-MPEG Version:
-    Unknown = 0
-    V1 = 1
-    V2 = 2
-    V2.5 = 3
-    MPEG+ SV4..7 = 4..7
-    Windows PCM = 9
-    TwinVQ = 10
-    Ogg Vorbis = 20
-    Windows Media Audio = 25
-    Monkey's Audio = 30
-    FLAC = 35
-    OptimFROG = 40
-    AAC = 45
-    WavPack = 50
-MPEG Layer:
-    Unknown = 0
-    L1..3 = 1..3 or MPEG+ SV7 Profile 1..5 = 1..5
-    Windows PCM, Monkey's Audio or FLAC = 8, 16 (bit)
-    TwinVQ = 10
-    Ogg Vorbis = 20
-    Windows Media Audio = 25
-@attribute title : ID3-tag : Title (can be empty)
-@attribute artist : ID3-tag : Artist (can be empty)
-@attribute album : ID3-tag : Album (can be empty)
-@attribute track : ID3-tag : Track number (can be empty)
-@attribute year : ID3-tag : Year (can be empty)
-@attribute comment : ID3-tag : Comment (can be empty)
-@attribute genre : ID3-tag : Genre (can be empty)
-"""
-class FileNode(Node):
-
-    def __init__(self, name: str, iSize: int, iDuration :int, iSampleRate :int,
-                 title :str, artist :str, album :str, track :str, year :str, comment :str, genre :str,
-                 bitdepth :int, channels :int, **kwargs):
-        super().__init__(name, **kwargs)
-        self._size = iSize
-        self._duration = iDuration
-        self._sampleRate = iSampleRate
-        self._title = title
-        self._artist = artist
-        self._album = album
-        self._track = track
-        self._year = year
-        self._comment = comment
-        self._genre = genre
-        self._bitdepth = bitdepth
-        self._channels = channels
-
-    @property
-    def size(self):
-        return self._size
-
-#    @size.setter
-#    def size(self, value):
-#        self._size = value
-
-    @property
-    def duration(self):
-        return self._duration
-
-#    @duration.setter
-#    def duration(self, value):
-#        self._duration = value
-
-    @property
-    def sampleRate(self):
-        return self._sampleRate
-
-#    @sampleRate.setter
-#    def sampleRate(self, value):
-#        self._sampleRate = value
-
-#
-    @property
-    def title(self):
-        return self._title
-
-#    @title.setter
-#    def title(self, value):
-#        self._title = value
-
-    @property
-    def artist(self):
-        return self._artist
-
-#    @artist.setter
-#    def artist(self, value):
-#        self._artist = value
-
-    @property
-    def album(self):
-        return self._album
-
-#   @album.setter
-#    def album(self, value):
-#        self._album = value
-
-    @property
-    def track(self):
-        return self._track
-
-#    @track.setter
-#    def track(self, value):
-#        self._track = value
-
-    @property
-    def year(self):
-        return self._year
-
-#    @year.setter
-#    def year(self, value):
-#        self._year = value
-
-    @property
-    def comment(self):
-        return self._comment
-
-#    @comment.setter
-#    def comment(self, value):
-#        self._comment = value
-
-    @property
-    def genre(self):
-        return self._genre
-
-    @property
-    def bitdepth(self):
-        return self._bitdepth
-
-    @property
-    def channels(self):
-        return self._channels
-
-
-#    @genre.setter
-#    def genre(self, value):
-#        self._genre = value
-
-    @property
-    def folderCount(self):
-        return 0
-
-    @property
-    def fileCount(self):
-        return 1
-
-# end class FileNode(Node)
-
-"""
-Name (max. 250 characters)
-Size (kilobytes)
-Duration (seconds)
-Subfolder count
-File count
-"""
-class FolderNode(Node):
-
-    def __init__(self, name: str, **kwargs):
-        super().__init__(name, **kwargs)
-
-    @property
-    def size(self):
-        return sum([child.size for child in self.children])
-
-    @property
-    def duration(self):
-        return sum([child.duration for child in self.children])
-
-    """
-    the folder amount is the amount of folder of the current folder added to the children folder amount
-    """
-    @property
-    def folderCount(self):
-        folderCount = 0
-        itemList = self.children
-        for i in itemList:
-            if isinstance(i, FolderNode):
-                folderCount += 1
-        folderCount += sum([child.folderCount for child in self.children])
-        return folderCount
-
-    @property
-    def fileCount(self):
-        return sum([child.fileCount for child in self.children])
-
-# end class FolderNode(Node)
-
-"""
-FolderNode : Name (CD-Label and Path, if not Root)
-Size (kilobytes)
-Duration (seconds)
-Folder count
-File count
-# Date (adding to collection), see "last change date"
-# Serial number of CD/HDD
-# Volume Type: 1 - Removable | 2 - Fixed (HDD) | 3 - Remote (Network) | 4 - CD-ROM | 5 - RAM disk | 6 - Audio CD
-"""
-class VolumeNode(Node):
-
-    def __init__(self, name: str, **kwargs):
-        super().__init__(name, **kwargs)
-
-    @property
-    def size(self):
-        return sum([child.size for child in self.children])
-
-    @property
-    def duration(self):
-        return sum([child.duration for child in self.children])
-    """
-    the folder amount is the amount of folder of the current folder added to the children folder amount
-    """
-    @property
-    def folderCount(self):
-        folderCount = 0
-        itemList = self.children
-        for i in itemList:
-            if isinstance(i, FolderNode):
-                folderCount += 1
-        folderCount += sum([child.folderCount for child in self.children])
-        return folderCount
-
-    @property
-    def fileCount(self):
-        return sum([child.fileCount for child in self.children])
-
-"""
-Size (kilobytes)
-Duration (seconds)
-Volume count
-File count
-TODO Date (last change), the number of days that have passed since 12/30/1899
-"""
-class CollectionNode(Node):
-
-    def __init__(self, name: str, **kwargs):
-        super().__init__(name, **kwargs)
-        print("CollectionNode.init : name"+name)
-
-    @property
-    def size(self):
-        return sum([child.size for child in self.children])
-
-    @property
-    def duration(self):
-        return sum([child.duration for child in self.children])
-
-    @property
-    def folderCount(self):
-        return sum([child.folderCount for child in self.children])
-
-    @property
-    def fileCount(self):
-        return sum([child.fileCount for child in self.children])
\ No newline at end of file
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the classes allowing to build the collection
+# These classes are implementing bigtree
+# bigtree is a python library, see https://github.com/kayjan/bigtree
+# * class AggregateNode(Node)
+#   base class caching the size, duration, folderCount and fileCount of a subtree
+# * class CollectionNode(AggregateNode)
+#   a Collection Node contains one or many VolumeNode
+# * class VolumeNode(AggregateNode)
+#   a VolumeNode is a folder under the root (1st level)
+#   a VolumeNode contains folders handled as FolderNode and audio files handled as FileNode
+# * class FolderNode(AggregateNode)
+#   a FolderNode contains folders and files
+# * class FileNode
+#   the audio files are handled as FileNode
+# * class LazyFileNode(FileNode)
+#   a FileNode whose tags are read on the first access
+##################################################################
+
+from bigtree import Node
+import utils_format
+
+"""
+@attribute name : File name (max. 250 characters)
+@attribute size : Size (kilobytes)
+@attribute duration : Duration (seconds), a negative number means "VBR" - coded with variable bit rate
+@attribute sampleRate : Sample Rate (without last 0 - e.g. 4410)
+Kanal mode : 
+    Stereo = 1
+    Joint Stereo = 2
+    Dual Channel = 3
+    Mono = 4
+MPEG Version:
+    Unknown = 0
+    V1 = 1
+    V2 = 2
+    V2.5 = 3
+    MPEG+ SV4..7 = 4..7
+    Windows PCM = 9
+    TwinVQ = 10
+    Ogg Vorbis = 20
+    Windows Media Audio = 25
+    Monkey's Audio = 30
+    FLAC = 35
+    OptimFROG = 40
+    AAC = 45
+    WavPack = 50
+MPEG Layer:
+    Unknown = 0
+    L1..3 = 1..3 or MPEG+ SV7 Profile 1..5 = 1..5
+    Windows PCM, Monkey's Audio or FLAC = 8, 16 (bit)
+    TwinVQ = 10
+    Ogg Vorbis = 20
+    Windows Media Audio = 25
+@attribute title : ID3-tag : Title (can be empty)
+@attribute artist : ID3-tag : Artist (can be empty)
+@attribute album : ID3-tag : Album (can be empty)
+@attribute track : ID3-tag : Track number (can be empty)
+@attribute year : ID3-tag : Year (can be empty)
+@attribute comment : ID3-tag : Comment (can be empty)
+@attribute genre : ID3-tag : Genre (can be empty)
+@attribute durationEstimated : True if the duration was estimated from a sample of frames (see utils_tag.read_tags_fast)
+@attribute fileFormat : the code of the audio format in utils_format.FORMATS, resolved once from the name
+"""
+class FileNode(Node):
+
+    def __init__(self, name: str, iSize: int, iDuration :int, iSampleRate :int,
+                 title :str, artist :str, album :str, track :str, year :str, comment :str, genre :str,
+                 bitdepth :int, channels :int, durationEstimated :bool = False, **kwargs):
+        # the fields are set before the parent is assigned, the index of the collection reads them
+        self._size = iSize
+        self._duration = iDuration
+        self._sampleRate = iSampleRate
+        self._title = title
+        self._artist = artist
+        self._album = album
+        self._track = track
+        self._year = year
+        self._comment = comment
+        self._genre = genre
+        self._bitdepth = bitdepth
+        self._channels = channels
+        self._durationEstimated = durationEstimated
+        self._format = utils_format.format_of(name)
+        super().__init__(name, **kwargs)
+
+    @property
+    def size(self):
+        return self._size
+
+#    @size.setter
+#    def size(self, value):
+#        self._size = value
+
+    @property
+    def duration(self):
+        return self._duration
+
+#    @duration.setter
+#    def duration(self, value):
+#        self._duration = value
+
+    @property
+    def sampleRate(self):
+        return self._sampleRate
+
+#    @sampleRate.setter
+#    def sampleRate(self, value):
+#        self._sampleRate = value
+
+#
+    @property
+    def title(self):
+        return self._title
+
+#    @title.setter
+#    def title(self, value):
+#        self._title = value
+
+    @property
+    def artist(self):
+        return self._artist
+
+#    @artist.setter
+#    def artist(self, value):
+#        self._artist = value
+
+    @property
+    def album(self):
+        return self._album
+
+#   @album.setter
+#    def album(self, value):
+#        self._album = value
+
+    @property
+    def track(self):
+        return self._track
+
+#    @track.setter
+#    def track(self, value):
+#        self._track = value
+
+    @property
+    def year(self):
+        return self._year
+
+#    @year.setter
+#    def year(self, value):
+#        self._year = value
+
+    @property
+    def comment(self):
+        return self._comment
+
+#    @comment.setter
+#    def comment(self, value):
+#        self._comment = value
+
+    @property
+    def genre(self):
+        return self._genre
+
+    @property
+    def bitdepth(self):
+        return self._bitdepth
+
+    @property
+    def channels(self):
+        return self._channels
+
+    @property
+    def durationEstimated(self):
+        return self._durationEstimated
+
+    @property
+    def fileFormat(self):
+        return self._format
+
+
+#    @genre.setter
+#    def genre(self, value):
+#        self._genre = value
+
+    @property
+    def folderCount(self):
+        return 0
+
+    @property
+    def fileCount(self):
+        return 1
+
+    # the cached aggregates of the parents are invalidated when the file is attached or detached
+    # and the file is removed from (added to) the index of its collection, if any
+    def _BaseNode__pre_assign_parent(self, new_parent):
+        super()._BaseNode__pre_assign_parent(new_parent)
+        if isinstance(self.parent, AggregateNode):
+            self.parent.invalidate()
+        index = CollectionNode.index_of(self.parent)
+        if index is not None:
+            index.remove_tree(self)
+
+    def _BaseNode__post_assign_parent(self, new_parent):
+        if isinstance(new_parent, AggregateNode):
+            new_parent.invalidate()
+        index = CollectionNode.index_of(new_parent)
+        if index is not None:
+            index.add_tree(self)
+
+# end class FileNode(Node)
+
+"""
+A FileNode built from the directory and stat information only, its tags are read on the first access
+to one of them (load), or set with the ones of a batch (set_tags, see main_functions.load_tags)
+the size is the one of the stat, it is known without reading the tags
+@attribute filePath : the path of the audio file
+@attribute loaded : True once the tags are set
+"""
+class LazyFileNode(FileNode):
+
+    # the attributes of the tags, missing until the tags are set
+    __TAG_ATTRIBUTES = frozenset(("_duration", "_sampleRate", "_title", "_artist", "_album", "_track", "_year",
+                                  "_comment", "_genre", "_bitdepth", "_channels", "_durationEstimated"))
+
+    # param iSize : the size of the file, from its stat
+    # param sFilePath : the path of the audio file
+    # param loader : function(sFilePath) returning the tags tuple (see utils_tag.read_tags)
+    def __init__(self, name: str, iSize :int, sFilePath :str, loader, **kwargs):
+        self._size = iSize
+        self.filePath = sFilePath
+        self._loader = loader
+        self._format = utils_format.format_of(name)
+        # the tag fields are not set, they are read by __getattr__
+        Node.__init__(self, name, **kwargs)
+
+    @property
+    def loaded(self):
+        return self._loader is None
+
+    # the tag attributes are missing until the tags are set, their first access reads them
+    def __getattr__(self, name):
+        if name in LazyFileNode.__TAG_ATTRIBUTES and self.__dict__.get("_loader") is not None:
+            self.load()
+            return self.__dict__[name]
+        raise AttributeError("'" + type(self).__name__ + "' object has no attribute '" + name + "'")
+
+    # function load
+    # Reads the tags with the loader, once
+    def load(self):
+        if self._loader is not None:
+            self.set_tags(self._loader(self.filePath))
+
+    # function set_tags
+    # Sets the tags read for this file, the size of the stat is kept
+    # param tags : the tags tuple (see utils_tag.read_tags)
+    def set_tags(self, tags :tuple):
+        (size, self._duration, self._sampleRate, self._title, self._artist, self._album, self._track, self._year,
+         self._comment, self._genre, self._bitdepth, self._channels, self._durationEstimated) = tags
+        self._loader = None
+
+# end class LazyFileNode(FileNode)
+
+"""
+Base class of FolderNode, VolumeNode and CollectionNode
+size, duration, folderCount and fileCount are computed once, bottom-up, on the first access
+and cached on every node of the subtree
+size, folderCount and fileCount are also cached without the duration (see counts), so the totals of a tree
+of LazyFileNode are computed without reading the tags
+the cache is invalidated up to the root when a child is attached or detached
+so reading the aggregates of every folder while writing is a single linear pass
+"""
+class AggregateNode(Node):
+
+    def __init__(self, name: str, **kwargs):
+        # (size, duration, folderCount, fileCount), None while not computed
+        self._aggregates = None
+        # (size, folderCount, fileCount), None while not computed
+        self._counts = None
+        super().__init__(name, **kwargs)
+
+    # function invalidate
+    # Drops the cached aggregates of the node and of its ancestors
+    # the ancestors of a node without cache have no cache, so we stop at the first one
+    def invalidate(self):
+        node = self
+        while node is not None and (node._aggregates is not None or node._counts is not None):
+            node._aggregates = None
+            node._counts = None
+            node = node.parent
+
+    # function preset_aggregates
+    # Sets the cached aggregates, for instance the ones read from a ".col" file (see utils_reader)
+    # they are replaced by the computed ones once the subtree changes
+    # the subtree must be complete : attaching a child invalidates them
+    def preset_aggregates(self, size, duration, folderCount :int, fileCount :int):
+        self._aggregates = (size, duration, folderCount, fileCount)
+        self._counts = (size, folderCount, fileCount)
+
+    def _BaseNode__pre_assign_parent(self, new_parent):
+        super()._BaseNode__pre_assign_parent(new_parent)
+        if isinstance(self.parent, AggregateNode):
+            self.parent.invalidate()
+        index = CollectionNode.index_of(self.parent)
+        if index is not None:
+            index.remove_tree(self)
+
+    def _BaseNode__post_assign_parent(self, new_parent):
+        if isinstance(new_parent, AggregateNode):
+            new_parent.invalidate()
+        index = CollectionNode.index_of(new_parent)
+        if index is not None:
+            index.add_tree(self)
+
+    def _BaseNode__pre_assign_children(self, new_children):
+        super()._BaseNode__pre_assign_children(new_children)
+        # the new children may be moved from another parent
+        for child in new_children:
+            if isinstance(child.parent, AggregateNode):
+                child.parent.invalidate()
+        if CollectionNode.indexCount > 0:
+            self.__reindex_children(new_children)
+
+    # private method reindex_children
+    # Updates the indexes before the children are replaced by new_children :
+    # the detached subtrees leave the index of the collection, the attached ones leave their previous index
+    # and join the index of the collection
+    def __reindex_children(self, new_children):
+        index = CollectionNode.index_of(self)
+        oldIds = {id(child) for child in self.children}
+        newIds = {id(child) for child in new_children}
+        if index is not None:
+            for child in self.children:
+                if id(child) not in newIds:
+                    index.remove_tree(child)
+        for child in new_children:
+            if id(child) not in oldIds:
+                previousIndex = CollectionNode.index_of(child.parent)
+                if previousIndex is not None:
+                    previousIndex.remove_tree(child)
+                if index is not None:
+                    index.add_tree(child)
+
+    def _BaseNode__post_assign_children(self, new_children):
+        self.invalidate()
+
+    # function aggregates
+    # Returns the cached (size, duration, folderCount, fileCount), computing the missing ones
+    # with an iterative post-order walk, so deep trees do not hit the recursion limit
+    def aggregates(self):
+        if self._aggregates is None:
+            stack = [(self, False)]
+            while stack:
+                node, ready = stack.pop()
+                children = node.children
+                if ready:
+                    size = duration = folderCount = fileCount = 0
+                    for child in children:
+                        if isinstance(child, AggregateNode):
+                            cSize, cDuration, cFolderCount, cFileCount = child._aggregates
+                            # the folder amount is the amount of folder children added to the children folder amount
+                            if isinstance(child, FolderNode):
+                                folderCount += 1
+                        else:
+                            cSize, cDuration, cFolderCount, cFileCount = child.size, child.duration, child.folderCount, child.fileCount
+                        size += cSize
+                        duration += cDuration
+                        folderCount += cFolderCount
+                        fileCount += cFileCount
+                    node._aggregates = (size, duration, folderCount, fileCount)
+                    node._counts = (size, folderCount, fileCount)
+                else:
+                    stack.append((node, True))
+                    for child in children:
+                        if isinstance(child, AggregateNode) and child._aggregates is None:
+                            stack.append((child, False))
+        return self._aggregates
+
+    # function counts
+    # Returns the cached (size, folderCount, fileCount), computing the missing ones like aggregates
+    # without reading the durations, so the tags of the LazyFileNodes are not read
+    def counts(self):
+        if self._counts is None:
+            stack = [(self, False)]
+            while stack:
+                node, ready = stack.pop()
+                children = node.children
+                if ready:
+                    size = folderCount = fileCount = 0
+                    for child in children:
+                        if isinstance(child, AggregateNode):
+                            cSize, cFolderCount, cFileCount = child._counts
+                            if isinstance(child, FolderNode):
+                                folderCount += 1
+                        else:
+                            cSize, cFolderCount, cFileCount = child.size, child.folderCount, child.fileCount
+                        size += cSize
+                        folderCount += cFolderCount
+                        fileCount += cFileCount
+                    node._counts = (size, folderCount, fileCount)
+                else:
+                    stack.append((node, True))
+                    for child in children:
+                        if isinstance(child, AggregateNode) and child._counts is None:
+                            stack.append((child, False))
+        return self._counts
+
+    @property
+    def size(self):
+        return self.counts()[0]
+
+    @property
+    def duration(self):
+        return self.aggregates()[1]
+
+    @property
+    def folderCount(self):
+        return self.counts()[1]
+
+    @property
+    def fileCount(self):
+        return self.counts()[2]
+
+# end class AggregateNode(Node)
+
+"""
+Name (max. 250 characters)
+Size (kilobytes)
+Duration (seconds)
+Subfolder count
+File count
+"""
+class FolderNode(AggregateNode):
+
+    def __init__(self, name: str, **kwargs):
+        super().__init__(name, **kwargs)
+
+# end class FolderNode(AggregateNode)
+
+"""
+FolderNode : Name (CD-Label and Path, if not Root)
+Size (kilobytes)
+Duration (seconds)
+Folder count
+File count
+# Date (adding to collection), see "last change date"
+# Serial number of CD/HDD
+# Volume Type: 1 - Removable | 2 - Fixed (HDD) | 3 - Remote (Network) | 4 - CD-ROM | 5 - RAM disk | 6 - Audio CD
+"""
+class VolumeNode(AggregateNode):
+
+    def __init__(self, name: str, **kwargs):
+        super().__init__(name, **kwargs)
+
+"""
+Size (kilobytes)
+Duration (seconds)
+Volume count
+File count
+TODO Date (last change), the number of days that have passed since 12/30/1899
+@attribute stats : the utils_stats.ScanStats of the scan which built the collection, None if not scanned
+@attribute index : the utils_index.CollectionIndex of the collection, kept current when nodes are attached or detached,
+                   None if not indexed
+@attribute lazyTags : True while the collection can have LazyFileNodes whose tags are not loaded
+                      (see main_functions.build_collection lazyTags and load_tags)
+"""
+class CollectionNode(AggregateNode):
+
+    # the amount of indexed collections, the nodes look for the index of their collection only if > 0
+    indexCount = 0
+
+    def __init__(self, name: str, **kwargs):
+        self.index = None
+        super().__init__(name, **kwargs)
+        self.stats = None
+        self.lazyTags = False
+        print("CollectionNode.init : name"+name)
+
+    # function index_of
+    # Returns the index of the collection of node (a node of the tree or None), None if it is not indexed
+    @staticmethod
+    def index_of(node):
+        if CollectionNode.indexCount == 0 or node is None:
+            return None
+        while node.parent is not None:
+            node = node.parent
+        return node.index if isinstance(node, CollectionNode) else None
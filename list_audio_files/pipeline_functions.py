@@ -0,0 +1,252 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the asyncio pipeline building the collection, the walk, the tag reads and the tree
+# assembly overlap instead of running one after the other
+# * build_collection_async(collectionPath(s), tagCache, workers, queueSize, fastTags, stats, folderState)
+# * pipeline_collection(collectionPath(s), colFilePath, tagCache, workers, queueSize, fastTags, folderState),
+#   the blocking entry point
+# the stages are linked by bounded asyncio.Queue, a full queue suspends the stage feeding it (backpressure) :
+# * the producer lists the folders (in a listing thread) depth first in the directory order,
+#   takes the cached tags at once and queues the other audio files
+# * the tag workers read the tags (TinyTag or utils_header) in an executor, one read in flight each
+# * the sink puts the tags in the cache, builds the FileNodes and attaches the children of a folder
+#   once all its tags are read, in the directory order like build_collection
+# the sink assembles the tree : the ".col" folder lines need the totals of their subtree,
+# so the col file is written with write_collection once the pipeline is done
+##################################################################
+
+import asyncio
+import concurrent.futures
+import os
+import time
+import main_functions
+import node_classes
+import utils_cache
+import utils_file
+import utils_filter
+import utils_format
+import utils_state
+import utils_stats
+import utils_tag
+
+# private method list_folder
+# Lists a folder, run in the listing thread
+# param sPath : the folder path
+# param withStat : True to stat the audio files too (for the tag cache)
+# param scanFilter : the utils_filter.ScanFilter of the walk, the rejected entries are not returned (nor stat), or None
+# param iRootLength : the length of the root path with its final separator (see utils_filter.relative_path)
+# param iDepth : the depth of the sub folders of sPath, 1 for the root
+# param withFolderStat : True to stat the sub folders too (for the folder state), before they are listed
+# returns : the list of (os.DirEntry, stat or None) in the directory order
+def __list_folder(sPath :str, withStat :bool, scanFilter=None, iRootLength :int = 0, iDepth :int = 1,
+                  withFolderStat :bool = False):
+    with os.scandir(sPath) as it:
+        entries = list(it)
+    if scanFilter is not None:
+        entries = [entry for entry in entries
+                   if (scanFilter.accept_folder(entry, utils_filter.relative_path(entry, iRootLength), iDepth)
+                       if entry.is_dir() else scanFilter.accept_file(entry, utils_filter.relative_path(entry, iRootLength)))]
+    return [(entry, entry.stat() if (withFolderStat if entry.is_dir() else withStat) else None) for entry in entries]
+
+# private method attach
+# Attaches the children of a layout [parent, slots, amount of pending reads, closed] (see utils_tag.TagPool)
+def __attach(layout):
+    if layout[1]:
+        layout[0].children = layout[1]
+    layout[1] = None
+
+# private method produce
+# The producer stage : walks the roots depth first (no recursion) and queues the audio files to read
+# param volumes : the VolumeNodes of the roots, without children
+# param basePaths, tagCache, fastTags, stats, scanFilter, folderState : see build_collection_async
+# param listExecutor : the executor listing the folders
+# param tagQueue : the queue of the tag workers, items (layout, slot index, path, stat)
+# param workers : the amount of tag workers, a None item is queued for each of them once the walk is done
+async def __produce(basePaths, volumes, tagCache, fastTags, stats, listExecutor, tagQueue :asyncio.Queue,
+                    workers :int, scanFilter=None, folderState=None):
+    loop = asyncio.get_running_loop()
+    for sBasePath, volumeNode in zip(basePaths, volumes):
+        stats.count("directories")
+        iRootLength = len(os.path.join(sBasePath, ""))
+        if folderState is not None:
+            # like build_collection, the modification time of every folder is recorded before it is listed
+            st = await loop.run_in_executor(listExecutor, os.stat, sBasePath)
+            folderState.record(sBasePath, st.st_mtime_ns)
+        stack = [(sBasePath, [volumeNode, [], 0, False], 1)]
+        while stack:
+            sPath, layout, iDepth = stack.pop()
+            start = time.perf_counter()
+            entries = await loop.run_in_executor(listExecutor, __list_folder, sPath, tagCache is not None, scanFilter,
+                                                 iRootLength, iDepth, folderState is not None)
+            stats.add_time("walk", time.perf_counter() - start)
+            folders = []
+            for entry, st in entries:
+                if entry.is_dir():
+                    stats.count("directories")
+                    if folderState is not None:
+                        folderState.record(entry.path, st.st_mtime_ns)
+                    folderNode = node_classes.FolderNode(entry.name)
+                    layout[1].append(folderNode)
+                    folders.append((entry.path, [folderNode, [], 0, False], iDepth + 1))
+                elif entry.is_file():
+                    # the audio files of the formats of utils_format
+                    if utils_format.format_of(entry.name):
+                        stats.count("files")
+                        if tagCache is not None:
+                            tags = tagCache.get(entry.path, st, not fastTags)
+                            stats.count("statCalls")
+                            stats.count("cacheMisses" if tags is None else "cacheHits")
+                            if tags is not None:
+                                layout[1].append(node_classes.FileNode(entry.name, *tags))
+                                continue
+                        layout[1].append(entry.name)
+                        layout[2] += 1
+                        # waits while tagQueue is full
+                        await tagQueue.put((layout, len(layout[1]) - 1, entry.path, st))
+                else:
+                    # unexpected case, then raise an exception
+                    print("[ERROR][pipeline_produce] Unexpected item in [" + entry.path + "]")
+                    raise Exception("[ERROR][pipeline_produce] Unexpected item in [" + entry.path + "]")
+            # the folder is listed, its children are attached once its pending tags are read
+            layout[3] = True
+            if layout[2] == 0:
+                __attach(layout)
+            # the sub folders are walked in the directory order
+            stack.extend(reversed(folders))
+    # every worker ends after its None item, then the sink after the last worker
+    for i in range(workers):
+        await tagQueue.put(None)
+
+# private method read_tags
+# The tag worker stage : reads the tags of the queued files in the executor until the None item
+# param readTags : utils_tag.read_tags or utils_tag.read_tags_fast
+# param stats : the utils_stats.ScanStats counting the tag errors
+# param tagExecutor : the executor of the tag reads
+# param tagQueue : the queue fed by the producer
+# param resultQueue : the queue of the sink, items (tag queue item, tags, seconds), None once the worker is done
+async def __read_tags(readTags, stats, tagExecutor, tagQueue :asyncio.Queue, resultQueue :asyncio.Queue):
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await tagQueue.get()
+        if item is None:
+            break
+        try:
+            tags, seconds = await loop.run_in_executor(tagExecutor, utils_tag.TagPool._read_timed, readTags, item[2])
+        except Exception:
+            stats.count("tagErrors")
+            raise
+        await resultQueue.put((item, tags, seconds))
+    await resultQueue.put(None)
+
+# private method assemble
+# The sink stage : builds the FileNodes and attaches the children of the complete folders
+# param workers : the amount of tag workers, the sink ends after their workers None items
+async def __assemble(tagCache, stats, workers :int, resultQueue :asyncio.Queue):
+    while workers > 0:
+        result = await resultQueue.get()
+        if result is None:
+            workers -= 1
+            continue
+        (layout, index, sPath, st), tags, seconds = result
+        stats.add_time("tag", seconds)
+        if tagCache is not None:
+            tagCache.put(sPath, st, tags)
+        layout[1][index] = node_classes.FileNode(layout[1][index], *tags)
+        layout[2] -= 1
+        if layout[2] == 0 and layout[3]:
+            __attach(layout)
+
+# function build_collection_async
+# Builds a audio file collection like main_functions.build_collection, with the stages of an asyncio pipeline
+# the memory of the pipeline is bounded by queueSize, whatever the speed of the storage
+# param sBasePath : the root folder path, or a list of root folder paths (every root is a VolumeNode)
+# param tagCache : optional utils_cache.TagCache
+# param workers : the amount of tag reads in flight
+# param queueSize : the maximum amount of files waiting in every queue
+# param fastTags : if True the tags are read with utils_tag.read_tags_fast
+# param stats : optional utils_stats.ScanStats to fill, a new one if None
+# param useProcesses : if True the tags are read in a process pool instead of a thread pool
+# param scanFilter : optional utils_filter.ScanFilter, evaluated in the listing thread (see build_collection)
+# param folderState : optional utils_state.FolderState recording the folder modification times,
+#                     for a later incremental rescan (see main_functions.rescan_collection)
+# returns : a processed CollectionNode, its stats attribute is the utils_stats.ScanStats of the scan
+async def build_collection_async(sBasePath, tagCache :utils_cache.TagCache = None, workers :int = 8,
+                                 queueSize :int = 1024, fastTags :bool = False, stats :utils_stats.ScanStats = None,
+                                 useProcesses :bool = False, scanFilter :utils_filter.ScanFilter = None,
+                                 folderState :utils_state.FolderState = None):
+    basePaths = [sBasePath] if isinstance(sBasePath, str) else list(sBasePath)
+    print("[debug][build_collection_async] beginning in [" + ", ".join(basePaths) + "]")
+    if workers < 1:
+        raise ValueError("[ERROR][build_collection_async] workers must be at least 1")
+    if stats is None:
+        stats = utils_stats.ScanStats()
+    stats.start()
+    collection = node_classes.CollectionNode("AudioCollection")
+    names = main_functions.volume_names(basePaths) if len(basePaths) > 1 else [None]
+    volumes = [node_classes.VolumeNode(name if name is not None else utils_file.relativePath(sPath))
+               for sPath, name in zip(basePaths, names)]
+
+    readTags = utils_tag.read_tags_fast if fastTags else utils_tag.read_tags
+    tagQueue = asyncio.Queue(queueSize)
+    resultQueue = asyncio.Queue(queueSize)
+    if useProcesses:
+        tagExecutor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    else:
+        tagExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    listExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    producer = asyncio.create_task(__produce(basePaths, volumes, tagCache, fastTags, stats, listExecutor, tagQueue,
+                                             workers, scanFilter, folderState))
+    readers = [asyncio.create_task(__read_tags(readTags, stats, tagExecutor, tagQueue, resultQueue)) for i in range(workers)]
+    sink = asyncio.create_task(__assemble(tagCache, stats, workers, resultQueue))
+    tasks = [producer, sink] + readers
+    try:
+        # the stages are watched together : a failed worker no longer reads the queue, so the producer would wait
+        # forever for room in it if only the producer was awaited
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+    except BaseException:
+        # a failed stage stops the others, the error is raised like build_collection does
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        tagExecutor.shutdown()
+        listExecutor.shutdown()
+
+    collection.children = volumes
+    start = time.perf_counter()
+    collection.aggregates()
+    stats.add_time("aggregate", time.perf_counter() - start)
+
+    if tagCache is not None:
+        for sPath in basePaths:
+            tagCache.evict(sPath)
+        print("[debug][build_collection_async] tag cache : " + str(tagCache.hits) + " hits, " + str(tagCache.misses)
+              + " misses, " + str(tagCache.evicted) + " evicted")
+    stats.stop()
+    collection.stats = stats
+    print("[debug][build_collection_async] returns collection [" + collection.name + "]")
+    return collection
+
+# end def build_collection_async
+
+# function pipeline_collection
+# Builds the collection with the asyncio pipeline (see build_collection_async) and writes it in sColFilePath
+# param sColFilePath : the col file path to write in, or None to only build the collection
+# param the others : see build_collection_async
+# returns : the processed CollectionNode
+def pipeline_collection(sBasePath, sColFilePath :str = None, tagCache :utils_cache.TagCache = None, workers :int = 8,
+                        queueSize :int = 1024, fastTags :bool = False, stats :utils_stats.ScanStats = None,
+                        scanFilter :utils_filter.ScanFilter = None, folderState :utils_state.FolderState = None):
+    collection = asyncio.run(build_collection_async(sBasePath, tagCache, workers, queueSize, fastTags, stats,
+                                                    scanFilter=scanFilter, folderState=folderState))
+    if sColFilePath is not None:
+        main_functions.write_collection(collection, sColFilePath, False, stats=collection.stats)
+    return collection
+
+# end def pipeline_collection
@@ -0,0 +1,81 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file is the query script, it prints the files (or their folders) of a collection matching tag criteria
+# * the collection is loaded from a snapshot (utils_snapshot), a ".col" file (utils_reader) or scanned
+# * the criteria are looked up in the indexes of utils_index.CollectionIndex
+#   a year, duration or sample rate criterion can be a range "low-high", "low-" or "-high", bounds included
+# the paths are printed on the standard output, one per line (the debug prints go to the error output)
+# example : python query.py --snapshot collection.snap --artist "X" --format flac --year 1990-1995 --folders
+##################################################################
+
+import argparse
+import contextlib
+import sys
+import main_functions
+import utils_filter
+import utils_index
+import utils_reader
+import utils_snapshot
+
+# private method parse_range
+# Returns the value of a criterion : a number, or a range (low, high) whose missing bounds are None
+# param text : "1995", "1990-1995", "1990-" or "-1995"
+# param number : int or float
+def __parse_range(text :str, number):
+    if text is None:
+        return None
+    if "-" not in text:
+        return number(text)
+    sLow, sHigh = text.split("-", 1)
+    return (number(sLow) if sLow.strip() else None, number(sHigh) if sHigh.strip() else None)
+
+# function load_collection
+# Loads the collection to query, in the bigtree model
+# param args : the parsed arguments, one of snapshot, col and library (scanned with the filter options)
+def load_collection(args):
+    if args.snapshot is not None:
+        return utils_snapshot.to_collection_node(utils_snapshot.load_snapshot(args.snapshot))
+    if args.col is not None:
+        return utils_reader.read_collection(args.col)
+    return main_functions.build_collection(args.library, scanFilter=utils_filter.from_arguments(args))
+
+# end def load_collection
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prints the audio files of a collection matching tag criteria")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--snapshot", help="a snapshot written by utils_snapshot.save_snapshot")
+    source.add_argument("--col", help="a col file written by write_collection")
+    source.add_argument("--library", help="a library folder, scanned")
+    parser.add_argument("--artist")
+    parser.add_argument("--album")
+    parser.add_argument("--genre")
+    parser.add_argument("--year", help="a year or a range of years, like 1990-1995")
+    parser.add_argument("--duration", help="a range of seconds, like 60-300")
+    parser.add_argument("--samplerate", help="a sample rate or a range, like 44100 or 48000-")
+    parser.add_argument("--format", help="the file extension, like flac or mp3")
+    parser.add_argument("--folders", action="store_true", help="print the folders of the matching files")
+    parser.add_argument("--count", action="store_true", help="print only the amount of matches")
+    utils_filter.add_arguments(parser)
+    args = parser.parse_args()
+
+    # the debug prints of the loaders would be mixed with the results
+    with contextlib.redirect_stdout(sys.stderr):
+        collection = load_collection(args)
+        index = utils_index.CollectionIndex(collection)
+    criteria = {"artist": args.artist, "album": args.album, "genre": args.genre,
+                "year": __parse_range(args.year, int), "duration": __parse_range(args.duration, float),
+                "sampleRate": __parse_range(args.samplerate, int),
+                "extension": None if args.format is None else "." + args.format.lstrip(".")}
+    if args.folders:
+        results = index.folders(**criteria)
+    else:
+        results = [utils_index.node_path(fileNode) for fileNode in index.find(**criteria)]
+    if args.count:
+        print(len(results))
+    else:
+        for sPath in results:
+            print(sPath)
+
+# end main
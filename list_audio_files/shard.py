@@ -0,0 +1,75 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file is the sharded scan script (see shard_functions), every step can run on another host
+# * list : prints the shard names of a root, one per line
+# * scan-root : writes the root shard (the files of the root and the places of the shards)
+# * scan : writes the shard of one top-level sub folder
+# * merge : merges the root shard and the shards, and writes the ".col" file
+# * run : all the steps, in local processes
+# the filter options (--exclude, --max-depth... see utils_filter) must be the same for every step of a scan
+# example :
+#   python shard.py scan-root --root /music --output shards/root.shard
+#   python shard.py scan --root /music --name "Jazz" --output shards/jazz.shard
+#   python shard.py merge --root-shard shards/root.shard --output music.col shards/jazz.shard ...
+##################################################################
+
+import argparse
+import main_functions
+import shard_functions
+import utils_cache
+import utils_filter
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sharded scan of a root, one shard per top-level sub folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listCommand = commands.add_parser("list", help="print the shard names")
+    listCommand.add_argument("--root", required=True)
+    rootCommand = commands.add_parser("scan-root", help="scan the files of the root")
+    rootCommand.add_argument("--root", required=True)
+    rootCommand.add_argument("--output", required=True, help="the root shard file")
+    scanCommand = commands.add_parser("scan", help="scan one shard")
+    scanCommand.add_argument("--root", required=True)
+    scanCommand.add_argument("--name", required=True, help="the shard name, a top-level sub folder of the root")
+    scanCommand.add_argument("--output", required=True, help="the shard file")
+    scanCommand.add_argument("--workers", type=int, default=0, help="the tag reads in flight")
+    mergeCommand = commands.add_parser("merge", help="merge the shards and write the col file")
+    mergeCommand.add_argument("--root-shard", required=True)
+    mergeCommand.add_argument("--output", required=True, help="the col file")
+    mergeCommand.add_argument("shards", nargs="*", help="the shard files")
+    runCommand = commands.add_parser("run", help="scan the shards in local processes, merge and write the col file")
+    runCommand.add_argument("--root", required=True)
+    runCommand.add_argument("--output", required=True, help="the col file")
+    runCommand.add_argument("--shards", required=True, help="the folder of the shard files")
+    runCommand.add_argument("--processes", type=int, default=4, help="the shards scanned at once")
+    runCommand.add_argument("--workers", type=int, default=0, help="the tag reads in flight of every shard")
+    for command in (rootCommand, scanCommand, runCommand):
+        command.add_argument("--fast-tags", action="store_true", help="read the tags with utils_tag.read_tags_fast")
+    for command in (rootCommand, scanCommand):
+        command.add_argument("--tag-cache", help="the tag cache of this host")
+    # the same rules are given to every step of a scan
+    for command in (listCommand, rootCommand, scanCommand, runCommand):
+        utils_filter.add_arguments(command)
+    args = parser.parse_args()
+    scanFilter = None if args.command == "merge" else utils_filter.from_arguments(args)
+
+    if args.command == "list":
+        for name in shard_functions.list_shards(args.root, scanFilter):
+            print(name)
+    elif args.command == "merge":
+        collection = shard_functions.merge_shards(args.root_shard, args.shards)
+        main_functions.write_collection(collection, args.output, False)
+    elif args.command == "run":
+        shard_functions.scan_sharded(args.root, args.output, args.shards, args.processes, args.workers, args.fast_tags,
+                                     scanFilter)
+    else:
+        tagCache = None if args.tag_cache is None else utils_cache.TagCache(args.tag_cache)
+        if args.command == "scan-root":
+            shard_functions.scan_root_shard(args.root, args.output, tagCache, args.fast_tags, scanFilter)
+        else:
+            shard_functions.scan_shard(args.root, args.name, args.output, tagCache, args.workers, args.fast_tags,
+                                       scanFilter)
+        if tagCache is not None:
+            tagCache.close()
+
+# end main
@@ -0,0 +1,160 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the sharded scan of a huge root : every top-level sub folder of the root is a shard,
+# scanned in its own process (or on another host), and the partial trees are merged in one collection
+# * list_shards(basePath, scanFilter), the names of the shards, in the directory order
+# * scan_root_shard(basePath, shardPath, tagCache, fastTags, scanFilter), the files of the root and the places of the shards
+# * scan_shard(basePath, name, shardPath, tagCache, workers, fastTags, scanFilter), the subtree of one shard
+# * merge_shards(rootShardPath, shardPaths), the collection of the root, like build_collection
+# * scan_sharded(basePath, colFilePath, shardFolderPath, processes, workers, fastTags, scanFilter), all the steps
+#   in local processes
+# the utils_filter.ScanFilter rules are the ones of the root in every step, a folder excluded at the top level is no shard
+# the partial trees are utils_snapshot files, with the totals of every folder
+# the merged collection has the children order and the totals of a single-process build_collection,
+# so the written ".col" file is the same
+# the command line is shard.py
+##################################################################
+
+import concurrent.futures
+import os
+import main_functions
+import node_classes
+import utils_cache
+import utils_file
+import utils_filter
+import utils_format
+import utils_snapshot
+
+# the name of the root shard file in the shard folder, the other ones are "<index>.shard"
+ROOT_SHARD_NAME = "root.shard"
+
+# function list_shards
+# Returns the names of the top-level sub folders of sBasePath, in the directory order
+# param scanFilter : optional utils_filter.ScanFilter, the rejected folders are not shards
+def list_shards(sBasePath :str, scanFilter :utils_filter.ScanFilter = None):
+    with os.scandir(sBasePath) as it:
+        return [entry.name for entry in it
+                if entry.is_dir() and (scanFilter is None or scanFilter.accept_folder(entry, entry.name, 1))]
+
+# end def list_shards
+
+# function scan_root_shard
+# Scans the root itself : its audio files, and an empty FolderNode at the place of every shard
+# param sBasePath : the root folder path
+# param sShardPath : the snapshot file to write
+# param tagCache : optional utils_cache.TagCache
+# param fastTags : True to read the tags with utils_tag.read_tags_fast
+# param scanFilter : optional utils_filter.ScanFilter
+def scan_root_shard(sBasePath :str, sShardPath :str, tagCache :utils_cache.TagCache = None, fastTags :bool = False,
+                    scanFilter :utils_filter.ScanFilter = None):
+    collection = node_classes.CollectionNode("AudioCollection")
+    volumeNode = node_classes.VolumeNode(utils_file.relativePath(sBasePath))
+    children = []
+    with os.scandir(sBasePath) as it:
+        entries = list(it)
+    for entry in entries:
+        if scanFilter is not None and not (scanFilter.accept_folder(entry, entry.name, 1) if entry.is_dir()
+                                           else scanFilter.accept_file(entry, entry.name)):
+            continue
+        if entry.is_dir():
+            # the place of the shard, its content is merged by merge_shards
+            children.append(node_classes.FolderNode(entry.name))
+        elif entry.is_file():
+            # the audio files of the formats of utils_format
+            if utils_format.format_of(entry.name):
+                children.append(node_classes.FileNode(entry.name, *main_functions.read_file_tags(entry, tagCache, fastTags)))
+        else:
+            # unexpected case, then raise an exception
+            print("[ERROR][scan_root_shard] Unexpected item in [" + entry.path + "]")
+            raise Exception("[ERROR][scan_root_shard] Unexpected item in [" + entry.path + "]")
+    volumeNode.children = children
+    collection.children = [volumeNode]
+    utils_snapshot.save_snapshot(collection, sShardPath)
+
+# end def scan_root_shard
+
+# function scan_shard
+# Scans one shard with build_collection, its partial tree is a collection whose volume is the shard folder
+# param sBasePath : the root folder path
+# param name : the name of the shard, a top-level sub folder of sBasePath
+# param sShardPath : the snapshot file to write
+# param tagCache, workers, fastTags : see build_collection
+# param scanFilter : optional utils_filter.ScanFilter of the root, its rules see the paths from the root
+def scan_shard(sBasePath :str, name :str, sShardPath :str, tagCache :utils_cache.TagCache = None, workers :int = 0,
+               fastTags :bool = False, scanFilter :utils_filter.ScanFilter = None):
+    collection = main_functions.build_collection(os.path.join(sBasePath, name), tagCache, workers, fastTags=fastTags,
+                                                 scanFilter=None if scanFilter is None else scanFilter.subtree(name))
+    # the volume is named after the relative path of the shard folder, its name
+    utils_snapshot.save_snapshot(collection, sShardPath)
+
+# end def scan_shard
+
+# function merge_shards
+# Merges the partial trees of a sharded scan in one collection
+# every empty FolderNode of the root shard is replaced by a FolderNode having the content and the totals
+# of the shard of the same name, the totals of the root are then computed like build_collection does
+# param sRootShardPath : the snapshot written by scan_root_shard
+# param shardPaths : the snapshots written by scan_shard, in any order
+# returns : the merged CollectionNode
+def merge_shards(sRootShardPath :str, shardPaths):
+    collection = utils_snapshot.to_collection_node(utils_snapshot.load_snapshot(sRootShardPath))
+    volumeNode = collection.children[0]
+    shards = {}
+    for sShardPath in shardPaths:
+        shardVolume = utils_snapshot.to_collection_node(utils_snapshot.load_snapshot(sShardPath)).children[0]
+        if shardVolume.name in shards:
+            raise ValueError("[ERROR][merge_shards] the shard [" + shardVolume.name + "] is given twice")
+        shards[shardVolume.name] = shardVolume
+
+    children = []
+    for child in volumeNode.children:
+        if isinstance(child, node_classes.FolderNode):
+            shardVolume = shards.pop(child.name, None)
+            if shardVolume is None:
+                raise ValueError("[ERROR][merge_shards] the shard [" + child.name + "] is missing")
+            # the totals of the shard are the ones of its folder, read before its children are moved
+            aggregates = shardVolume.aggregates()
+            folderNode = node_classes.FolderNode(child.name)
+            folderNode.children = list(shardVolume.children)
+            folderNode.preset_aggregates(*aggregates)
+            children.append(folderNode)
+        else:
+            children.append(child)
+    if shards:
+        raise ValueError("[ERROR][merge_shards] the shards [" + ", ".join(shards) + "] are not in the root")
+    volumeNode.children = children
+    collection.aggregates()
+    print("[debug][merge_shards] " + str(len(shardPaths)) + " shards merged, " + str(collection.fileCount) + " files")
+    return collection
+
+# end def merge_shards
+
+# function scan_sharded
+# Scans sBasePath shard by shard in a process pool, merges the partial trees and writes the col file
+# param sBasePath : the root folder path
+# param sColFilePath : the col file path to write in
+# param sShardFolderPath : the folder of the shard snapshots, created if needed
+# param processes : the amount of shards scanned at once
+# param workers : the tag reads in flight of every shard (see build_collection)
+# param fastTags : True to read the tags with utils_tag.read_tags_fast
+# param scanFilter : optional utils_filter.ScanFilter
+# returns : the merged CollectionNode
+def scan_sharded(sBasePath :str, sColFilePath :str, sShardFolderPath :str, processes :int = 4, workers :int = 0,
+                 fastTags :bool = False, scanFilter :utils_filter.ScanFilter = None):
+    os.makedirs(sShardFolderPath, exist_ok=True)
+    names = list_shards(sBasePath, scanFilter)
+    print("[debug][scan_sharded] " + str(len(names)) + " shards in [" + sBasePath + "]")
+    sRootShardPath = os.path.join(sShardFolderPath, ROOT_SHARD_NAME)
+    shardPaths = [os.path.join(sShardFolderPath, str(i) + ".shard") for i in range(len(names))]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(scan_root_shard, sBasePath, sRootShardPath, None, fastTags, scanFilter)]
+        futures += [executor.submit(scan_shard, sBasePath, name, sShardPath, None, workers, fastTags, scanFilter)
+                    for name, sShardPath in zip(names, shardPaths)]
+        for future in futures:
+            future.result()
+    collection = merge_shards(sRootShardPath, shardPaths)
+    main_functions.write_collection(collection, sColFilePath, False)
+    return collection
+
+# end def scan_sharded
@@ -0,0 +1,361 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the classes of the compact collection model
+# an alternative to node_classes for the large collections, without one bigtree Node per file
+# * class StringPool
+#   the repeated tag strings (artist, album, genre, year...) are stored once and referenced by id
+# * class TextColumn
+#   the strings seldom repeated (file names, titles) are stored encoded in one bytearray
+# * class FileTable
+#   the files are stored in array-backed columns, one row per file
+# * class FileView
+#   a small view on one row of the FileTable, with the FileNode properties read by utils_writer
+# * class TableFolder, TableVolume, TableCollection
+#   the folders keep only the index range of their files in the FileTable and their subfolders
+##################################################################
+
+from array import array
+from math import isnan
+import utils_format
+
+"""
+Dictionary encoding of the tag values : every distinct value is stored once
+the id 0 is the None value
+"""
+class StringPool:
+
+    __slots__ = ("_ids", "values")
+
+    def __init__(self):
+        self._ids = {None: 0}
+        self.values = [None]
+
+    # function id
+    # Returns the id of value, adding it to the pool if needed
+    def id(self, value):
+        valueId = self._ids.get(value)
+        if valueId is None:
+            valueId = len(self.values)
+            self._ids[value] = valueId
+            self.values.append(value)
+        return valueId
+
+# end class StringPool
+
+"""
+Column of strings which are not repeated (file names, titles, comments)
+the strings are stored encoded in one bytearray, with their end offsets, instead of one str object each
+"""
+class TextColumn:
+
+    __slots__ = ("_data", "_ends", "_none")
+
+    def __init__(self):
+        self._data = bytearray()
+        self._ends = array("q")
+        # one byte per row, 1 if the value is None
+        self._none = bytearray()
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, index :int):
+        if self._none[index]:
+            return None
+        start = self._ends[index - 1] if index > 0 else 0
+        return self._data[start:self._ends[index]].decode("utf-8", "surrogatepass")
+
+    def append(self, value :str):
+        if value is None:
+            self._none.append(1)
+        else:
+            self._none.append(0)
+            self._data += value.encode("utf-8", "surrogatepass")
+        self._ends.append(len(self._data))
+
+# end class TextColumn
+
+"""
+Columns of the files, a file is a row index
+the numeric values are in typed arrays, a missing value is stored as -1 (NaN for the duration)
+the repeated tag strings are ids in the StringPool strings, the other ones are TextColumns
+"""
+class FileTable:
+
+    def __init__(self):
+        self.strings = StringPool()
+        # the file names, titles and comments are seldom repeated, they are not pooled
+        self.name = TextColumn()
+        self.title = TextColumn()
+        self.comment = TextColumn()
+        self.size = array("q")
+        self.duration = array("d")
+        self.sampleRate = array("i")
+        self.bitdepth = array("h")
+        self.channels = array("h")
+        self.artist = array("i")
+        self.album = array("i")
+        self.track = array("i")
+        self.year = array("i")
+        self.genre = array("i")
+        # one byte per row, 1 if the duration was estimated
+        self.durationEstimated = bytearray()
+        # one byte per row, the code of the audio format (see utils_format.FORMATS)
+        self.fileFormat = bytearray()
+
+    def __len__(self):
+        return len(self.name)
+
+    # function append
+    # Adds a file row
+    # param name : the file name
+    # param tags : the tags tuple (see utils_tag.read_tags)
+    # returns : the row index of the file
+    def append(self, name :str, tags :tuple):
+        size, duration, sampleRate, title, artist, album, track, year, comment, genre, bitdepth, channels, estimated = tags
+        strings = self.strings
+        self.name.append(name)
+        self.size.append(size)
+        self.duration.append(float("nan") if duration is None else duration)
+        self.sampleRate.append(-1 if sampleRate is None else sampleRate)
+        self.bitdepth.append(-1 if bitdepth is None else bitdepth)
+        self.channels.append(-1 if channels is None else channels)
+        self.title.append(title)
+        self.artist.append(strings.id(artist))
+        self.album.append(strings.id(album))
+        self.track.append(strings.id(track))
+        self.year.append(strings.id(year))
+        self.comment.append(comment)
+        self.genre.append(strings.id(genre))
+        self.durationEstimated.append(1 if estimated else 0)
+        self.fileFormat.append(utils_format.format_of(name))
+        return len(self.name) - 1
+
+# end class FileTable
+
+"""
+A file of the FileTable, with the same properties as node_classes.FileNode
+@attribute depth : the depth of the file, like FileNode.depth
+"""
+class FileView:
+
+    __slots__ = ("_table", "_index", "depth")
+
+    def __init__(self, table :FileTable, index :int, depth :int):
+        self._table = table
+        self._index = index
+        self.depth = depth
+
+    def __int(self, column):
+        value = column[self._index]
+        return None if value == -1 else value
+
+    @property
+    def name(self):
+        return self._table.name[self._index]
+
+    @property
+    def size(self):
+        return self._table.size[self._index]
+
+    @property
+    def duration(self):
+        value = self._table.duration[self._index]
+        return None if isnan(value) else value
+
+    @property
+    def sampleRate(self):
+        return self.__int(self._table.sampleRate)
+
+    @property
+    def title(self):
+        return self._table.title[self._index]
+
+    @property
+    def artist(self):
+        return self._table.strings.values[self._table.artist[self._index]]
+
+    @property
+    def album(self):
+        return self._table.strings.values[self._table.album[self._index]]
+
+    @property
+    def track(self):
+        return self._table.strings.values[self._table.track[self._index]]
+
+    @property
+    def year(self):
+        return self._table.strings.values[self._table.year[self._index]]
+
+    @property
+    def comment(self):
+        return self._table.comment[self._index]
+
+    @property
+    def genre(self):
+        return self._table.strings.values[self._table.genre[self._index]]
+
+    @property
+    def bitdepth(self):
+        return self.__int(self._table.bitdepth)
+
+    @property
+    def channels(self):
+        return self.__int(self._table.channels)
+
+    @property
+    def durationEstimated(self):
+        return self._table.durationEstimated[self._index] == 1
+
+    @property
+    def fileFormat(self):
+        return self._table.fileFormat[self._index]
+
+    @property
+    def folderCount(self):
+        return 0
+
+    @property
+    def fileCount(self):
+        return 1
+
+# end class FileView
+
+"""
+A folder of the compact model, with the same properties as node_classes.FolderNode
+the files of a folder are the rows fileStart..fileEnd-1 of the FileTable
+positions[i] is the amount of files listed before the subfolder folders[i], to keep the children order
+while the folder is walked, its files are pending, they are added to the FileTable by close()
+"""
+class TableFolder:
+
+    __slots__ = ("name", "depth", "_table", "fileStart", "fileEnd", "folders", "positions",
+                 "size", "duration", "folderCount", "fileCount", "_pending")
+
+    def __init__(self, name :str, table :FileTable, depth :int):
+        self.name = name
+        self.depth = depth
+        self._table = table
+        self.fileStart = self.fileEnd = 0
+        # created with the first subfolder, most of the folders have none
+        self.folders = None
+        self.positions = None
+        self.size = self.duration = self.folderCount = self.fileCount = 0
+        self._pending = []
+
+    # function add_folder
+    # Adds a subfolder at the current position of the children
+    # returns : the new TableFolder
+    def add_folder(self, name :str):
+        folder = TableFolder(name, self._table, self.depth + 1)
+        if self.folders is None:
+            self.folders = []
+            self.positions = array("l")
+        self.positions.append(len(self._pending))
+        self.folders.append(folder)
+        return folder
+
+    # function add_file
+    # Adds a file at the current position of the children
+    # param tags : the tags tuple (see utils_tag.read_tags)
+    def add_file(self, name :str, tags :tuple):
+        self._pending.append((name, tags))
+
+    # function close
+    # Adds the pending files to the FileTable, so the files of the folder are contiguous,
+    # and computes the aggregates once, bottom-up, in the children order (like AggregateNode)
+    # the subfolders must be closed before
+    def close(self):
+        self.fileStart = len(self._table)
+        for name, tags in self._pending:
+            self._table.append(name, tags)
+        self.fileEnd = len(self._table)
+        self._pending = None
+        size = duration = folderCount = fileCount = 0
+        for child in self.children:
+            size += child.size
+            duration += child.duration
+            folderCount += child.folderCount
+            fileCount += child.fileCount
+            if isinstance(child, TableFolder):
+                folderCount += 1
+        self.size, self.duration, self.folderCount, self.fileCount = size, duration, folderCount, fileCount
+
+    @property
+    def children(self):
+        children = []
+        iFile = self.fileStart
+        for folder, position in zip(self.folders or (), self.positions or ()):
+            while iFile < self.fileStart + position:
+                children.append(FileView(self._table, iFile, self.depth + 1))
+                iFile += 1
+            children.append(folder)
+        while iFile < self.fileEnd:
+            children.append(FileView(self._table, iFile, self.depth + 1))
+            iFile += 1
+        return tuple(children)
+
+# end class TableFolder
+
+"""
+A volume of the compact model, like node_classes.VolumeNode
+"""
+class TableVolume(TableFolder):
+
+    __slots__ = ()
+
+# end class TableVolume
+
+"""
+The collection of the compact model, like node_classes.CollectionNode
+@attribute table : the FileTable of all the files
+@attribute volumes : the TableVolumes
+"""
+class TableCollection:
+
+    def __init__(self, name :str):
+        self.name = name
+        self.depth = 1
+        self.table = FileTable()
+        self.volumes = []
+
+    # function add_volume
+    # returns : a new TableVolume under the collection
+    def add_volume(self, name :str):
+        volume = TableVolume(name, self.table, 2)
+        self.volumes.append(volume)
+        return volume
+
+    @property
+    def children(self):
+        return tuple(self.volumes)
+
+    @property
+    def size(self):
+        return sum([child.size for child in self.volumes])
+
+    @property
+    def duration(self):
+        return sum([child.duration for child in self.volumes])
+
+    @property
+    def folderCount(self):
+        return sum([child.folderCount for child in self.volumes])
+
+    @property
+    def fileCount(self):
+        return sum([child.fileCount for child in self.volumes])
+
+    # function show
+    # Prints the collection structure, like bigtree show()
+    def show(self):
+        print(self.name)
+        stack = [(child, 1) for child in reversed(self.volumes)]
+        while stack:
+            node, iLevel = stack.pop()
+            print("    " * iLevel + node.name)
+            if isinstance(node, TableFolder):
+                stack.extend((child, iLevel + 1) for child in reversed(node.children))
+
+# end class TableCollection
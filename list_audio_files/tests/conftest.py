@@ -0,0 +1,43 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the fixtures of the tests, the libraries are written by utils_generator
+# * library, a small generated library, written once for the tests
+# * library_copy, a copy of it which a test can change
+# * write_col(collection, tmp_path), the bytes of the col file of a collection
+# the modules of list_audio_files are imported by name, like the scripts do
+##################################################################
+
+import os
+import shutil
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main_functions
+import utils_generator
+
+# fixture library
+# A generated library of 3 levels, 3 sub folders per folder and 4 files per folder, mp3 and flac
+@pytest.fixture(scope="session")
+def library(tmp_path_factory):
+    sPath = str(tmp_path_factory.mktemp("library") / "lib")
+    utils_generator.generate_library(sPath, depth=3, fanOut=3, files=4, artists=5, albums=8, genres=4, years=6)
+    return sPath
+
+# fixture library_copy
+# A copy of the generated library, for the tests which change the files
+@pytest.fixture
+def library_copy(library, tmp_path):
+    sPath = str(tmp_path / "lib")
+    shutil.copytree(library, sPath)
+    return sPath
+
+# function write_col
+# Returns the bytes of the col file of a collection, written under tmp_path
+def write_col(collection, tmp_path, name :str = "collection.col"):
+    sColFilePath = str(tmp_path / name)
+    main_functions.write_collection(collection, sColFilePath, False)
+    with open(sColFilePath, "rb") as colFile:
+        return colFile.read()
@@ -0,0 +1,51 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of the build modes of main_functions, they all write the same col file
+##################################################################
+
+import os
+import main_functions
+import node_classes
+import utils_tag
+from conftest import write_col
+
+# the build modes give the same col file as the serial build
+def test_modes_same_col_file(library, tmp_path):
+    expected = write_col(main_functions.build_collection(library), tmp_path, "build.col")
+    assert write_col(main_functions.build_collection(library, workers=4), tmp_path, "pool.col") == expected
+    assert write_col(main_functions.build_collection(library, fastTags=True), tmp_path, "fast.col") == expected
+    assert write_col(main_functions.build_collection(library, lazyTags=True), tmp_path, "lazy.col") == expected
+    assert write_col(main_functions.build_table_collection(library), tmp_path, "table.col") == expected
+    main_functions.stream_collection(library, str(tmp_path / "stream.col"))
+    with open(str(tmp_path / "stream.col"), "rb") as colFile:
+        assert colFile.read() == expected
+
+# only a lazy collection is walked for its files to load before it is written
+def test_write_loads_lazy_only(library, tmp_path, monkeypatch):
+    calls = []
+    loadTags = main_functions.load_tags
+    monkeypatch.setattr(main_functions, "load_tags", lambda node, workers=8: calls.append(node) or loadTags(node, workers))
+    write_col(main_functions.build_collection(library), tmp_path)
+    assert calls == []
+    collection = main_functions.build_collection(library, lazyTags=True)
+    write_col(collection, tmp_path)
+    assert calls == [collection]
+    assert not collection.lazyTags
+    write_col(collection, tmp_path)
+    assert calls == [collection]
+
+# the walk waits for the workers beyond maxPending submitted reads, the results are attached meanwhile
+def test_tag_pool_bounded(library):
+    folderNode = node_classes.FolderNode("root")
+    tagPool = utils_tag.TagPool(2, maxPending=2)
+    layout = tagPool.new_layout(folderNode)
+    with os.scandir(library) as it:
+        entries = sorted((entry for entry in it if entry.is_file()), key=lambda entry: entry.name)
+    for entry in entries:
+        tagPool.add_file(layout, entry)
+        assert layout[2] < 2
+    tagPool.close_layout(layout)
+    tagPool.join()
+    assert [child.name for child in folderNode.children] == [entry.name for entry in entries]
+    assert all(child.title for child in folderNode.children)
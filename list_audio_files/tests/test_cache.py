@@ -0,0 +1,40 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_cache, the persistent tag cache
+##################################################################
+
+import collections
+import main_functions
+import utils_cache
+from conftest import write_col
+
+# the fields of a stat read by the cache
+Stat = collections.namedtuple("Stat", "st_size st_mtime_ns st_ino")
+
+TAGS = (4096, 10.0, 44100, "title", "artist", "album", "1", "2000", None, "genre", 16, 2, False)
+
+# a rescan reads no tag of the unchanged files, and gives the same col file
+def test_rescan_hits(library, tmp_path):
+    tagCache = utils_cache.TagCache(str(tmp_path / "tags.sqlite"))
+    expected = write_col(main_functions.build_collection(library, tagCache), tmp_path, "first.col")
+    iFiles = tagCache.misses
+    assert tagCache.hits == 0 and iFiles > 0
+    assert write_col(main_functions.build_collection(library, tagCache), tmp_path, "second.col") == expected
+    assert tagCache.hits == iFiles and tagCache.misses == iFiles
+    tagCache.close()
+
+# the inode is compared only when both are known : a DirEntry stat on Windows has none
+def test_unknown_inode(tmp_path):
+    tagCache = utils_cache.TagCache(str(tmp_path / "tags.sqlite"))
+    tagCache.put("a.mp3", Stat(4096, 1000, 0), TAGS)
+    assert tagCache.get("a.mp3", Stat(4096, 1000, 1234)) == TAGS
+    tagCache.put("b.mp3", Stat(4096, 1000, 1234), TAGS)
+    assert tagCache.get("b.mp3", Stat(4096, 1000, 0)) == TAGS
+    assert tagCache.get("b.mp3", Stat(4096, 1000, 1234)) == TAGS
+    # a known inode which changed, a size or a time which changed : the file was replaced
+    assert tagCache.get("b.mp3", Stat(4096, 1000, 5678)) is None
+    assert tagCache.get("b.mp3", Stat(8192, 1000, 1234)) is None
+    assert tagCache.get("b.mp3", Stat(4096, 2000, 1234)) is None
+    assert (tagCache.hits, tagCache.misses) == (3, 3)
+    tagCache.close()
@@ -0,0 +1,64 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_compress, the compressed col files
+##################################################################
+
+import os
+import pytest
+import main_functions
+import utils_compress
+import utils_reader
+import utils_writer
+from conftest import write_col
+
+def test_compression_of():
+    assert utils_compress.compression_of("collection.col") is None
+    assert utils_compress.compression_of("collection.col.gz") == "gzip"
+    assert utils_compress.compression_of("COLLECTION.COL.BZ2") == "bz2"
+    assert utils_compress.compression_of("collection.col.xz") == "lzma"
+
+def test_resolve_compression():
+    assert utils_compress.resolve_compression("collection.col.gz") == "gzip"
+    assert utils_compress.resolve_compression("collection.col.gz", utils_compress.COMPRESSION_NONE) is None
+    assert utils_compress.resolve_compression("collection.col", "bz2") == "bz2"
+    with pytest.raises(ValueError):
+        utils_compress.resolve_compression("collection.col", "zip")
+
+# the compression of a file is detected from its first bytes, whatever its extension, and it reads back
+@pytest.mark.parametrize("name", ["collection.col.gz", "collection.col.bz2", "collection.col.xz"])
+def test_detect_and_read(library, tmp_path, name):
+    collection = main_functions.build_collection(library)
+    expected = write_col(collection, tmp_path, "plain.col")
+    write_col(collection, tmp_path, name)
+    sPath = str(tmp_path / name)
+    assert utils_compress.detect_compression(sPath) == utils_compress.compression_of(name)
+    assert utils_compress.detect_compression(str(tmp_path / "plain.col")) is None
+    os.rename(sPath, str(tmp_path / "renamed.col"))
+    assert utils_compress.detect_compression(str(tmp_path / "renamed.col")) == utils_compress.compression_of(name)
+    with utils_compress.open_read(str(tmp_path / "renamed.col")) as colFile:
+        assert colFile.read() == expected
+    assert write_col(utils_reader.read_collection(str(tmp_path / "renamed.col")), tmp_path, "read.col") == expected
+
+# a gzip col file is the same for the same collection, its header has no time
+def test_gzip_reproducible(library, tmp_path):
+    collection = main_functions.build_collection(library)
+    assert write_col(collection, tmp_path, "first.col.gz") == write_col(collection, tmp_path, "second.col.gz")
+
+# a write failing midway keeps the previous col file and leaves no temporary file
+def test_failed_write_keeps_file(library, tmp_path, monkeypatch):
+    collection = main_functions.build_collection(library)
+    previous = write_col(collection, tmp_path, "collection.col.gz")
+    writeFileLine = utils_writer.write_file_line
+    lines = []
+    # the 10th file line fails, after the first blocks are compressed
+    def failing_write_file_line(colFile, fileNode, iDepth=None):
+        lines.append(fileNode)
+        if len(lines) == 10:
+            raise OSError("disk full")
+        writeFileLine(colFile, fileNode, iDepth)
+    monkeypatch.setattr(utils_writer, "write_file_line", failing_write_file_line)
+    with pytest.raises(OSError):
+        write_col(collection, tmp_path, "collection.col.gz")
+    assert (tmp_path / "collection.col.gz").read_bytes() == previous
+    assert sorted(os.listdir(tmp_path)) == ["collection.col.gz"]
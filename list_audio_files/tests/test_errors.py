@@ -0,0 +1,96 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_errors, the tolerant scan mode
+##################################################################
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+import main_functions
+import node_classes
+import utils_cache
+import utils_errors
+import utils_tag
+
+# private method audio_entry
+# Returns the os.DirEntry of the first audio file of sPath
+def __audio_entry(sPath :str):
+    with os.scandir(sPath) as it:
+        return sorted((entry for entry in it if entry.name.endswith((".mp3", ".flac"))), key=lambda entry: entry.name)[0]
+
+# a file removed between the listing and its stat is recorded and skipped, not raised
+def test_stat_error_recorded(library_copy, tmp_path):
+    tagCache = utils_cache.TagCache(str(tmp_path / "tags.db"))
+    errors = utils_errors.ScanErrors(timeout=5)
+    entry = __audio_entry(library_copy)
+    os.remove(entry.path)
+    assert main_functions.read_file_tags(entry, tagCache, errors=errors) is None
+    folderNode = node_classes.FolderNode("root")
+    tagPool = utils_tag.TagPool(2, tagCache=tagCache, errors=errors)
+    layout = tagPool.new_layout(folderNode)
+    tagPool.add_file(layout, entry)
+    tagPool.close_layout(layout)
+    tagPool.join()
+    assert len(folderNode.children) == 0
+    assert [record["error"] for record in errors.records] == ["FileNotFoundError", "FileNotFoundError"]
+    with pytest.raises(FileNotFoundError):
+        main_functions.read_file_tags(entry, tagCache)
+    tagCache.close()
+    errors.close()
+
+# a corrupt file is skipped, or kept with its size only (keepPartial)
+@pytest.mark.parametrize("keepPartial", (False, True))
+def test_corrupt_file(library_copy, keepPartial):
+    entry = __audio_entry(library_copy)
+    with open(entry.path, "wb") as audioFile:
+        audioFile.write(b"not an audio file")
+    errors = utils_errors.ScanErrors(timeout=5, keepPartial=keepPartial)
+    collection = main_functions.build_collection(library_copy, errors=errors)
+    errors.close()
+    assert [record["path"] for record in errors.records] == [entry.path]
+    names = [child.name for child in collection.children[0].children]
+    assert (entry.name in names) == keepPartial
+
+# a read given up frees its thread when it returns, the executor is replaced only when all its threads are blocked
+def test_timeout_blocked_threads(tmp_path):
+    release = threading.Event()
+
+    def slowTags(sPath :str):
+        if sPath == "slow":
+            release.wait(10)
+        return (1, 1.0, 44100, None, None, None, None, None, None, None, None, None, False)
+
+    errors = utils_errors.ScanErrors(timeout=0.05, retries=0, workers=2)
+    executor = errors._executor
+    assert errors.read_tags(slowTags, "slow") == (None, True)
+    assert errors._blocked == 1
+    release.set()
+    # the thread of the read given up returns
+    for i in range(100):
+        if errors._blocked == 0:
+            break
+        time.sleep(0.05)
+    assert errors._blocked == 0
+    # the slow reads block both threads, the executor is replaced
+    release.clear()
+    errors.read_tags(slowTags, "slow")
+    errors.read_tags(slowTags, "slow")
+    assert errors._executor is not executor
+    assert errors.read_tags(slowTags, "fast")[1] is False
+    release.set()
+    errors.close()
+
+# a read blocked forever (a stalled mount) does not keep the process from exiting once the scan is done
+def test_blocked_read_exit():
+    script = ("import threading, utils_errors\n"
+              "errors = utils_errors.ScanErrors(timeout=0.1, retries=1, workers=2)\n"
+              "print(errors.read_tags(lambda sPath: threading.Event().wait(), 'stalled'))\n"
+              "errors.close()\n")
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(utils_errors.__file__),
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0
+    assert "(None, True)" in result.stdout
@@ -0,0 +1,68 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_filter, the rules of the walk, in the build modes
+##################################################################
+
+import argparse
+import os
+import shutil
+import main_functions
+import pipeline_functions
+import utils_filter
+import utils_state
+from conftest import write_col
+
+# private method file_paths
+# Returns the relative paths of the files of a collection, "/" separated
+def __file_paths(collection):
+    paths = []
+    stack = [(child, child.name) for child in collection.children[0].children]
+    while stack:
+        node, sPath = stack.pop()
+        if node.children:
+            stack.extend((child, sPath + "/" + child.name) for child in node.children)
+        elif node.name.endswith((".mp3", ".flac")):
+            paths.append(sPath)
+    return sorted(paths)
+
+def test_rules(library):
+    everything = __file_paths(main_functions.build_collection(library))
+    cases = [(utils_filter.ScanFilter(exclude=["dir 1-1"]), lambda sPath: not sPath.startswith("dir 1-1/")),
+             (utils_filter.ScanFilter(maxDepth=1), lambda sPath: sPath.count("/") <= 1),
+             (utils_filter.ScanFilter(maxDepth=0), lambda sPath: "/" not in sPath),
+             (utils_filter.ScanFilter(include=["*.flac"]), lambda sPath: sPath.endswith(".flac")),
+             (utils_filter.ScanFilter(include=["dir 1-0/*"]), lambda sPath: sPath.startswith("dir 1-0/")),
+             (utils_filter.ScanFilter(excludeRegex=["2-[12]$"]), lambda sPath: "2-1/" not in sPath and "2-2/" not in sPath),
+             (utils_filter.ScanFilter(minSize=1 << 30), lambda sPath: False)]
+    for scanFilter, accept in cases:
+        expected = [sPath for sPath in everything if accept(sPath)]
+        assert __file_paths(main_functions.build_collection(library, scanFilter=scanFilter)) == expected
+        assert __file_paths(pipeline_functions.pipeline_collection(library, scanFilter=scanFilter)) == expected
+
+def test_hidden_and_system(library_copy):
+    for name in (".hidden", "@eaDir"):
+        shutil.copytree(os.path.join(library_copy, "dir 1-0"), os.path.join(library_copy, name))
+    paths = __file_paths(main_functions.build_collection(library_copy, scanFilter=utils_filter.ScanFilter(skipHidden=True)))
+    assert not any(sPath.startswith(".hidden/") for sPath in paths)
+    assert any(sPath.startswith("@eaDir/") for sPath in paths)
+    parser = argparse.ArgumentParser()
+    utils_filter.add_arguments(parser)
+    assert utils_filter.from_arguments(parser.parse_args([])) is None
+    scanFilter = utils_filter.from_arguments(parser.parse_args(["--skip-system", "--skip-hidden"]))
+    paths = __file_paths(main_functions.build_collection(library_copy, scanFilter=scanFilter))
+    assert not any(sPath.startswith((".hidden/", "@eaDir/")) for sPath in paths)
+
+# an incremental run keeps the rules : the changed folders and the new ones are filtered like a full scan
+def test_rescan_filtered(library_copy, tmp_path):
+    scanFilter = utils_filter.ScanFilter(exclude=["dir 1-1"])
+    folderState = utils_state.FolderState()
+    collection = main_functions.build_collection(library_copy, folderState=folderState, scanFilter=scanFilter)
+    # a new folder with an excluded sub folder, in the root whose modification time changes
+    shutil.copytree(os.path.join(library_copy, "dir 1-1"), os.path.join(library_copy, "new", "dir 1-1"))
+    shutil.copy(os.path.join(library_copy, "dir 1-0", "dir 2-0", sorted(os.listdir(os.path.join(library_copy, "dir 1-0", "dir 2-0")))[0]),
+                os.path.join(library_copy, "new"))
+    main_functions.rescan_collection(library_copy, collection, utils_state.FolderState(folderState.current), None, scanFilter)
+    expected = write_col(main_functions.build_collection(library_copy, scanFilter=scanFilter), tmp_path, "build.col")
+    assert write_col(collection, tmp_path, "rescan.col") == expected
+    assert not any("dir 1-1" in sPath for sPath in __file_paths(collection))
@@ -0,0 +1,96 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_header, the header-only parser, against TinyTag
+##################################################################
+
+import os
+import random
+import struct
+import utils_generator
+import utils_header
+import utils_tag
+
+# the MPEG 1 layer 3 bitrates (kbit/s) by bitrate index
+__BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+
+# private method frame
+# Returns a MPEG 1 layer 3 frame, 44100 Hz, joint stereo, without padding, its content is zeros or data
+def __frame(iBitrateIndex :int, data :bytes = b""):
+    iLength = 144 * __BITRATES[iBitrateIndex] * 1000 // 44100
+    return b"\xff\xfb" + bytes((iBitrateIndex << 4, 0x40)) + data + b"\x00" * (iLength - 4 - len(data))
+
+# private method id3v1
+# Returns an ID3v1.1 tag with a track number and a genre number
+def __id3v1(title :str, iTrack :int, iGenre :int):
+    return (b"TAG" + title.encode("latin-1").ljust(30, b"\x00") + b"artist".ljust(30, b"\x00")
+            + b"album".ljust(30, b"\x00") + b"1999" + b"comment".ljust(28, b"\x00") + bytes((0, iTrack, iGenre)))
+
+# private method assert_same
+# Checks the header parser gives the TinyTag tags, the estimated VBR durations within 10 % (both readers estimate them)
+def __assert_same(sPath :str):
+    expected = utils_tag.read_tags(sPath)
+    tags = utils_header.read_header_tags(sPath)
+    if tags[12]:
+        assert abs(tags[1] - expected[1]) <= expected[1] * 0.1
+        tags = tags[:1] + expected[1:2] + tags[2:12]
+    else:
+        tags = tags[:12]
+    assert tags == expected[:12]
+
+# the generated library : CBR mp3 with an ID3v2 tag and flac files
+def test_generated_library(library):
+    for sFolderPath, folders, files in os.walk(library):
+        for name in files:
+            __assert_same(os.path.join(sFolderPath, name))
+
+def test_mpeg_streams(tmp_path):
+    rnd = random.Random(7)
+    tag = utils_generator.mp3_bytes("title", "artist", "album", "3/12", "2001", "(17)", 0)
+    vbrFrames = b"".join(__frame(rnd.choice((9, 10, 11, 12, 13))) for i in range(3000))
+    xing = __frame(9, b"\x00" * 32 + b"Xing" + struct.pack(">ii", 3, 3000) + struct.pack(">i", len(vbrFrames)))
+    streams = {"cbr long.mp3": tag + __frame(9) * 3000,
+               "cbr id3v1.mp3": __frame(14) * 200 + __id3v1("v1 title", 5, 80),
+               "vbr xing.mp3": tag + xing + vbrFrames,
+               "vbr short.mp3": tag + b"".join(__frame(rnd.choice((1, 5, 9))) for i in range(40)),
+               "vbr long.mp3": tag + vbrFrames}
+    for name, content in streams.items():
+        sPath = os.path.join(str(tmp_path), name)
+        with open(sPath, "wb") as audioFile:
+            audioFile.write(content)
+        __assert_same(sPath)
+    assert utils_header.read_header_tags(os.path.join(str(tmp_path), "cbr id3v1.mp3"))[9] == "Folk"
+    assert utils_header.read_header_tags(os.path.join(str(tmp_path), "vbr long.mp3"))[12] is True
+
+# the reads are bounded : one block and the ID3v1 tag for a CBR stream, a few blocks for a VBR one without header
+def test_bounded_reads(tmp_path, monkeypatch):
+    reads = []
+
+    class CountingFile:
+        def __init__(self, sPath, mode):
+            self._file = open(sPath, mode)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self._file.close()
+
+        def read(self, iSize=-1):
+            data = self._file.read(iSize)
+            reads.append(len(data))
+            return data
+
+        def seek(self, iOffset, iWhence=0):
+            return self._file.seek(iOffset, iWhence)
+
+    monkeypatch.setattr(utils_header, "open", CountingFile, raising=False)
+    rnd = random.Random(3)
+    for name, content, iLimit in (("cbr.mp3", __frame(14) * 5000, 20 << 10),
+                                  ("vbr.mp3", b"".join(__frame(rnd.choice((9, 14))) for i in range(5000)), 70 << 10)):
+        sPath = os.path.join(str(tmp_path), name)
+        with open(sPath, "wb") as audioFile:
+            audioFile.write(content)
+        reads.clear()
+        utils_header.read_header_tags(sPath)
+        assert sum(reads) <= iLimit
@@ -0,0 +1,47 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_index, the tag indexes kept current while the tree changes
+##################################################################
+
+import main_functions
+import node_classes
+import utils_index
+
+# private method check
+# Checks the index gives the files of a walk of the tree, for every artist and genre
+def __check(collection, index):
+    files = [node for node in collection.descendants if isinstance(node, node_classes.FileNode)]
+    assert sorted(map(id, files)) == sorted(index.files)
+    for field in ("artist", "genre", "album"):
+        for value in {getattr(fileNode, field) for fileNode in files}:
+            expected = sorted((fileNode for fileNode in files if getattr(fileNode, field) == value), key=utils_index.node_path)
+            assert index.find(**{field: value}) == expected
+    expected = sorted((fileNode for fileNode in files if 1980 <= int(fileNode.year) <= 1985), key=utils_index.node_path)
+    assert index.find(year=(1980, 1985)) == expected
+
+def test_index_follows_moves(library):
+    collection = main_functions.build_collection(library)
+    index = utils_index.CollectionIndex(collection)
+    try:
+        __check(collection, index)
+        volume = collection.children[0]
+        first, second = [child for child in volume.children if isinstance(child, node_classes.FolderNode)][:2]
+        # a folder moved under another one, its files keep their index entries and get their new path
+        movedFile = next(node for node in first.descendants if isinstance(node, node_classes.FileNode))
+        first.parent = second
+        assert utils_index.node_path(movedFile).startswith(volume.name + "/" + second.name + "/" + first.name + "/")
+        __check(collection, index)
+        # a file detached, a file added
+        detached = next(child for child in second.children if isinstance(child, node_classes.FileNode))
+        detached.parent = None
+        node_classes.FileNode("new.mp3", 1024, 10, 44100, "title", "New Artist", "New Album", "1", "1982", None,
+                              "New Genre", 3, 2, parent=first)
+        __check(collection, index)
+        assert detached not in index.find(artist=detached.artist)
+        assert [fileNode.name for fileNode in index.find(artist="new artist")] == ["new.mp3"]
+        # a folder detached with its subtree
+        second.parent = None
+        __check(collection, index)
+    finally:
+        index.close()
@@ -0,0 +1,53 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of pipeline_functions, the asyncio pipeline
+##################################################################
+
+import os
+import threading
+import pytest
+import main_functions
+import pipeline_functions
+import utils_state
+from conftest import write_col
+
+def test_pipeline_same_col_file(library, tmp_path):
+    expected = write_col(main_functions.build_collection(library), tmp_path, "build.col")
+    for workers, queueSize in ((1, 2), (8, 1024)):
+        collection = pipeline_functions.pipeline_collection(library, None, None, workers, queueSize=queueSize)
+        assert write_col(collection, tmp_path, "pipeline.col") == expected
+
+# a tag error stops the scan, even when the only worker failed while the producer waits for room in its queue
+# the scan runs in a thread, so a hang fails the test instead of blocking the suite
+def test_pipeline_corrupt_files_raise(tmp_path):
+    for i in range(20):
+        with open(os.path.join(str(tmp_path), "%02d corrupt.flac" % i), "wb") as audioFile:
+            audioFile.write(b"not a flac file")
+    errors = []
+
+    def scan():
+        try:
+            pipeline_functions.pipeline_collection(str(tmp_path), None, None, 1, queueSize=2)
+        except Exception as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=scan, daemon=True)
+    thread.start()
+    thread.join(60)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+
+# the folder state of the pipeline is the one of build_collection, an incremental run after it finds no change
+def test_pipeline_folder_state(library, tmp_path):
+    buildState = utils_state.FolderState()
+    main_functions.build_collection(library, folderState=buildState)
+    pipelineState = utils_state.FolderState()
+    collection = pipeline_functions.pipeline_collection(library, None, None, 4, folderState=pipelineState)
+    assert pipelineState.current == buildState.current
+    expected = write_col(collection, tmp_path, "pipeline.col")
+    rescanState = utils_state.FolderState(pipelineState.current)
+    main_functions.rescan_collection(library, collection, rescanState)
+    assert rescanState.current == pipelineState.current
+    assert not any(rescanState.changed(sPath, mtime) for sPath, mtime in rescanState.current.items())
+    assert write_col(collection, tmp_path, "rescan.col") == expected
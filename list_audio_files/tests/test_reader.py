@@ -0,0 +1,40 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_reader, reading back the ".col" files of utils_writer
+##################################################################
+
+import main_functions
+import node_classes
+import utils_reader
+from conftest import write_col
+
+# a col file read back is written again byte for byte
+def test_round_trip(library, tmp_path):
+    expected = write_col(main_functions.build_collection(library), tmp_path, "build.col")
+    collection = utils_reader.read_collection(str(tmp_path / "build.col"))
+    assert write_col(collection, tmp_path, "read.col") == expected
+
+# the records follow the lines of the file, the amounts of the collection line are the ones of the tree
+def test_records(library, tmp_path):
+    collection = main_functions.build_collection(library)
+    write_col(collection, tmp_path)
+    records = list(utils_reader.iter_records(str(tmp_path / "collection.col")))
+    kinds = [kind for kind, iLevel, values in records]
+    assert kinds.count(utils_reader.RECORD_FILE) == collection.fileCount
+    assert kinds.count(utils_reader.RECORD_FOLDER) == collection.folderCount
+    assert records[0][2][3] == collection.fileCount
+
+# the new lines of a tag value or a name do not split the line, they are read back as spaces
+def test_new_lines_in_values(tmp_path):
+    collection = node_classes.CollectionNode("AudioCollection")
+    volume = node_classes.VolumeNode("music", parent=collection)
+    folder = node_classes.FolderNode("two\nlines", parent=volume)
+    node_classes.FileNode("01 track.mp3", 4096, 10, 44100, "title", "artist", "album", "1", "2000",
+                          "first line\r\nsecond line\nthird", "genre", 3, 2, False, parent=folder)
+    write_col(collection, tmp_path)
+    records = list(utils_reader.iter_records(str(tmp_path / "collection.col")))
+    assert [kind for kind, iLevel, values in records] == [utils_reader.RECORD_COLLECTION, utils_reader.RECORD_VOLUME,
+                                                          utils_reader.RECORD_FOLDER, utils_reader.RECORD_FILE]
+    assert records[2][2][0] == "two lines"
+    assert records[3][2][12] == "first line second line third"
@@ -0,0 +1,68 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of the incremental rescan (main_functions.rescan_collection)
+# of a collection read back from its ".col" file, whose names are not always the real ones
+##################################################################
+
+import os
+import shutil
+import pytest
+import main_functions
+import utils_reader
+import utils_state
+
+# private method names
+# Returns the names of the volumes, folders and files of a col file, with their kind and level
+# the totals of a rescanned collection read back are the rounded ones of the file, they are not compared
+def __names(sColFilePath :str, encoding :str):
+    return [(kind, iLevel, values[0]) for kind, iLevel, values in utils_reader.iter_records(sColFilePath, encoding, "replace")
+            if kind != utils_reader.RECORD_COLLECTION]
+
+# a folder with a new line and a folder with a character cp1252 has not, written in utf-8 or with "?"
+@pytest.mark.parametrize("encoding, encodingErrors", [("utf-8", None), (None, "replace")])
+def test_rescan_names(library_copy, tmp_path, monkeypatch, encoding, encodingErrors):
+    os.rename(os.path.join(library_copy, "dir 1-0"), os.path.join(library_copy, "two\nlines"))
+    os.rename(os.path.join(library_copy, "dir 1-1", "dir 2-0"), os.path.join(library_copy, "dir 1-1", "東京"))
+    folderState = utils_state.FolderState()
+    collection = main_functions.build_collection(library_copy, folderState=folderState)
+    sColFilePath = str(tmp_path / "collection.col")
+    main_functions.write_collection(collection, sColFilePath, False, encoding, encodingErrors=encodingErrors)
+    with open(sColFilePath, "rb") as colFile:
+        written = colFile.read()
+
+    # the tags read by the rescans
+    readPaths = []
+    readFileTags = main_functions.read_file_tags
+    def counting_read_file_tags(entry, *args, **kwargs):
+        readPaths.append(entry.path)
+        return readFileTags(entry, *args, **kwargs)
+    monkeypatch.setattr(main_functions, "read_file_tags", counting_read_file_tags)
+
+    # nothing changed : no folder is rebuilt, the nodes take their real names
+    previous = utils_reader.read_collection(sColFilePath, encoding, encodingErrors)
+    main_functions.rescan_collection(library_copy, previous, utils_state.FolderState(folderState.current))
+    assert readPaths == []
+    volume = previous.children[0]
+    assert "two\nlines" in [child.name for child in volume.children]
+    assert "東京" in [child.name for child in volume["dir 1-1"].children]
+    main_functions.write_collection(previous, sColFilePath, False, encoding, encodingErrors=encodingErrors)
+    with open(sColFilePath, "rb") as colFile:
+        assert colFile.read() == written
+
+    # a new file in both folders : only their tags are read
+    newPaths = []
+    for sFolderPath in (os.path.join(library_copy, "two\nlines", "dir 2-1"), os.path.join(library_copy, "dir 1-1", "東京")):
+        newPaths.append(os.path.join(sFolderPath, "new.mp3"))
+        shutil.copy(os.path.join(sFolderPath, sorted(os.listdir(sFolderPath))[0]), newPaths[-1])
+    previous = utils_reader.read_collection(sColFilePath, encoding, encodingErrors)
+    folderState = utils_state.FolderState(folderState.current)
+    main_functions.rescan_collection(library_copy, previous, folderState)
+    assert sorted(readPaths) == sorted(newPaths)
+    main_functions.write_collection(previous, sColFilePath, False, encoding, encodingErrors=encodingErrors)
+    names = __names(sColFilePath, encoding)
+    main_functions.write_collection(main_functions.build_collection(library_copy), sColFilePath, False, encoding,
+                                    encodingErrors=encodingErrors)
+    assert names == __names(sColFilePath, encoding)
+    # the state holds the real paths
+    assert os.path.join(library_copy, "two\nlines", "dir 2-1") in folderState.current
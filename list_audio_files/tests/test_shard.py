@@ -0,0 +1,40 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of shard_functions, the merged shards give the col file of a single build
+##################################################################
+
+import main_functions
+import shard_functions
+import utils_filter
+from conftest import write_col
+
+# the col file of a sharded scan is the one of build_collection
+def test_sharded_equals_build(library, tmp_path):
+    expected = write_col(main_functions.build_collection(library), tmp_path, "build.col")
+    sColFilePath = str(tmp_path / "sharded.col")
+    collection = shard_functions.scan_sharded(library, sColFilePath, str(tmp_path / "shards"), processes=2)
+    with open(sColFilePath, "rb") as colFile:
+        assert colFile.read() == expected
+    assert write_col(collection, tmp_path, "merged.col") == expected
+
+# the rules of a filter are the ones of the root in every shard
+def test_sharded_filtered(library, tmp_path):
+    scanFilter = utils_filter.ScanFilter(exclude=["dir 1-1", "dir 1-0/dir 2-2"], maxDepth=2)
+    expected = write_col(main_functions.build_collection(library, scanFilter=scanFilter), tmp_path, "build.col")
+    sColFilePath = str(tmp_path / "sharded.col")
+    shard_functions.scan_sharded(library, sColFilePath, str(tmp_path / "shards"), processes=2, scanFilter=scanFilter)
+    with open(sColFilePath, "rb") as colFile:
+        assert colFile.read() == expected
+
+# a missing shard is an error, not a partial collection
+def test_missing_shard(library, tmp_path):
+    sShardFolderPath = str(tmp_path / "shards")
+    shard_functions.scan_sharded(library, str(tmp_path / "sharded.col"), sShardFolderPath, processes=2)
+    sRootShardPath = str(tmp_path / "shards" / shard_functions.ROOT_SHARD_NAME)
+    try:
+        shard_functions.merge_shards(sRootShardPath, [str(tmp_path / "shards" / "0.shard")])
+    except ValueError as error:
+        assert "is missing" in str(error)
+    else:
+        raise AssertionError("merge_shards accepted a missing shard")
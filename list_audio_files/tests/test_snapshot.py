@@ -0,0 +1,35 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_snapshot, a collection saved and loaded gives the same col file
+##################################################################
+
+import pytest
+import main_functions
+import utils_compress
+import utils_snapshot
+from conftest import write_col
+
+# a snapshot loaded back, as a table or as nodes, writes the col file of the scanned collection
+@pytest.mark.parametrize("name", ["collection.snap", "collection.snap.gz", "collection.snap.xz"])
+def test_round_trip(library, tmp_path, name):
+    collection = main_functions.build_collection(library)
+    expected = write_col(collection, tmp_path, "build.col")
+    sSnapshotPath = str(tmp_path / name)
+    utils_snapshot.save_snapshot(collection, sSnapshotPath)
+    assert utils_compress.detect_compression(sSnapshotPath) == utils_compress.compression_of(name)
+    table = utils_snapshot.load_snapshot(sSnapshotPath)
+    assert write_col(table, tmp_path, "table.col") == expected
+    assert write_col(utils_snapshot.to_collection_node(table), tmp_path, "nodes.col") == expected
+
+# a snapshot of a loaded snapshot is the same file
+def test_save_table(library, tmp_path):
+    utils_snapshot.save_snapshot(main_functions.build_collection(library), str(tmp_path / "first.snap"))
+    utils_snapshot.save_snapshot(utils_snapshot.load_snapshot(str(tmp_path / "first.snap")), str(tmp_path / "second.snap"))
+    assert (tmp_path / "first.snap").read_bytes() == (tmp_path / "second.snap").read_bytes()
+
+# a file which is no snapshot is rejected
+def test_not_a_snapshot(tmp_path):
+    (tmp_path / "wrong.snap").write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        utils_snapshot.load_snapshot(str(tmp_path / "wrong.snap"))
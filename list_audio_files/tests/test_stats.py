@@ -0,0 +1,30 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_stats, the instrumentation of the scan
+##################################################################
+
+import main_functions
+import utils_reader
+import utils_stats
+from conftest import write_col
+
+# the previous col file gives the expected files, the callback gets the progress and the final statistics
+def test_progress_and_eta(library, tmp_path, capsys):
+    collection = main_functions.build_collection(library)
+    write_col(collection, tmp_path)
+    assert "[stats]" not in capsys.readouterr().out
+    expectedFiles = utils_reader.read_file_count(str(tmp_path / "collection.col"))
+    assert expectedFiles == collection.fileCount
+    calls = []
+    stats = utils_stats.ScanStats(lambda stats: calls.append((stats.running, stats.eta)), expectedFiles,
+                                  progressInterval=0.0)
+    main_functions.build_collection(library, stats=stats)
+    assert calls[-1][0] is False
+    running = [eta for isRunning, eta in calls if isRunning]
+    assert len(running) == collection.fileCount
+    assert all(eta is not None for eta in running)
+    assert running[-1] == 0
+
+def test_read_file_count_missing(tmp_path):
+    assert utils_reader.read_file_count(str(tmp_path / "missing.col")) is None
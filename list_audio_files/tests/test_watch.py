@@ -0,0 +1,85 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_watch, the watch mode
+##################################################################
+
+import os
+import shutil
+import threading
+import time
+import pytest
+import main_functions
+import utils_filter
+import utils_watch
+from conftest import write_col
+
+# private method watch
+# Runs a watcher for seconds, in a thread
+def __watch(watcher, seconds :float):
+    stopEvent = threading.Event()
+    watcher.start()
+    thread = threading.Thread(target=watcher.run, args=(stopEvent,), daemon=True)
+    thread.start()
+    time.sleep(seconds)
+    stopEvent.set()
+    thread.join(10)
+    assert not thread.is_alive()
+    watcher.close()
+
+# the col file and the folder state file under the root do not rewrite the col file again and again
+@pytest.mark.parametrize("usePolling", (True, False))
+def test_col_file_under_root(library_copy, usePolling):
+    watcher = utils_watch.CollectionWatcher(library_copy, os.path.join(library_copy, "collection.col"), debounce=0.05,
+                                            pollInterval=0.05, usePolling=usePolling,
+                                            folderStatePath=os.path.join(library_copy, "state.json"))
+    __watch(watcher, 1.0)
+    assert watcher.writes == 1
+
+# a new audio file is written once the changes stop
+def test_new_file_written(library_copy):
+    watcher = utils_watch.CollectionWatcher(library_copy, os.path.join(library_copy, "collection.col"), debounce=0.05)
+    watcher.start()
+    iFiles = watcher.collection.fileCount
+    stopEvent = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(stopEvent,), daemon=True)
+    thread.start()
+    sName = sorted(name for name in os.listdir(library_copy) if name.endswith((".mp3", ".flac")))[0]
+    with open(os.path.join(library_copy, sName), "rb") as audioFile:
+        content = audioFile.read()
+    with open(os.path.join(library_copy, "new " + sName), "wb") as audioFile:
+        audioFile.write(content)
+    time.sleep(1.0)
+    stopEvent.set()
+    thread.join(10)
+    watcher.close()
+    assert watcher.writes == 2
+    assert watcher.collection.fileCount == iFiles + 1
+
+# the rules of a filter are kept by the updates : the excluded folders, new or not, stay out of the collection
+@pytest.mark.parametrize("usePolling", (True, False))
+def test_filtered_watcher(library_copy, tmp_path, usePolling):
+    scanFilter = utils_filter.ScanFilter(exclude=["dir 1-1", ".Trash"], maxDepth=2)
+    watcher = utils_watch.CollectionWatcher(library_copy, str(tmp_path / "collection.col"), debounce=0.05,
+                                            pollInterval=0.05, usePolling=usePolling, scanFilter=scanFilter)
+    watcher.start()
+    stopEvent = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(stopEvent,), daemon=True)
+    thread.start()
+    sSourcePath = os.path.join(library_copy, "dir 1-0", "dir 2-0")
+    sName = sorted(name for name in os.listdir(sSourcePath) if name.endswith((".mp3", ".flac")))[0]
+    # a new folder excluded by name, a new file in an excluded folder, a new folder beyond the maximum depth,
+    # and a new file which is kept
+    for sFolderPath in (os.path.join(library_copy, ".Trash"), os.path.join(library_copy, "dir 1-1"),
+                        os.path.join(library_copy, "dir 1-0", "dir 2-0", "deep"), os.path.join(library_copy, "dir 1-2")):
+        os.makedirs(sFolderPath, exist_ok=True)
+        shutil.copy(os.path.join(sSourcePath, sName), os.path.join(sFolderPath, "new " + sName))
+    time.sleep(1.0)
+    stopEvent.set()
+    thread.join(10)
+    watcher.close()
+    expected = write_col(main_functions.build_collection(library_copy, scanFilter=scanFilter), tmp_path, "build.col")
+    assert write_col(watcher.collection, tmp_path, "watch.col") == expected
+    names = [node.name for node in watcher.collection.descendants]
+    assert ".Trash" not in names and "dir 1-1" not in names and "deep" not in names
+    assert "new " + sName in names
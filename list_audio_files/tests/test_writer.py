@@ -0,0 +1,81 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tests of utils_writer, the lines and the encoding of the ".col" file
+##################################################################
+
+import os
+import shutil
+import pytest
+import main_functions
+import node_classes
+import utils_reader
+import utils_state
+import utils_writer
+
+def test_lines():
+    assert utils_writer.format_collection_line(4096 * 1024 + 5, 61.9, 2, 30) == "\x014096\x0261\x032\x0430\x0545641\x06\n"
+    assert (utils_writer.format_volume_line("music", 2048, 10.5, 3, 12)
+            == "\tmusic\x012\x0210\x033\x0412\x0545641\x06-1832560112\x072\x08\n")
+    assert utils_writer.format_folder_line(2, "album", 3000, 9.9, 0, 4) == "\t\talbum\x012\x029\x030\x044\x05\n"
+
+# private method collection
+# Returns a collection of one file whose folder and title are name
+def __collection(name :str):
+    collection = node_classes.CollectionNode("AudioCollection")
+    volume = node_classes.VolumeNode("music", parent=collection)
+    folder = node_classes.FolderNode(name, parent=volume)
+    node_classes.FileNode("01 track.mp3", 4096, 10, 44100, name, None, None, None, None, None, None, 3, 2, parent=folder)
+    return collection
+
+# the col file is cp1252 whatever the platform, a character it has not stops the writing unless a handler is given
+def test_encoding(tmp_path):
+    sColFilePath = str(tmp_path / "collection.col")
+    main_functions.write_collection(__collection("Björk"), sColFilePath, False)
+    with open(sColFilePath, "rb") as colFile:
+        content = colFile.read()
+    assert b"Bj\xf6rk\x01" in content
+    with pytest.raises(ValueError, match="Björk 東京"):
+        main_functions.write_collection(__collection("Björk 東京"), sColFilePath, False)
+    # the previous file is kept
+    with open(sColFilePath, "rb") as colFile:
+        assert colFile.read() == content
+    assert os.listdir(tmp_path) == ["collection.col"]
+    # the handler can be chosen by the caller
+    main_functions.write_collection(__collection("Björk 東京"), sColFilePath, False, encodingErrors="replace")
+    records = list(utils_reader.iter_records(sColFilePath))
+    assert records[2][2][0] == "Björk ??"
+    assert records[3][2][7] == "Björk ??"
+    # the encoding too
+    main_functions.write_collection(__collection("Björk 東京"), sColFilePath, False, encoding="utf-8")
+    records = list(utils_reader.iter_records(sColFilePath, "utf-8"))
+    assert records[2][2][0] == "Björk 東京"
+
+# private method names
+# Returns the names of the volumes, folders and files of a utf-8 col file, with their kind and level
+# the totals of a rescanned collection read back are the rounded ones of the file, they are not compared
+def __names(sColFilePath :str):
+    return [(kind, iLevel, values[0]) for kind, iLevel, values in utils_reader.iter_records(sColFilePath, "utf-8")
+            if kind != utils_reader.RECORD_COLLECTION]
+
+# a folder whose name is not in cp1252 is written in utf-8, read back and rescanned
+def test_unencodable_rescan(library_copy, tmp_path):
+    os.rename(os.path.join(library_copy, "dir 1-0"), os.path.join(library_copy, "日本"))
+    folderState = utils_state.FolderState()
+    collection = main_functions.build_collection(library_copy, folderState=folderState)
+    sColFilePath = str(tmp_path / "collection.col")
+    with pytest.raises(ValueError, match="日本"):
+        main_functions.write_collection(collection, sColFilePath, False)
+    assert os.listdir(tmp_path) == ["lib"]
+    main_functions.write_collection(collection, sColFilePath, False, encoding="utf-8")
+    previous = utils_reader.read_collection(sColFilePath, "utf-8")
+    # a new file in a sub folder of the renamed folder
+    sFolderPath = os.path.join(library_copy, "日本", "dir 2-0")
+    shutil.copy(os.path.join(sFolderPath, sorted(os.listdir(sFolderPath))[0]), os.path.join(sFolderPath, "new.mp3"))
+    main_functions.rescan_collection(library_copy, previous, utils_state.FolderState(folderState.current))
+    main_functions.write_collection(previous, sColFilePath, False, encoding="utf-8")
+    names = __names(sColFilePath)
+    main_functions.write_collection(main_functions.build_collection(library_copy), sColFilePath, False, encoding="utf-8")
+    assert names == __names(sColFilePath)
+    assert (utils_reader.RECORD_FOLDER, 2, "日本") in names
+    assert (utils_reader.RECORD_FILE, 4, "new.mp3") in names
@@ -1,43 +1,43 @@
-##################################################################
-# How to write a audio file (mp3, flac) collection in a export file?
-#
-# This file gathers constants allowing to write a col file
-# Called by the writers in utils_writer
-##################################################################
-
-NUL     = "\x00"
-SOH     = "\x01"
-STX     = "\x02"
-ETX     = "\x03"
-EOT     = "\x04"
-ENQ     = "\x05"
-ACK     = "\x06"
-BEL     = "\x07"
-BS      = "\x08"
-TAB     = "\x09"
-HT      = "\x09"
-LF      = "\x0a"
-NL      = "\x0a"
-VT      = "\x0b"
-FF      = "\x0c"
-CR      = "\x0d"
-SO      = "\x0e"
-SI      = "\x0f"
-DLE     = "\x10"
-DC1     = "\x11"
-DC2     = "\x12"
-DC3     = "\x13"
-DC4     = "\x14"
-NAK     = "\x15"
-SYN     = "\x16"
-ETB     = "\x17"
-CAN     = "\x18"
-EM      = "\x19"
-SUB     = "\x1a"
-ESC     = "\x1b"
-FS      = "\x1c"
-GS      = "\x1d"
-RS      = "\x1e"
-US      = "\x1f"
-SP      = "\x20"
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers constants allowing to write a col file
+# Called by the writers in utils_writer
+##################################################################
+
+NUL     = "\x00"
+SOH     = "\x01"
+STX     = "\x02"
+ETX     = "\x03"
+EOT     = "\x04"
+ENQ     = "\x05"
+ACK     = "\x06"
+BEL     = "\x07"
+BS      = "\x08"
+TAB     = "\x09"
+HT      = "\x09"
+LF      = "\x0a"
+NL      = "\x0a"
+VT      = "\x0b"
+FF      = "\x0c"
+CR      = "\x0d"
+SO      = "\x0e"
+SI      = "\x0f"
+DLE     = "\x10"
+DC1     = "\x11"
+DC2     = "\x12"
+DC3     = "\x13"
+DC4     = "\x14"
+NAK     = "\x15"
+SYN     = "\x16"
+ETB     = "\x17"
+CAN     = "\x18"
+EM      = "\x19"
+SUB     = "\x1a"
+ESC     = "\x1b"
+FS      = "\x1c"
+GS      = "\x1d"
+RS      = "\x1e"
+US      = "\x1f"
+SP      = "\x20"
 DEL     = "\x7f"
\ No newline at end of file
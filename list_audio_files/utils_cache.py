@@ -0,0 +1,95 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the persistent tag cache used by build_collection
+# * class TagCache
+#   the tags read by utils_tag.read_tags are stored in a SQLite file
+#   keyed by the file path, and checked against size, mtime and inode (when both inodes are known)
+#   so a rescan only reads the tags of the new or changed files
+#   the cache can be shared by the threads scanning several volumes
+##################################################################
+
+import os
+import sqlite3
+import threading
+import utils_tag
+
+"""
+@attribute hits : amount of files whose tags were found in the cache
+@attribute misses : amount of files not found (or changed) in the cache
+@attribute evicted : amount of deleted files removed from the cache
+"""
+class TagCache:
+
+    # the tag columns, in the FileNode constructor order (see utils_tag.TAG_FIELDS)
+    __COLUMNS = ", ".join(utils_tag.TAG_FIELDS)
+
+    def __init__(self, sCachePath :str):
+        # the connection is shared by the scanning threads, the accesses are serialized by the lock
+        self._connection = sqlite3.connect(sCachePath, check_same_thread=False)
+        self._lock = threading.Lock()
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(tags)")]
+        if columns and columns[5:] != list(utils_tag.TAG_FIELDS):
+            # a cache written with other tag fields is dropped, the tags are read again
+            self._connection.execute("DROP TABLE tags")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS tags ("
+                                 "path TEXT PRIMARY KEY, fsize INTEGER, mtime INTEGER, inode INTEGER, run INTEGER, "
+                                 + self.__COLUMNS + ")")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY)")
+        # every scan is stamped with a new run id, the rows not stamped are the deleted files
+        self._run = self._connection.execute("INSERT INTO runs DEFAULT VALUES").lastrowid
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    # function get
+    # Returns the cached tags of sPath if the file did not change since it was cached
+    # param sPath : the audio file path
+    # param st : the os.stat_result of the file
+    # param exactDuration : if True, the tags whose duration was estimated (see utils_tag.read_tags_fast) are not used
+    # returns : the tags tuple (see utils_tag.read_tags) or None
+    def get(self, sPath :str, st :os.stat_result, exactDuration :bool = False):
+        with self._lock:
+            row = self._connection.execute("SELECT fsize, mtime, inode, " + self.__COLUMNS
+                                           + " FROM tags WHERE path = ?", (sPath,)).fetchone()
+            # the inode is compared only if both are known : the stat of an os.DirEntry has no inode on Windows (0),
+            # unlike os.stat, and the same file is read through both
+            if (row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns
+                    or (row[2] and st.st_ino and row[2] != st.st_ino) or (exactDuration and row[-1])):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute("UPDATE tags SET run = ? WHERE path = ?", (self._run, sPath))
+        # the flag is stored as an integer
+        return row[3:-1] + (bool(row[-1]),)
+
+    # function put
+    # Stores the tags of sPath in the cache
+    # param sPath : the audio file path
+    # param st : the os.stat_result of the file
+    # param tags : the tags tuple (see utils_tag.read_tags)
+    def put(self, sPath :str, st :os.stat_result, tags :tuple):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO tags (path, fsize, mtime, inode, run, " + self.__COLUMNS
+                                     + ") VALUES (?, ?, ?, ?, ?" + ", ?" * len(tags) + ")",
+                                     (sPath, st.st_size, st.st_mtime_ns, st.st_ino, self._run) + tuple(tags))
+
+    # function evict
+    # Removes from the cache the files under sBasePath which were not seen during this run
+    # param sBasePath : the scanned root folder path
+    # returns : the amount of evicted files
+    def evict(self, sBasePath :str):
+        sPrefix = os.path.join(sBasePath, "")
+        with self._lock:
+            cursor = self._connection.execute("DELETE FROM tags WHERE substr(path, 1, ?) = ? AND run <> ?",
+                                              (len(sPrefix), sPrefix, self._run))
+        self.evicted += cursor.rowcount
+        return cursor.rowcount
+
+    # function close
+    # Commits and closes the cache file
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+# end class TagCache
@@ -0,0 +1,97 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the compression of the export files (".col" files, snapshots)
+# * compression_of(path), the compression chosen by the file extension
+# * detect_compression(path), the compression of an existing file, from its first bytes
+# * open_write(rawFile, compression) and open_read(path), the streaming compressors and decompressors
+# the streams are the ones of the gzip, bz2 and lzma modules, the files are read and written by blocks
+# so a large collection is never held compressed in memory
+##################################################################
+
+import bz2
+import gzip
+import lzma
+
+# the compressions, by name : (the extensions choosing it, the first bytes of its files)
+COMPRESSIONS = {"gzip": ((".gz", ".gzip"), b"\x1f\x8b"),
+                "bz2": ((".bz2",), b"BZh"),
+                "lzma": ((".xz", ".lzma"), b"\xfd7zXZ\x00")}
+# the name of the uncompressed files
+COMPRESSION_NONE = "none"
+
+# function compression_of
+# Returns the compression chosen by the extension of a path
+# param sPath : the file path, like "collection.col.gz"
+# returns : the name of the compression in COMPRESSIONS, None for an uncompressed file
+def compression_of(sPath :str):
+    sLowerPath = sPath.lower()
+    for name, (extensions, magic) in COMPRESSIONS.items():
+        if sLowerPath.endswith(extensions):
+            return name
+    return None
+
+# end def compression_of
+
+# function resolve_compression
+# Returns the compression of a written file : the given one, else the one of the extension
+# param compression : a name of COMPRESSIONS, COMPRESSION_NONE, or None to choose by the extension
+# returns : the name of the compression in COMPRESSIONS, None to write the file uncompressed
+def resolve_compression(sPath :str, compression :str = None):
+    if compression is None:
+        return compression_of(sPath)
+    if compression == COMPRESSION_NONE:
+        return None
+    if compression not in COMPRESSIONS:
+        raise ValueError("[ERROR][resolve_compression] unknown compression [" + compression + "], expected one of "
+                         + ", ".join(list(COMPRESSIONS) + [COMPRESSION_NONE]))
+    return compression
+
+# end def resolve_compression
+
+# function detect_compression
+# Returns the compression of an existing file, from its first bytes, whatever its extension
+# returns : the name of the compression in COMPRESSIONS, None for an uncompressed file
+def detect_compression(sPath :str):
+    with open(sPath, "rb") as rawFile:
+        head = rawFile.read(6)
+    for name, (extensions, magic) in COMPRESSIONS.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+# end def detect_compression
+
+# function open_write
+# Returns a binary stream compressing into an open binary file, closing the stream ends the compressed data
+# but does not close rawFile
+# param rawFile : the binary file open for writing
+# param compression : the name of the compression in COMPRESSIONS
+def open_write(rawFile, compression :str):
+    if compression == "gzip":
+        # no file name nor time in the header, the same collection gives the same file
+        return gzip.GzipFile(filename="", mode="wb", compresslevel=6, fileobj=rawFile, mtime=0)
+    if compression == "bz2":
+        return bz2.BZ2File(rawFile, "wb")
+    if compression == "lzma":
+        return lzma.LZMAFile(rawFile, "wb")
+    raise ValueError("[ERROR][open_write] unknown compression [" + str(compression) + "]")
+
+# end def open_write
+
+# function open_read
+# Opens a file for reading, decompressed if it is compressed (see detect_compression)
+# param compression : the compression of the file if it is known, else it is detected
+# returns : a binary stream
+def open_read(sPath :str, compression :str = None):
+    if compression is None:
+        compression = detect_compression(sPath)
+    if compression == "gzip":
+        return gzip.open(sPath, "rb")
+    if compression == "bz2":
+        return bz2.open(sPath, "rb")
+    if compression == "lzma":
+        return lzma.open(sPath, "rb")
+    return open(sPath, "rb")
+
+# end def open_read
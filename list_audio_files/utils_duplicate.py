@@ -0,0 +1,135 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the duplicate finder over a built collection
+# * find_duplicates(collection, basePath(s), workers, useProcesses, partialSize)
+# the candidates are narrowed in stages, every stage only sees the groups of the previous one :
+# * the files of the same size (FileNode.size), no disk access
+# * then the same normalized tags (title, artist, album) and duration in seconds, no disk access
+# * then the same hash of the first and last partialSize bytes, read in a thread pool (or a process pool)
+# * then the same full content hash, only for the files larger than the partial hash regions
+# so the whole files are read only for the few real duplicate candidates
+##################################################################
+
+import concurrent.futures
+import hashlib
+import os
+import node_classes
+
+# the bytes read at once by the full hash
+__CHUNK_SIZE = 1 << 20
+
+# private method partial_hash
+# Returns the hash of the first and last iPartialSize bytes of a file (the whole file if it is smaller)
+# run in the pool, a module function so the process pool can pickle it
+def __partial_hash(sPath :str, iPartialSize :int):
+    digest = hashlib.blake2b()
+    with open(sPath, "rb") as audioFile:
+        digest.update(audioFile.read(iPartialSize))
+        iSize = os.fstat(audioFile.fileno()).st_size
+        if iSize > iPartialSize:
+            audioFile.seek(max(iSize - iPartialSize, iPartialSize))
+            digest.update(audioFile.read(iPartialSize))
+    return digest.digest()
+
+# private method full_hash
+# Returns the hash of the whole content of a file, run in the pool
+def __full_hash(sPath :str):
+    digest = hashlib.blake2b()
+    with open(sPath, "rb") as audioFile:
+        for chunk in iter(lambda: audioFile.read(__CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+# private method normalize
+# Returns the comparable form of a tag : lower case, without the surrounding and repeated spaces
+def __normalize(value):
+    if value is None:
+        return ""
+    return " ".join(str(value).casefold().split())
+
+# private method split_groups
+# Splits every group of files by key, only the new groups of 2 files or more are kept
+# param groups : the lists of (path, FileNode)
+# param key : function((path, FileNode)) or a dict {path: key}
+def __split_groups(groups, key):
+    result = []
+    for group in groups:
+        byKey = {}
+        for item in group:
+            byKey.setdefault(key[item[0]] if isinstance(key, dict) else key(item), []).append(item)
+        result.extend(subGroup for subGroup in byKey.values() if len(subGroup) > 1)
+    return result
+
+# private method hash_groups
+# Computes the hash of every file of the groups in the pool
+# returns : {path: hash}, a file which can not be read has no hash and is not a duplicate
+def __hash_groups(executor, groups, hashFunction, *args):
+    futures = {executor.submit(hashFunction, sPath, *args): sPath for group in groups for sPath, fileNode in group}
+    hashes = {}
+    for future in concurrent.futures.as_completed(futures):
+        try:
+            hashes[futures[future]] = future.result()
+        except OSError as error:
+            print("[ERROR][find_duplicates] can not read [" + futures[future] + "] : " + str(error))
+            # a unique key, the file stays alone in its group
+            hashes[futures[future]] = futures[future]
+    return hashes
+
+# private method collection_files
+# Returns the (path on disk, FileNode) of all the files of the collection, without recursion
+# param basePaths : the root folder path of every volume, in the volumes order
+def __collection_files(collectionNode, basePaths):
+    files = []
+    stack = list(zip(basePaths, collectionNode.children))
+    while stack:
+        sPath, folderNode = stack.pop()
+        for child in folderNode.children:
+            sChildPath = os.path.join(sPath, child.name)
+            if isinstance(child, node_classes.FileNode):
+                files.append((sChildPath, child))
+            else:
+                stack.append((sChildPath, child))
+    return files
+
+# function find_duplicates
+# Finds the audio files having the same content in a built collection
+# param collectionNode : the CollectionNode, from build_collection (or utils_reader.read_collection, whose sizes
+#                        are rounded to the kilobyte, then the size stage is less selective)
+# param sBasePath : the root folder path, or the list of root folder paths, as given to build_collection
+# param workers : the amount of files hashed at once
+# param useProcesses : if True the files are hashed in a process pool instead of a thread pool
+# param partialSize : the bytes hashed at the beginning and at the end of every file by the partial stage
+# returns : the groups of duplicates, lists of (path, FileNode) sorted by path, the groups sorted by their first path
+def find_duplicates(collectionNode :node_classes.CollectionNode, sBasePath, workers :int = 8,
+                    useProcesses :bool = False, partialSize :int = 4 << 20):
+    basePaths = [sBasePath] if isinstance(sBasePath, str) else list(sBasePath)
+    files = __collection_files(collectionNode, basePaths)
+    print("[debug][find_duplicates] " + str(len(files)) + " files")
+
+    groups = __split_groups([files], lambda item: item[1].size)
+    print("[debug][find_duplicates] size : " + str(sum(len(group) for group in groups)) + " candidates")
+    groups = __split_groups(groups, lambda item: (__normalize(item[1].title), __normalize(item[1].artist),
+                                                  __normalize(item[1].album),
+                                                  None if item[1].duration is None else round(item[1].duration)))
+    print("[debug][find_duplicates] tags : " + str(sum(len(group) for group in groups)) + " candidates")
+
+    if useProcesses:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    with executor:
+        groups = __split_groups(groups, __hash_groups(executor, groups, __partial_hash, partialSize))
+        print("[debug][find_duplicates] partial hash : " + str(sum(len(group) for group in groups)) + " candidates")
+        # the files not larger than the two partial regions were hashed whole
+        largeGroups = [group for group in groups if group[0][1].size > 2 * partialSize]
+        groups = [group for group in groups if group[0][1].size <= 2 * partialSize]
+        groups += __split_groups(largeGroups, __hash_groups(executor, largeGroups, __full_hash))
+    print("[debug][find_duplicates] full hash : " + str(sum(len(group) for group in groups)) + " duplicates in "
+          + str(len(groups)) + " groups")
+
+    groups = [sorted(group, key=lambda item: item[0]) for group in groups]
+    groups.sort(key=lambda group: group[0][0])
+    return groups
+
+# end def find_duplicates
@@ -0,0 +1,258 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the tolerant scan mode : a bad file or entry is recorded instead of aborting the scan
+# * class DaemonThreadPool
+#   the threads running the tag reads, a read blocked on a stalled mount does not keep the process from exiting
+# * class ScanErrors
+#   reads the tags with a timeout and a bounded amount of retries, a failing file is skipped
+#   or kept with the metadata of its stat only (keepPartial), the special entries (broken symlinks,
+#   sockets, FIFOs, devices) are classified, the folders which can not be listed are kept empty,
+#   and every problem is recorded in the error report
+# build_collection uses it when it is given (see its errors parameter)
+##################################################################
+
+import concurrent.futures
+import json
+import os
+import queue
+import stat
+import threading
+
+# the kinds of errors of the report
+ERROR_TAG = "tag"
+ERROR_TIMEOUT = "timeout"
+ERROR_SPECIAL = "special"
+ERROR_FOLDER = "folder"
+
+"""
+A minimal thread pool of daemon threads, with the submit and shutdown of concurrent.futures.ThreadPoolExecutor
+the threads of a ThreadPoolExecutor are joined when the interpreter exits, so a read blocked forever
+on a stalled mount would hang the end of the run : a daemon thread is not waited for
+@attribute workers : the maximum amount of threads, started as the calls are submitted
+"""
+class DaemonThreadPool:
+
+    def __init__(self, workers :int):
+        self.workers = workers
+        self._queue = queue.SimpleQueue()
+        self._threads = []
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+    # function submit
+    # Runs function(*args) in a thread of the pool
+    # returns : the concurrent.futures.Future of the call
+    def submit(self, function, *args):
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("[ERROR][DaemonThreadPool] submit after shutdown")
+            self._queue.put((future, function, args))
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self.__run, name="DaemonThreadPool-" + str(len(self._threads)),
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return future
+
+    # private method run
+    # The loop of a thread : runs the submitted calls until shutdown
+    def __run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, function, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = function(*args)
+            except BaseException as error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    # function shutdown
+    # Stops the threads once the submitted calls are done, a blocked thread stops when its call returns
+    # param wait : True to wait for the threads
+    def shutdown(self, wait :bool = True):
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+# end class DaemonThreadPool
+
+"""
+The tolerant mode settings and the error report of a scan
+a tag read is run in a thread of the ScanErrors, so a read blocked on a stalled mount is given up after timeout seconds
+(the thread itself can not be stopped, it ends when the read returns), the blocked threads are replaced
+the threads are daemon threads (see DaemonThreadPool) : a read still blocked at the end of the run
+does not keep the process from exiting
+@attribute timeout : the seconds given to one tag read, None to wait forever
+@attribute retries : the amount of reads tried again after a failure or a timeout
+@attribute keepPartial : True to keep a failing file with its size and empty tags, False to skip it
+@attribute records : the error report, a list of dicts (path, kind, error, message, attempts, action)
+@attribute stats : the utils_stats.ScanStats counting the tag errors, or None
+"""
+class ScanErrors:
+
+    # param workers : the tag reads in flight, at least the workers given to build_collection
+    def __init__(self, timeout :float = 30.0, retries :int = 1, keepPartial :bool = False, workers :int = 4):
+        self.timeout = timeout
+        self.retries = retries
+        self.keepPartial = keepPartial
+        self.records = []
+        self.stats = None
+        self._workers = workers
+        self._executor = DaemonThreadPool(workers)
+        # the reads given up on the current executor whose threads are still blocked
+        self._blocked = 0
+        self._lock = threading.Lock()
+
+    # private method record
+    # Adds an error to the report
+    def __record(self, sPath :str, kind :str, error, attempts :int, action :str):
+        message = error if isinstance(error, str) else str(error)
+        print("[ERROR][ScanErrors] " + kind + " [" + sPath + "] " + message + ", " + action)
+        with self._lock:
+            self.records.append({"path": sPath, "kind": kind,
+                                 "error": None if isinstance(error, str) else type(error).__name__,
+                                 "message": message, "attempts": attempts, "action": action})
+
+    # private method give_up
+    # Notes a read given up after a timeout, its thread is blocked until the read returns
+    # the executor is replaced once all its threads are blocked, so the next reads do not wait behind them
+    # param executor : the executor running the read
+    # param future : the future of the read
+    def __give_up(self, executor, future):
+        with self._lock:
+            if executor is self._executor:
+                self._blocked += 1
+        # called at once if the read returned meanwhile
+        future.add_done_callback(lambda future: self.__unblock(executor))
+        with self._lock:
+            if executor is self._executor and self._blocked >= self._workers:
+                self._executor.shutdown(wait=False)
+                self._executor = DaemonThreadPool(self._workers)
+                self._blocked = 0
+
+    # private method unblock
+    # Notes a read given up which returned at last, its thread is free again
+    def __unblock(self, executor):
+        with self._lock:
+            if executor is self._executor:
+                self._blocked -= 1
+
+    # function read_tags
+    # Reads the tags of a file with readTags, with the timeout and the retries
+    # param readTags : utils_tag.read_tags or utils_tag.read_tags_fast
+    # param sPath : the audio file path
+    # param st : the stat of the file, or None (it is read if a partial record is kept)
+    # returns : (tags, failed), the tags are the partial tags if the file fails and keepPartial,
+    #           None if it fails and is skipped
+    def read_tags(self, readTags, sPath :str, st=None):
+        error = None
+        for attempt in range(1, self.retries + 2):
+            with self._lock:
+                # the executor can be replaced by another thread (see give_up)
+                executor = self._executor
+                future = executor.submit(readTags, sPath)
+            try:
+                tags = future.result(self.timeout)
+            except concurrent.futures.TimeoutError:
+                error = "no answer after " + str(self.timeout) + " s"
+                self.__give_up(executor, future)
+                continue
+            except Exception as exception:
+                error = exception
+                continue
+            return self.validate(sPath, tags, attempt, st)
+        return self.failed(sPath, error, attempt, st)
+
+    # function validate
+    # Checks the tags read without error : a corrupt file can be read without audio stream,
+    # its unknown duration could not be added to the totals, so it fails (it is not read again)
+    # returns : like read_tags
+    def validate(self, sPath :str, tags :tuple, attempts :int, st=None):
+        if tags[1] is None:
+            return self.failed(sPath, ValueError("no audio stream found, the duration is unknown"), attempts, st)
+        return tags, False
+
+    # function failed
+    # Records a file whose tags can not be read
+    # param error : the exception, or a message for a timeout
+    # returns : like read_tags
+    def failed(self, sPath :str, error, attempts :int, st=None):
+        kind = ERROR_TIMEOUT if isinstance(error, str) else ERROR_TAG
+        if self.stats is not None:
+            self.stats.count("tagErrors")
+        if not self.keepPartial:
+            self.__record(sPath, kind, error, attempts, "skipped")
+            return None, True
+        try:
+            iSize = (st or os.stat(sPath)).st_size
+        except OSError:
+            iSize = 0
+        self.__record(sPath, kind, error, attempts, "partial")
+        # the size only, the duration and sample rate are 0 so the totals and the col file can be written
+        return (iSize, 0, 0, None, None, None, None, None, None, None, None, None, False), True
+
+    # function folder
+    # Records a folder which can not be listed, it is kept empty
+    # param entry : the os.DirEntry of the folder
+    # param error : the OSError
+    def folder(self, entry :os.DirEntry, error :OSError):
+        self.__record(entry.path, ERROR_FOLDER, error, 1, "empty")
+
+    # function special
+    # Classifies and records an entry which is neither a folder nor a regular file, it is skipped
+    # param entry : the os.DirEntry
+    def special(self, entry :os.DirEntry):
+        try:
+            mode = entry.stat(follow_symlinks=False).st_mode
+        except OSError as error:
+            self.__record(entry.path, ERROR_SPECIAL, error, 1, "skipped")
+            return
+        if stat.S_ISLNK(mode):
+            sKind = "broken symlink"
+        elif stat.S_ISSOCK(mode):
+            sKind = "socket"
+        elif stat.S_ISFIFO(mode):
+            sKind = "fifo"
+        elif stat.S_ISCHR(mode) or stat.S_ISBLK(mode):
+            sKind = "device"
+        else:
+            sKind = "unknown entry type " + oct(stat.S_IFMT(mode))
+        self.__record(entry.path, ERROR_SPECIAL, sKind, 1, "skipped")
+
+    # function as_dict
+    # Returns the report as a dict of plain values (JSON serializable) : the amount of errors by kind and the records
+    def as_dict(self):
+        counts = {}
+        for record in self.records:
+            counts[record["kind"]] = counts.get(record["kind"], 0) + 1
+        return {"errors": len(self.records), "kinds": counts, "records": list(self.records)}
+
+    # function save
+    # Writes the report in a JSON file
+    def save(self, sReportPath :str):
+        with open(sReportPath, "w", encoding="utf-8") as reportFile:
+            json.dump(self.as_dict(), reportFile, indent=2)
+
+    # function close
+    # Stops the reading threads, the blocked ones are not waited for (they are daemon threads)
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def __str__(self):
+        report = self.as_dict()
+        return ("[errors] " + str(report["errors"]) + " errors"
+                + "".join(", " + kind + " " + str(count) for kind, count in report["kinds"].items()))
+
+# end class ScanErrors
@@ -1,45 +1,95 @@
-##################################################################
-# How to write a audio file (mp3, flac) collection in a export file?
-#
-# This file gathers the functions handling folders or files counting, and relative path
-##################################################################
-
-import os
-
-def __countFoldersInDir(pPath):
-    total = sum([len(folder) for r, d, folder in os.walk(path)])
-    #print("[debug][countFilesInDir] pPath/countFiles=["+pPath+"]["+str(total)+"]")
-    return total
-# end def countFoldersInDir
-
-def __countFilesInDir(pPath):
-    total = sum([len(files) for r, d, files in os.walk(pPath)])
-    #print("[debug][countFilesInDir] pPathcountFolders=["+pPath+"]["+str(total)+"]")
-    return total
-# end def countFilesInDir
-
-def __countSizeInDir(pPath):
-    total = 0
-    with os.scandir(pPath) as it:
-        for entry in it:
-            if entry.is_file():
-                total += entry.stat().st_size
-            elif entry.is_dir():
-                total += countSizeInDir(entry.path)
-    #print("[debug][countSizeInDir] Path    =["+pPath+"] has totalSize [" + str(total) + "]")
-    return total
-# end def countSizeInDir
-
-def relativePath(pPath):
-    # Split the path
-    # @param pPath : example "G:/dir_a/dir_b/dir_c"
-    # @return the relative path, example "dir_c"
-    normPath = os.path.normpath(pPath)
-    pathArray = normPath.split(os.sep)
-    #print("[debug][relativePath] path : '% s:'" % pPath )
-    #print("[debug][relativePath] path.length : '% s:'" % pPath, len(pathArray)  )
-    returnPath = pathArray[ len(pathArray) - 1 ]
-    #print("[debug][relativePath] return '% s:'" % returnPath)
-    return returnPath
-
-# end def relativePath
\ No newline at end of file
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the functions handling folders or files counting, and relative path
+# and the folder tree walker walk_tree used to build the collection
+##################################################################
+
+import os
+import utils_filter
+
+def __countFoldersInDir(pPath):
+    total = sum([len(folder) for r, d, folder in os.walk(path)])
+    #print("[debug][countFilesInDir] pPath/countFiles=["+pPath+"]["+str(total)+"]")
+    return total
+# end def countFoldersInDir
+
+def __countFilesInDir(pPath):
+    total = sum([len(files) for r, d, files in os.walk(pPath)])
+    #print("[debug][countFilesInDir] pPathcountFolders=["+pPath+"]["+str(total)+"]")
+    return total
+# end def countFilesInDir
+
+def __countSizeInDir(pPath):
+    total = 0
+    with os.scandir(pPath) as it:
+        for entry in it:
+            if entry.is_file():
+                total += entry.stat().st_size
+            elif entry.is_dir():
+                total += countSizeInDir(entry.path)
+    #print("[debug][countSizeInDir] Path    =["+pPath+"] has totalSize [" + str(total) + "]")
+    return total
+# end def countSizeInDir
+
+def relativePath(pPath):
+    # Split the path
+    # @param pPath : example "G:/dir_a/dir_b/dir_c"
+    # @return the relative path, example "dir_c"
+    normPath = os.path.normpath(pPath)
+    pathArray = normPath.split(os.sep)
+    #print("[debug][relativePath] path : '% s:'" % pPath )
+    #print("[debug][relativePath] path.length : '% s:'" % pPath, len(pathArray)  )
+    returnPath = pathArray[ len(pathArray) - 1 ]
+    #print("[debug][relativePath] return '% s:'" % returnPath)
+    return returnPath
+
+# end def relativePath
+
+# function walk_tree
+# Walks the folder tree under pPath with os.scandir, depth first in the directory order
+# an explicit stack is used instead of recursion, so the depth is not limited by the recursion limit
+# and the os.DirEntry type and stat information are reused (no isfile / isdir calls)
+# @param pPath : the root folder path
+# @param rootParent : the parent given with the entries of pPath
+# @param enterFolder : function(parent, entry) called for every sub folder entry,
+#                      returns the parent given with the entries of the sub folder (None to skip the sub folder)
+# @param leaveFolder : optional function(parent) called once all the entries of a folder are walked
+# @param onError : optional function(entry, error) called when a sub folder can not be listed (OSError),
+#                  the sub folder is then walked as an empty folder, without onError the error is raised
+# @param scanFilter : optional utils_filter.ScanFilter, a rejected sub folder is not entered (enterFolder is not called)
+#                     and a rejected entry is not given
+# @yield (parent, entry) for every entry which is not a folder
+def walk_tree(pPath, rootParent, enterFolder, leaveFolder=None, onError=None, scanFilter=None):
+    # the length of the root path, the relative paths of the filter are cut after it
+    iRootLength = len(os.path.join(pPath, ""))
+    # the listing is read at once so only one folder is opened at a time
+    with os.scandir(pPath) as it:
+        stack = [(rootParent, iter(list(it)))]
+    while stack:
+        parent, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            if leaveFolder is not None:
+                leaveFolder(parent)
+        elif entry.is_dir():
+            # the depth of the sub folder is the amount of folders listed
+            if scanFilter is not None and not scanFilter.accept_folder(entry, utils_filter.relative_path(entry, iRootLength),
+                                                                       len(stack)):
+                continue
+            child = enterFolder(parent, entry)
+            if child is not None:
+                try:
+                    with os.scandir(entry.path) as it:
+                        entries = list(it)
+                except OSError as error:
+                    if onError is None:
+                        raise
+                    onError(entry, error)
+                    entries = []
+                stack.append((child, iter(entries)))
+        elif scanFilter is None or scanFilter.accept_file(entry, utils_filter.relative_path(entry, iRootLength)):
+            yield parent, entry
+
+# end def walk_tree
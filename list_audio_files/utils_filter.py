@@ -0,0 +1,205 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the filters of a scan, evaluated by the walkers before a folder is listed or a file read
+# * class ScanFilter
+#   the include and exclude rules (globs and regular expressions), the hidden entries, the maximum depth
+#   and the file size limits
+# * add_arguments(parser) and from_arguments(args), the command line options of the scripts
+# an excluded folder is not entered, so its subtree costs no listing, no stat and no tag read
+##################################################################
+
+import copy
+import fnmatch
+import os
+import re
+import utils_format
+
+# the folders of the system and of the NAS, skipped by the --skip-system option
+SYSTEM_EXCLUDES = (".Trash*", "@eaDir", "#recycle", "$RECYCLE.BIN", "System Volume Information", "lost+found")
+
+"""
+The rules of a scan, matched against the relative path from the root ("/" separated) or the name
+a glob without "/" matches the name of the entry, a glob with "/" its relative path (like fnmatch, "*" crosses the "/")
+a regular expression is searched in the relative path
+* exclude : a matching folder is not entered, a matching file is skipped
+* include : only the audio files matching one of the rules are kept, the folders which can not contain
+  a match of a glob with "/" are not entered (a rule on the name or a regular expression can match anywhere)
+* hidden : the entries whose name begins with "." are skipped
+* maxDepth : the folders deeper than maxDepth are not entered, 0 keeps the files of the root only
+* minSize, maxSize : the audio files out of these limits (in bytes, included) are skipped, their stat is the only cost
+the rules on the names and paths are evaluated first, without system call
+@attribute maxDepth : the deepest folder entered (1 for the sub folders of the root), None without limit
+@attribute minSize : the smallest audio file kept, in bytes, None without limit
+@attribute maxSize : the largest audio file kept, in bytes, None without limit
+@attribute skipHidden : True to skip the hidden entries
+@attribute prefix : the relative path of the walked folder from the root of the rules, "" for the root (see subtree)
+"""
+class ScanFilter:
+
+    # param include, exclude : the glob rules
+    # param includeRegex, excludeRegex : the regular expression rules, as strings or compiled patterns
+    def __init__(self, include=(), exclude=(), includeRegex=(), excludeRegex=(), maxDepth :int = None,
+                 minSize :int = None, maxSize :int = None, skipHidden :bool = False):
+        self.maxDepth = maxDepth
+        self.minSize = minSize
+        self.maxSize = maxSize
+        self.skipHidden = skipHidden
+        self.prefix = ""
+        self._depthOffset = 0
+        self._excludeName, self._excludePath = ScanFilter.__compile_globs(exclude)
+        self._excludeRegex = ScanFilter.__compile_regexes(excludeRegex)
+        self._includeName, self._includePath = ScanFilter.__compile_globs(include)
+        self._includeRegex = ScanFilter.__compile_regexes(includeRegex)
+        self._hasInclude = bool(include or includeRegex)
+        # the folders can only be pruned by the include globs with "/", split in parts
+        self._includeParts = None
+        if self._hasInclude and not includeRegex and all("/" in rule for rule in include):
+            self._includeParts = [rule.strip("/").split("/") for rule in include]
+
+    # private method compile_globs
+    # Returns the globs as two regular expressions, the one of the names and the one of the paths (None if empty)
+    @staticmethod
+    def __compile_globs(globs):
+        names = [fnmatch.translate(rule) for rule in globs if "/" not in rule]
+        paths = [fnmatch.translate(rule.strip("/")) for rule in globs if "/" in rule]
+        return (re.compile("|".join(names)) if names else None), (re.compile("|".join(paths)) if paths else None)
+
+    # private method compile_regexes
+    # Returns the regular expressions as one, None if empty
+    @staticmethod
+    def __compile_regexes(regexes):
+        if not regexes:
+            return None
+        return re.compile("|".join("(?:" + (rule.pattern if isinstance(rule, re.Pattern) else rule) + ")"
+                                   for rule in regexes))
+
+    # private method excluded
+    # Returns True if the name or the relative path matches an exclude rule, or if the entry is hidden
+    def __excluded(self, name :str, sRelativePath :str):
+        if self.skipHidden and name.startswith("."):
+            return True
+        if self._excludeName is not None and self._excludeName.match(name):
+            return True
+        if self._excludePath is not None and self._excludePath.match(sRelativePath):
+            return True
+        return self._excludeRegex is not None and self._excludeRegex.search(sRelativePath) is not None
+
+    # private method may_include
+    # Returns True if a folder can contain a file matching an include glob with "/"
+    # the parts of the globs are compared with the parts of the folder path until a "*", which can cross the "/"
+    def __may_include(self, sRelativePath :str):
+        folderParts = sRelativePath.split("/")
+        for parts in self._includeParts:
+            for i, name in enumerate(folderParts):
+                if i == len(parts) - 1:
+                    # the folder is as deep as the file part of the glob
+                    if "*" in parts[i]:
+                        return True
+                    break
+                if "*" in parts[i]:
+                    return True
+                if not fnmatch.fnmatchcase(name, parts[i]):
+                    break
+            else:
+                return True
+        return False
+
+    # function accept_folder
+    # Returns True if the walker enters the folder
+    # param entry : the os.DirEntry of the folder
+    # param sRelativePath : the path of the folder from the root, "/" separated
+    # param iDepth : the depth of the folder, 1 for a sub folder of the root
+    def accept_folder(self, entry :os.DirEntry, sRelativePath :str, iDepth :int):
+        sRelativePath = self.prefix + sRelativePath
+        iDepth += self._depthOffset
+        if self.maxDepth is not None and iDepth > self.maxDepth:
+            return False
+        if self.__excluded(entry.name, sRelativePath):
+            return False
+        return self._includeParts is None or self.__may_include(sRelativePath)
+
+    # function accept_file
+    # Returns True if the walker gives the entry, which is not a folder
+    # the include rules and the size limits only apply to the audio files (see utils_format), the other entries
+    # are left to the caller
+    # param entry : the os.DirEntry
+    # param sRelativePath : the path of the entry from the root, "/" separated
+    def accept_file(self, entry :os.DirEntry, sRelativePath :str):
+        sRelativePath = self.prefix + sRelativePath
+        name = entry.name
+        if self.__excluded(name, sRelativePath):
+            return False
+        if not utils_format.format_of(name):
+            return True
+        if self._hasInclude and not ((self._includeName is not None and self._includeName.match(name))
+                                     or (self._includePath is not None and self._includePath.match(sRelativePath))
+                                     or (self._includeRegex is not None and self._includeRegex.search(sRelativePath))):
+            return False
+        if self.minSize is not None or self.maxSize is not None:
+            try:
+                # the stat is kept by the DirEntry, the tag cache reuses it
+                iSize = entry.stat().st_size
+            except OSError:
+                # a broken entry is left to the caller
+                return True
+            if self.minSize is not None and iSize < self.minSize:
+                return False
+            if self.maxSize is not None and iSize > self.maxSize:
+                return False
+        return True
+
+    # function subtree
+    # Returns the same rules for a walk of a sub folder of the walked folder (a shard, see shard_functions) :
+    # the relative paths of the walk are from the sub folder, the rules still see the ones from the root
+    # param sRelativePath : the name of the sub folder, or its path from the walked folder ("/" separated)
+    def subtree(self, sRelativePath :str):
+        scanFilter = copy.copy(self)
+        scanFilter.prefix = self.prefix + sRelativePath + "/"
+        scanFilter._depthOffset = self._depthOffset + sRelativePath.count("/") + 1
+        return scanFilter
+
+# end class ScanFilter
+
+# function relative_path
+# Returns the path of an entry from the root, "/" separated, for the rules of ScanFilter
+# param iRootLength : the length of the root path with its final separator, len(os.path.join(basePath, ""))
+def relative_path(entry :os.DirEntry, iRootLength :int):
+    sRelativePath = entry.path[iRootLength:]
+    return sRelativePath if os.sep == "/" else sRelativePath.replace(os.sep, "/")
+
+# end def relative_path
+
+# function add_arguments
+# Adds the options of a ScanFilter to an argparse parser (or sub parser)
+def add_arguments(parser):
+    group = parser.add_argument_group("filters", "the rules evaluated during the walk")
+    group.add_argument("--include", action="append", default=[], metavar="GLOB",
+                       help="keep only the audio files matching this glob (on the name, or the path if it has a /)")
+    group.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                       help="skip the folders and files matching this glob")
+    group.add_argument("--include-regex", action="append", default=[], metavar="REGEX",
+                       help="keep only the audio files whose relative path matches this regular expression")
+    group.add_argument("--exclude-regex", action="append", default=[], metavar="REGEX",
+                       help="skip the folders and files whose relative path matches this regular expression")
+    group.add_argument("--max-depth", type=int, help="the deepest folder entered, 0 for the files of the root only")
+    group.add_argument("--min-size", type=int, help="the smallest audio file kept, in bytes")
+    group.add_argument("--max-size", type=int, help="the largest audio file kept, in bytes")
+    group.add_argument("--skip-hidden", action="store_true", help="skip the entries whose name begins with a dot")
+    group.add_argument("--skip-system", action="store_true",
+                       help="skip the system and NAS folders (" + ", ".join(SYSTEM_EXCLUDES) + ")")
+
+# end def add_arguments
+
+# function from_arguments
+# Returns the ScanFilter of the options added by add_arguments, None if no rule is given
+# param args : the parsed arguments
+def from_arguments(args):
+    exclude = list(args.exclude) + (list(SYSTEM_EXCLUDES) if args.skip_system else [])
+    if not (args.include or exclude or args.include_regex or args.exclude_regex or args.skip_hidden
+            or args.max_depth is not None or args.min_size is not None or args.max_size is not None):
+        return None
+    return ScanFilter(args.include, exclude, args.include_regex, args.exclude_regex, args.max_depth,
+                      args.min_size, args.max_size, args.skip_hidden)
+
+# end def from_arguments
@@ -0,0 +1,65 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the registry of the audio formats, the ones TinyTag reads
+# * FORMATS, the formats by code, with their MAC col file fields
+# * format_of(name), the code of the format of a file name, FORMAT_UNKNOWN if it is not an audio file
+# the format of a file is resolved once, when the file is found, and kept as its code
+# (see FileNode.fileFormat), so the writer reads its fields without string checks
+##################################################################
+
+# the code of the files which are not audio files, they are not part of the collection
+FORMAT_UNKNOWN = 0
+
+# the audio formats, the code of a format is its index :
+# (extension, duration sign, MPEG version, MPEG layer or None if the layer is the bitdepth, header readable)
+# Duration(seconds), a negative number means "VBR" - coded with variable bit rate, the sign is "-"
+# MPEG Version:
+#     Unknown = 0
+#     V1 = 1
+#     V2 = 2
+#     V2.5 = 3
+#     MPEG + SV4..7 = 4..7
+#     Windows PCM = 9
+#     TwinVQ = 10
+#     Ogg Vorbis = 20
+#     Windows Media Audio = 25
+#     Monkeys Audio = 30
+#     FLAC = 35
+#     OptimFROG = 40
+#     AAC = 45
+#     WavPack = 50
+# MPEG Layer:
+#     Unknown = 0
+#     L1..3 = 1..3 or MPEG + SV7 Profile 1..5 = 1..5
+#     Windows PCM, Monkey 's Audio or FLAC = 8, 16 (bit)
+#     TwinVQ = 10
+#     Ogg Vorbis = 20
+#     Windows Media Audio = 25
+# header readable : True if utils_header.read_header_tags reads the format (see utils_tag.read_tags_fast)
+# the MAC description has no Opus code, an opus file is written as an Ogg stream
+FORMATS = (
+    (None, "", "0", "0", False),
+    (".mp3", "", "1", "3", True),
+    (".flac", "-", "35", None, True),
+    (".ogg", "-", "20", "20", False),
+    (".opus", "-", "20", "20", False),
+    (".m4a", "", "45", "0", False),
+    (".wav", "", "9", None, False),
+    (".wma", "", "25", "25", False),
+)
+
+# the codes by extension, in lower case
+__CODES = {audioFormat[0]: code for code, audioFormat in enumerate(FORMATS) if audioFormat[0] is not None}
+
+# function format_of
+# Returns the code of the format of a file, from the extension of its name (in any case)
+# param name : the file name or path
+# returns : the index of the format in FORMATS, FORMAT_UNKNOWN if it is not an audio file
+def format_of(name :str):
+    iDot = name.rfind(".")
+    if iDot < 0:
+        return FORMAT_UNKNOWN
+    return __CODES.get(name[iDot:].lower(), FORMAT_UNKNOWN)
+
+# end def format_of
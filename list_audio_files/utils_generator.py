@@ -0,0 +1,97 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the generator of synthetic audio libraries, used by the benchmark
+# * generate_library(sRootPath, depth, fanOut, files, ...)
+#   writes a tree of tiny but valid mp3 and flac files, readable by TinyTag
+#   the mp3 files have an ID3v2.3 tag and a few CBR MPEG frames (MPEG 1 layer 3, 32 kbit/s, 44100 Hz)
+#   the flac files have a STREAMINFO and a VORBIS_COMMENT block, and no audio frame
+# the tree is written without recursion and the content is deterministic for a seed
+##################################################################
+
+import os
+import random
+import struct
+
+# a MPEG 1 layer 3 frame header, 32 kbit/s, 44100 Hz, no padding, joint stereo : 104 bytes frames
+__MP3_FRAME = b"\xff\xfb\x10\x40" + b"\x00" * 100
+# the samples of a mp3 frame, of a flac file per frame count
+__MP3_FRAME_SAMPLES = 1152
+
+# private method id3_frame
+# Returns an ID3v2.3 text frame, latin-1 encoded
+def __id3_frame(frameId :bytes, text :str):
+    data = b"\x00" + text.encode("latin-1", "replace")
+    return frameId + struct.pack(">I", len(data)) + b"\x00\x00" + data
+
+# private method syncsafe
+# Returns the 4 bytes of 7 bits of an ID3v2 size
+def __syncsafe(iSize :int):
+    return bytes(((iSize >> 21) & 0x7F, (iSize >> 14) & 0x7F, (iSize >> 7) & 0x7F, iSize & 0x7F))
+
+# function mp3_bytes
+# Returns the content of a mp3 file with the tags and iFrames MPEG frames (at least 5, so TinyTag sees a CBR stream)
+def mp3_bytes(title :str, artist :str, album :str, track :str, year :str, genre :str, iFrames :int):
+    frames = (__id3_frame(b"TIT2", title) + __id3_frame(b"TPE1", artist) + __id3_frame(b"TALB", album)
+              + __id3_frame(b"TRCK", track) + __id3_frame(b"TYER", year) + __id3_frame(b"TCON", genre))
+    return b"ID3\x03\x00\x00" + __syncsafe(len(frames)) + frames + __MP3_FRAME * iFrames
+
+# function flac_bytes
+# Returns the content of a flac file with the tags and a stream of iSamples samples (44100 Hz, stereo, 16 bits)
+def flac_bytes(title :str, artist :str, album :str, track :str, year :str, genre :str, iSamples :int):
+    info = (44100 << 44) | (1 << 41) | (15 << 36) | iSamples
+    streamInfo = struct.pack(">HH", 4096, 4096) + b"\x00" * 6 + info.to_bytes(8, "big") + b"\x00" * 16
+    comments = [("TITLE=" + title).encode(), ("ARTIST=" + artist).encode(), ("ALBUM=" + album).encode(),
+                ("TRACKNUMBER=" + track).encode(), ("DATE=" + year).encode(), ("GENRE=" + genre).encode()]
+    vendor = b"list_audio_files"
+    vorbisComment = (struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", len(comments))
+                     + b"".join(struct.pack("<I", len(comment)) + comment for comment in comments))
+    # STREAMINFO block, then the last block VORBIS_COMMENT
+    return (b"fLaC" + b"\x00" + len(streamInfo).to_bytes(3, "big") + streamInfo
+            + b"\x84" + len(vorbisComment).to_bytes(3, "big") + vorbisComment)
+
+# function library_size
+# Returns the (folder count, file count) of the library generated with these parameters, without writing it
+# the root folder is not counted, like FolderNode.folderCount
+def library_size(depth :int, fanOut :int, files :int):
+    iFolders = sum(fanOut ** iLevel for iLevel in range(1, depth))
+    return iFolders, (iFolders + 1) * files
+
+# function generate_library
+# Writes a synthetic audio library under sRootPath (created if needed)
+# every folder has files audio files, then fanOut sub folders, down to depth levels (the root is the level 1)
+# the tags are drawn from pools of artists, albums, genres and years, so their cardinality is configurable
+# param flacRatio : the part of the files written as flac, the other ones are mp3
+# param seed : the seed of the random tags and durations
+# returns : a dict with the amount of folders, files and bytes written
+def generate_library(sRootPath :str, depth :int = 3, fanOut :int = 10, files :int = 10, artists :int = 100,
+                     albums :int = 1000, genres :int = 20, years :int = 50, flacRatio :float = 0.5, seed :int = 1):
+    rnd = random.Random(seed)
+    iFolders = iFiles = iBytes = 0
+    os.makedirs(sRootPath, exist_ok=True)
+    # (folder path, level), the folders are written depth first
+    stack = [(sRootPath, 1)]
+    while stack:
+        sPath, iLevel = stack.pop()
+        for i in range(files):
+            iFiles += 1
+            tags = ("Title " + str(iFiles), "Artist " + str(rnd.randrange(artists)), "Album " + str(rnd.randrange(albums)),
+                    str(i + 1), str(1970 + rnd.randrange(years)), "Genre " + str(rnd.randrange(genres)))
+            if rnd.random() < flacRatio:
+                sName = "%02d track.flac" % (i + 1)
+                content = flac_bytes(*tags, rnd.randint(5, 40) * __MP3_FRAME_SAMPLES)
+            else:
+                sName = "%02d track.mp3" % (i + 1)
+                content = mp3_bytes(*tags, rnd.randint(5, 40))
+            with open(os.path.join(sPath, sName), "wb") as audioFile:
+                audioFile.write(content)
+            iBytes += len(content)
+        if iLevel < depth:
+            for j in reversed(range(fanOut)):
+                sSubPath = os.path.join(sPath, "dir %d-%d" % (iLevel, j))
+                os.makedirs(sSubPath, exist_ok=True)
+                iFolders += 1
+                stack.append((sSubPath, iLevel + 1))
+    return {"folders": iFolders, "files": iFiles, "bytes": iBytes}
+
+# end def generate_library
@@ -0,0 +1,441 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the header-only tag parser, a faster alternative to TinyTag
+# * read_header_tags(sPath)
+# only the metadata regions are read, with a few bounded reads (see __BLOCK_SIZE) :
+#   mp3 : the ID3v2 tag at the beginning (text frames only, the pictures are skipped),
+#         the ID3v1 tag at the end, and a sample of the MPEG frames
+#   flac : the STREAMINFO and VORBIS_COMMENT blocks
+# the values are the same as TinyTag ones, except the duration of the VBR mp3 without Xing/VBRI header :
+# TinyTag reads up to 30 seconds of frames, one by one, here it is estimated from the frames
+# of a few sample blocks spread over the stream and flagged as estimated
+# see https://id3.org/id3v2.3.0, https://xiph.org/flac/format.html
+# and http://www.mpgedit.org/mpgedit/mpeg_format/mpeghdr.htm
+##################################################################
+
+import os
+from struct import unpack_from
+
+# the size of the blocks read at once (ID3v2 frames, MPEG frame samples) : 16 KB hold the text frames of a usual tag,
+# and more than 10 MPEG frames of the largest bitrate (1441 bytes at 320 kbit/s, 44100 Hz), enough to tell a CBR stream
+# or to find a Xing/VBRI header, so a mp3 costs one block at the beginning and the ID3v1 tag at the end,
+# and a VBR stream without header __VBR_SAMPLE_COUNT blocks (64 KB, about 100 frames : the estimated duration
+# is usually within a few percent, it is flagged as estimated, see FileNode.durationEstimated)
+__BLOCK_SIZE = 1 << 14
+# the largest MPEG stream read whole, its frames are counted instead of estimated
+__SHORT_STREAM_SIZE = 2 * __BLOCK_SIZE
+# the largest text frame or VORBIS_COMMENT block read, the larger ones are skipped
+__MAX_TEXT_SIZE = 1 << 20
+# the amount of frames with the same bitrate telling a CBR stream, like TinyTag
+__CBR_FRAME_COUNT = 5
+# the amount of sample blocks spread over a VBR stream without Xing/VBRI header
+__VBR_SAMPLE_COUNT = 4
+
+# the ID3v2 frames read, v2.3/v2.4 and v2.2 ids, see TinyTag _ID3._ID3_MAPPING
+__ID3_FIELDS = {b"TIT2": "title", b"TT2": "title", b"TPE1": "artist", b"TP1": "artist",
+                b"TALB": "album", b"TAL": "album", b"TRCK": "track", b"TRK": "track",
+                b"TYER": "year", b"TYE": "year", b"TDRC": "year", b"COMM": "comment", b"COM": "comment",
+                b"TCON": "genre", b"TCO": "genre"}
+# the VORBIS_COMMENT keys read, see TinyTag _Ogg._VORBIS_MAPPING
+__VORBIS_FIELDS = {"title": "title", "artist": "artist", "artists": "artist", "author": "artist",
+                   "album": "album", "tracknumber": "track", "date": "year", "genre": "genre",
+                   "description": "comment", "comment": "comment", "comments": "comment"}
+# the ID3v1 genre names by number : the 80 of ID3v1, the Winamp extensions and the later ones,
+# with the names TinyTag gives (the misspellings included), so both readers give the same genre
+__ID3V1_GENRES = ("Blues", "Classic Rock", "Country", "Dance", "Disco", "Funk", "Grunge", "Hip-Hop", "Jazz", "Metal",
+                  "New Age", "Oldies", "Other", "Pop", "R&B", "Rap", "Reggae", "Rock", "Techno", "Industrial",
+                  "Alternative", "Ska", "Death Metal", "Pranks", "Soundtrack", "Euro-Techno", "Ambient", "Trip-Hop",
+                  "Vocal", "Jazz+Funk", "Fusion", "Trance", "Classical", "Instrumental", "Acid", "House", "Game",
+                  "Sound Clip", "Gospel", "Noise", "AlternRock", "Bass", "Soul", "Punk", "Space", "Meditative",
+                  "Instrumental Pop", "Instrumental Rock", "Ethnic", "Gothic", "Darkwave", "Techno-Industrial",
+                  "Electronic", "Pop-Folk", "Eurodance", "Dream", "Southern Rock", "Comedy", "Cult", "Gangsta",
+                  "Top 40", "Christian Rap", "Pop/Funk", "Jungle", "Native American", "Cabaret", "New Wave",
+                  "Psychadelic", "Rave", "Showtunes", "Trailer", "Lo-Fi", "Tribal", "Acid Punk", "Acid Jazz", "Polka",
+                  "Retro", "Musical", "Rock & Roll", "Hard Rock", "Folk", "Folk-Rock", "National Folk", "Swing",
+                  "Fast Fusion", "Bebob", "Latin", "Revival", "Celtic", "Bluegrass", "Avantgarde", "Gothic Rock",
+                  "Progressive Rock", "Psychedelic Rock", "Symphonic Rock", "Slow Rock", "Big Band", "Chorus",
+                  "Easy listening", "Acoustic", "Humour", "Speech", "Chanson", "Opera", "Chamber Music", "Sonata",
+                  "Symphony", "Booty Bass", "Primus", "Porn Groove", "Satire", "Slow Jam", "Club", "Tango", "Samba",
+                  "Folklore", "Ballad", "Power Ballad", "Rhythmic Soul", "Freestyle", "Duet", "Punk Rock",
+                  "Drum Solo", "A capella", "Euro-House", "Dance Hall", "Goa", "Drum & Bass", "Club-House",
+                  "Hardcore Techno", "Terror", "Indie", "BritPop", "Afro-Punk", "Polsk Punk", "Beat",
+                  "Christian Gangsta Rap", "Heavy Metal", "Black Metal", "Contemporary Christian", "Christian Rock",
+                  "Merengue", "Salsa", "Thrash Metal", "Anime", "Jpop", "Synthpop", "Abstract", "Art Rock", "Baroque",
+                  "Bhangra", "Big Beat", "Breakbeat", "Chillout", "Downtempo", "Dub", "EBM", "Eclectic", "Electro",
+                  "Electroclash", "Emo", "Experimental", "Garage", "Illbient", "Industro-Goth", "Jam Band",
+                  "Krautrock", "Leftfield", "Lounge", "Math Rock", "New Romantic", "Nu-Breakz", "Post-Punk",
+                  "Post-Rock", "Psytrance", "Shoegaze", "Space Rock", "Trop Rock", "World Music", "Neoclassical",
+                  "Audiobook", "Audio Theatre", "Neue Deutsche Welle", "Podcast", "Indie Rock", "G-Funk", "Dubstep",
+                  "Garage Rock", "Psybient")
+
+# MPEG audio frame header tables, indexed by the version id (2.5, reserved, 2, 1) and the layer id (reserved, 3, 2, 1)
+__SAMPLE_RATES = ((11025, 12000, 8000), (0, 0, 0), (22050, 24000, 16000), (44100, 48000, 32000))
+__V1L1 = (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448, 0)
+__V1L2 = (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384, 0)
+__V1L3 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0)
+__V2L1 = (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256, 0)
+__V2L2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0)
+__NONE = (0,) * 16
+__BITRATES = ((__NONE, __V2L2, __V2L2, __V2L1), (__NONE, __NONE, __NONE, __NONE),
+              (__NONE, __V2L2, __V2L2, __V2L1), (__NONE, __V1L3, __V1L2, __V1L1))
+__SAMPLES_PER_FRAME = ((0, 576, 1152, 384), (0, 0, 0, 0), (0, 576, 1152, 384), (0, 1152, 1152, 384))
+__SLOT_SIZES = (0, 1, 1, 4)
+
+# private method unsynchsafe
+# Returns the 28 bits integer stored in 4 bytes of 7 bits
+def __unsynchsafe(data :bytes, offset :int = 0):
+    return (data[offset] << 21) | (data[offset + 1] << 14) | (data[offset + 2] << 7) | data[offset + 3]
+
+# private method string_end
+# Returns the position after the string terminator of an ID3v2 string starting at start, start if there is none
+def __string_end(content :bytes, encoding :int, start :int = 0):
+    if encoding == 0 or encoding == 3:
+        end = content.find(b"\x00", start)
+        return start if end < 0 else end + 1
+    # utf-16 : a 2 bytes terminator at an even position
+    end = content.find(b"\x00\x00", start)
+    while end >= 0 and (end - start) % 2 != 0:
+        end = content.find(b"\x00\x00", end + 1)
+    return start if end < 0 else end + 2
+
+# private method decode
+# Decodes an ID3v2 string with its encoding byte : latin-1, utf-16 with BOM, utf-16be, utf-8
+def __decode(value :bytes, encoding :int):
+    if encoding == 1:
+        sEncoding = "utf-16be" if value.startswith(b"\xfe\xff") else "utf-16le"
+        if value.startswith(b"\xfe\xff") or value.startswith(b"\xff\xfe"):
+            value = value[2:] if len(value) % 2 == 0 else value[2:-1]
+    elif encoding == 2:
+        sEncoding = "utf-16be"
+        if len(value) % 2 != 0:
+            value = value[:-1]
+    elif encoding == 3:
+        sEncoding = "utf-8"
+    else:
+        sEncoding = "latin-1"
+    return value.decode(sEncoding, "replace").rstrip("\x00")
+
+# private method set_field
+# Sets a field of values if it is not set yet and value is not empty, like TinyTag (the first value wins)
+def __set_field(values :dict, field :str, value):
+    if value != "" and value is not None and values.get(field) is None:
+        values[field] = value
+
+# private method set_number
+# Sets the track field from a "3" or "3/12" value, ignored if not a number
+def __set_number(values :dict, field :str, value :str):
+    value = value.split("/")[0]
+    if value.isdecimal():
+        __set_field(values, field, int(value))
+
+# private method set_id3_frame
+# Sets the field of an ID3v2 text or comment frame
+def __set_id3_frame(values :dict, field :str, content :bytes):
+    if not content:
+        return
+    encoding = content[0]
+    if field == "comment":
+        # encoding, language (3 bytes), description, text
+        content = content[4:]
+        iEnd = __string_end(content, encoding)
+        value = __decode(content[:iEnd], encoding)
+        if iEnd < len(content):
+            description = value
+            value = __decode(content[iEnd:], encoding)
+            if description and value:
+                # a key-value comment (iTunes), not the comment
+                return
+        __set_field(values, field, value)
+        return
+    content = content[1:]
+    # several values can be separated by terminators, the first one is used
+    iEnd = __string_end(content, encoding)
+    if iEnd <= 0:
+        iEnd = len(content)
+    value = __decode(content[:iEnd], encoding)
+    if field == "track":
+        __set_number(values, field, value)
+    elif field == "genre":
+        # an ID3v1 genre number, "17" or "(17)"
+        iGenre = 255
+        if value.isdecimal():
+            iGenre = int(value)
+        elif value.startswith("("):
+            iClose = value.find(")")
+            if iClose > 0 and value[1:iClose].isdecimal():
+                iGenre = int(value[1:iClose])
+        if 0 <= iGenre < len(__ID3V1_GENRES):
+            value = __ID3V1_GENRES[iGenre]
+        __set_field(values, field, value)
+    else:
+        __set_field(values, field, value)
+
+# private method read_id3v2
+# Reads the text frames of the ID3v2 tag at the beginning of the file, the other frames are skipped
+# the frames are parsed in blocks of __BLOCK_SIZE, a block is read again only after a large skipped frame
+# returns : the offset of the audio data, after the tag (0 without tag)
+def __read_id3v2(fh, values :dict):
+    header = fh.read(10)
+    if len(header) < 10 or not header.startswith(b"ID3"):
+        return 0
+    iMajor = header[3]
+    iEnd = 10 + __unsynchsafe(header, 6)
+    iOffset = 10
+    iHeaderLen = 6 if iMajor == 2 else 10
+    block = fh.read(min(__BLOCK_SIZE, iEnd - iOffset))
+    iBlockStart = iOffset
+    if header[5] & 0x40 and len(block) >= 4:
+        # the extended header is skipped, its size includes itself in v2.4 only
+        iOffset += __unsynchsafe(block) if iMajor == 4 else unpack_from(">I", block)[0] + 4
+    while iOffset + iHeaderLen <= iEnd:
+        if iOffset + iHeaderLen > iBlockStart + len(block) or iOffset < iBlockStart:
+            fh.seek(iOffset)
+            block = fh.read(min(__BLOCK_SIZE, iEnd - iOffset))
+            iBlockStart = iOffset
+            if len(block) < iHeaderLen:
+                break
+        iPos = iOffset - iBlockStart
+        if iMajor == 2:
+            frameId = block[iPos:iPos + 3]
+            iFrameSize = int.from_bytes(block[iPos + 3:iPos + 6], "big")
+        else:
+            frameId = block[iPos:iPos + 4]
+            iFrameSize = __unsynchsafe(block, iPos + 4) if iMajor == 4 else unpack_from(">I", block, iPos + 4)[0]
+        if frameId.strip(b"\x00") == b"" or iFrameSize > iEnd:
+            # padding, or an invalid frame
+            break
+        iOffset += iHeaderLen
+        field = __ID3_FIELDS.get(frameId)
+        if field is not None and iFrameSize <= __MAX_TEXT_SIZE:
+            iPos = iOffset - iBlockStart
+            if iPos + iFrameSize <= len(block):
+                content = block[iPos:iPos + iFrameSize]
+            else:
+                fh.seek(iOffset)
+                content = fh.read(iFrameSize)
+            __set_id3_frame(values, field, content)
+        iOffset += iFrameSize
+    return iEnd
+
+# private method read_id3v1
+# Reads the ID3v1 tag of the last 128 bytes, its fields are only used when the ID3v2 tag has not them
+# returns : True if there is an ID3v1 tag
+def __read_id3v1(fh, iFileSize :int, values :dict):
+    if iFileSize < 128:
+        return False
+    fh.seek(iFileSize - 128)
+    content = fh.read(128)
+    if not content.startswith(b"TAG"):
+        return False
+    decode = lambda data: data.decode("latin-1", "replace").rstrip("\x00")
+    if not values.get("title"):
+        __set_field(values, "title", decode(content[3:33]))
+    if not values.get("artist"):
+        __set_field(values, "artist", decode(content[33:63]))
+    if not values.get("album"):
+        __set_field(values, "album", decode(content[63:93]))
+    if not values.get("year"):
+        __set_field(values, "year", decode(content[93:97]))
+    comment = content[97:127]
+    if comment[-2] == 0 and comment[-1] != 0:
+        # ID3v1.1 : the track number is the last byte of the comment
+        __set_field(values, "track", comment[-1])
+        comment = comment[:-2]
+    if not values.get("comment"):
+        __set_field(values, "comment", decode(comment))
+    if not values.get("genre") and content[127] < len(__ID3V1_GENRES):
+        __set_field(values, "genre", __ID3V1_GENRES[content[127]])
+    return True
+
+# private method mpeg_frame
+# Parses the MPEG frame header at block[iPos:iPos + 4]
+# param versionId : the version and layer bits of the first frame, the following frames must have the same
+# returns : (versionId, bitrate, sampleRate, samples per frame, frame length, channels) or None if not a frame header
+def __mpeg_frame(block :bytes, iPos :int, versionId=None):
+    if block[iPos] != 0xFF or (block[iPos + 1] & 0xE0) != 0xE0:
+        return None
+    idByte = block[iPos + 1]
+    brByte = block[iPos + 2]
+    iBitrateId = brByte >> 4
+    iRateId = (brByte >> 2) & 3
+    iMpegId = (idByte >> 3) & 3
+    iLayerId = (idByte >> 1) & 3
+    if ((versionId is not None and versionId != (idByte >> 1) & 15)
+            or iBitrateId > 14 or iBitrateId == 0 or iRateId == 3 or iLayerId == 0 or iMpegId == 1):
+        return None
+    iBitrate = __BITRATES[iMpegId][iLayerId][iBitrateId]
+    iSampleRate = __SAMPLE_RATES[iMpegId][iRateId]
+    iSamples = __SAMPLES_PER_FRAME[iMpegId][iLayerId]
+    iSlot = __SLOT_SIZES[iLayerId]
+    iLength = ((iSamples // 8 // iSlot) * 1000 * iBitrate // iSampleRate + ((brByte >> 1) & 1)) * iSlot
+    return (idByte >> 1) & 15, iBitrate, iSampleRate, iSamples, iLength, 1 if block[iPos + 3] >> 6 == 3 else 2
+
+# private method sample_frames
+# Walks the MPEG frames of a sample block, from the first valid frame
+# param bSync : if True the first frame must be followed by a valid frame (to resync in the middle of a stream)
+# returns : (bitrates, lengths) of the frames found
+def __sample_frames(block :bytes, versionId, bSync :bool):
+    bitrates = []
+    lengths = []
+    iPos = 0
+    while iPos + 4 <= len(block):
+        frame = __mpeg_frame(block, iPos, versionId)
+        if frame is not None and bSync and not lengths:
+            iNext = iPos + frame[4]
+            if iNext + 4 <= len(block) and __mpeg_frame(block, iNext, versionId) is None:
+                frame = None
+        if frame is None or frame[4] <= 1:
+            # not a frame, find the next sync byte
+            iNext = block.find(b"\xff", iPos + 1)
+            iPos = len(block) if iNext < 0 else iNext
+            continue
+        bitrates.append(frame[1])
+        lengths.append(frame[4])
+        iPos += frame[4]
+    return bitrates, lengths
+
+# private method read_mpeg
+# Reads the sample rate, channels and duration of the MPEG stream between iAudioStart and iAudioEnd
+# the duration is exact with a Xing/Info/VBRI header, or computed like TinyTag for a CBR stream,
+# else it is estimated from the average frame length of __VBR_SAMPLE_COUNT sample blocks
+# returns : (duration, sampleRate, channels, True if the duration is estimated)
+def __read_mpeg(fh, iAudioStart :int, iAudioEnd :int):
+    fh.seek(iAudioStart)
+    # a short stream is read whole, it is smaller than the samples of a long one
+    iStreamSize = iAudioEnd - iAudioStart
+    block = fh.read(iStreamSize if iStreamSize <= __SHORT_STREAM_SIZE else __BLOCK_SIZE)
+    iBlockStart = iAudioStart
+    iPos = 0
+    frame = None
+    while iPos + 4 <= len(block):
+        frame = __mpeg_frame(block, iPos)
+        if frame is not None:
+            break
+        iNext = block.find(b"\xff", iPos + 1)
+        iPos = len(block) if iNext < 0 else iNext
+    if frame is None:
+        return None, None, None, False
+    versionId, iBitrate, iSampleRate, iSamples, iLength, iChannels = frame
+    iAudioStart += iPos
+
+    # a Xing (VBR), Info (CBR) or VBRI header in the first frame gives the frame count
+    content = block[iPos + 4:iPos + 4 + min(50, iLength)]
+    iFrames = iBytes = 0
+    iHeader = content.find(b"Xing")
+    if iHeader < 0:
+        iHeader = content.find(b"Info")
+    if iHeader >= 0 and iHeader + 8 <= len(content):
+        iFlags = unpack_from(">i", content, iHeader + 4)[0]
+        iField = iHeader + 8
+        if iFlags & 1 and iField + 4 <= len(content):
+            iFrames = unpack_from(">i", content, iField)[0]
+            iField += 4
+        if iFlags & 2 and iField + 4 <= len(content):
+            iBytes = unpack_from(">i", content, iField)[0] - iLength
+    else:
+        iHeader = content.find(b"VBRI")
+        if iHeader >= 0 and iHeader + 18 <= len(content):
+            iBytes = unpack_from(">I", content, iHeader + 10)[0]
+            iFrames = unpack_from(">I", content, iHeader + 14)[0]
+    if iFrames > 0 and iBytes > 0:
+        return iFrames * iSamples / iSampleRate, iSampleRate, iChannels, False
+
+    bitrates, lengths = __sample_frames(block[iPos:], versionId, False)
+    bEstimated = False
+    if len(bitrates) >= __CBR_FRAME_COUNT and len(set(bitrates[:__CBR_FRAME_COUNT])) == 1:
+        # CBR, the frame length of the first frames is the frame length of the stream, like TinyTag
+        lengths = lengths[:__CBR_FRAME_COUNT]
+    elif iBlockStart + len(block) >= iAudioEnd:
+        # the whole stream is in the block, the frames are counted
+        return len(lengths) * iSamples / iSampleRate, iSampleRate, iChannels, False
+    else:
+        # VBR without header, more samples spread over the stream
+        bEstimated = True
+        for iSample in range(1, __VBR_SAMPLE_COUNT):
+            iSampleStart = iAudioStart + (iAudioEnd - iAudioStart) * iSample // __VBR_SAMPLE_COUNT
+            if iSampleStart > iBlockStart + len(block):
+                fh.seek(iSampleStart)
+                sample = fh.read(min(__BLOCK_SIZE, iAudioEnd - iSampleStart))
+                lengths += __sample_frames(sample, versionId, True)[1]
+    iFrameCount = int((iAudioEnd - iAudioStart) / (sum(lengths) / len(lengths)) + 0.5)
+    return iFrameCount * iSamples / iSampleRate, iSampleRate, iChannels, bEstimated
+
+# private method read_flac
+# Reads the STREAMINFO and VORBIS_COMMENT metadata blocks of a FLAC stream starting at iStart
+# returns : (duration, sampleRate, bitdepth, channels)
+def __read_flac(fh, iStart :int, values :dict):
+    fh.seek(iStart)
+    if fh.read(4) != b"fLaC":
+        raise ValueError("[ERROR][read_flac] Invalid FLAC header")
+    duration = sampleRate = bitdepth = channels = None
+    bStreamInfo = False
+    while True:
+        header = fh.read(4)
+        if len(header) < 4:
+            break
+        iType = header[0] & 0x7F
+        iSize = int.from_bytes(header[1:], "big")
+        if iType == 0 and not bStreamInfo:
+            bStreamInfo = True
+            info = unpack_from(">Q", fh.read(iSize), 10)[0]
+            iSampleRate = (info >> 44) & ((1 << 20) - 1)
+            channels = ((info >> 41) & 7) + 1
+            bitdepth = ((info >> 36) & 31) + 1
+            if iSampleRate > 0:
+                sampleRate = iSampleRate
+                duration = (info & ((1 << 36) - 1)) / iSampleRate
+        elif iType == 4 and iSize <= __MAX_TEXT_SIZE:
+            __read_vorbis_comment(fh.read(iSize), values)
+        else:
+            fh.seek(iSize, os.SEEK_CUR)
+        if header[0] & 0x80:
+            # the last metadata block, the audio frames follow
+            break
+    return duration, sampleRate, bitdepth, channels
+
+# private method read_vorbis_comment
+# Sets the fields of a VORBIS_COMMENT block content
+def __read_vorbis_comment(content :bytes, values :dict):
+    iPos = 4 + unpack_from("<I", content)[0]
+    iCount = unpack_from("<I", content, iPos)[0]
+    iPos += 4
+    for i in range(iCount):
+        if iPos + 4 > len(content):
+            break
+        iLength = unpack_from("<I", content, iPos)[0]
+        comment = content[iPos + 4:iPos + 4 + iLength].decode("utf-8", "replace")
+        iPos += 4 + iLength
+        key, sep, value = comment.partition("=")
+        field = __VORBIS_FIELDS.get(key.lower())
+        if not sep or field is None:
+            continue
+        if field == "track":
+            __set_number(values, field, value)
+        else:
+            __set_field(values, field, value)
+
+# function read_header_tags
+# Reads the audio tags of a mp3 or flac file from its metadata regions only (see the top of this file)
+# param sPath : the audio file path
+# returns : a tuple like utils_tag.read_tags, whose last value is True if the duration is estimated
+def read_header_tags(sPath :str):
+    values = {}
+    duration = sampleRate = bitdepth = channels = None
+    bEstimated = False
+    with open(sPath, "rb") as fh:
+        iFileSize = fh.seek(0, os.SEEK_END)
+        if iFileSize > 0:
+            fh.seek(0)
+            iAudioStart = __read_id3v2(fh, values)
+            fh.seek(iAudioStart)
+            if sPath.endswith(".flac") or fh.read(4) == b"fLaC":
+                duration, sampleRate, bitdepth, channels = __read_flac(fh, iAudioStart, values)
+            else:
+                iAudioEnd = iFileSize - 128 if __read_id3v1(fh, iFileSize, values) else iFileSize
+                duration, sampleRate, channels, bEstimated = __read_mpeg(fh, iAudioStart, iAudioEnd)
+    return (iFileSize, duration, sampleRate, values.get("title"), values.get("artist"), values.get("album"),
+            values.get("track"), values.get("year"), values.get("comment"), values.get("genre"),
+            bitdepth, channels, bEstimated)
+
+# end def read_header_tags
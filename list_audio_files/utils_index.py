@@ -0,0 +1,239 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the secondary indexes over the files of a collection, and the queries using them
+# * class HashIndex, the files by value (artist, album, genre), the strings are compared case-insensitively
+# * class SortedIndex, the files by ordered value (year, duration, sample rate), for the range scans
+# * class CollectionIndex, the indexes of a CollectionNode, built once and kept current :
+#   the nodes attached to or detached from the collection update it (see CollectionNode.index)
+#   find(...) returns the matching FileNodes, folders(...) the paths of their folders
+# * node_path(node), the path of a node in the collection, from its volume
+# the command line is query.py
+##################################################################
+
+import bisect
+import os
+import re
+import node_classes
+
+"""
+Files by value : value -> {id(FileNode): FileNode}, the None values are not indexed
+@attribute key : function(FileNode) returning the indexed value
+"""
+class HashIndex:
+
+    def __init__(self, key):
+        self.key = key
+        self.buckets = {}
+
+    # function normalize
+    # Returns the indexed form of a value, the strings are compared case-insensitively
+    @staticmethod
+    def normalize(value):
+        return value.casefold() if isinstance(value, str) else value
+
+    def add(self, fileNode):
+        value = HashIndex.normalize(self.key(fileNode))
+        if value is not None:
+            self.buckets.setdefault(value, {})[id(fileNode)] = fileNode
+
+    def remove(self, fileNode):
+        value = HashIndex.normalize(self.key(fileNode))
+        bucket = self.buckets.get(value)
+        if bucket is not None:
+            bucket.pop(id(fileNode), None)
+            if not bucket:
+                del self.buckets[value]
+
+    # function lookup
+    # Returns the {id: FileNode} of the files having value
+    def lookup(self, value):
+        return self.buckets.get(HashIndex.normalize(value), {})
+
+    # function matches
+    # Returns True if fileNode has value
+    def matches(self, fileNode, value):
+        return HashIndex.normalize(self.key(fileNode)) == HashIndex.normalize(value)
+
+# end class HashIndex
+
+"""
+Files by ordered value : the files are in buckets by value, like HashIndex, and the distinct values are kept sorted
+so a range scan is a bisection followed by the buckets of the range
+@attribute values : the distinct values, sorted
+"""
+class SortedIndex(HashIndex):
+
+    def __init__(self, key):
+        super().__init__(key)
+        self.values = []
+
+    def add(self, fileNode):
+        value = self.key(fileNode)
+        if value is not None:
+            bucket = self.buckets.get(value)
+            if bucket is None:
+                bucket = self.buckets[value] = {}
+                bisect.insort(self.values, value)
+            bucket[id(fileNode)] = fileNode
+
+    def remove(self, fileNode):
+        value = self.key(fileNode)
+        bucket = self.buckets.get(value)
+        if bucket is not None:
+            bucket.pop(id(fileNode), None)
+            if not bucket:
+                del self.buckets[value]
+                del self.values[bisect.bisect_left(self.values, value)]
+
+    # function range
+    # Returns the buckets of the values between low and high, included, None is an open bound
+    def range(self, low=None, high=None):
+        iStart = 0 if low is None else bisect.bisect_left(self.values, low)
+        iEnd = len(self.values) if high is None else bisect.bisect_right(self.values, high)
+        return [self.buckets[value] for value in self.values[iStart:iEnd]]
+
+    # function lookup
+    # Returns the {id: FileNode} of the files having value, or of the range (low, high) if value is a tuple
+    def lookup(self, value):
+        if not isinstance(value, tuple):
+            return self.buckets.get(value, {})
+        buckets = self.range(*value)
+        if len(buckets) == 1:
+            return buckets[0]
+        files = {}
+        for bucket in buckets:
+            files.update(bucket)
+        return files
+
+    # function matches
+    # Returns True if fileNode has value, or a value in the range (low, high) if value is a tuple
+    def matches(self, fileNode, value):
+        key = self.key(fileNode)
+        if not isinstance(value, tuple):
+            return key == value
+        low, high = value
+        return key is not None and (low is None or key >= low) and (high is None or key <= high)
+
+# end class SortedIndex
+
+# function node_path
+# Returns the path of a node in its collection, from its volume, the names separated by "/"
+def node_path(node):
+    names = []
+    while node is not None and not isinstance(node, node_classes.CollectionNode):
+        names.append(node.name)
+        node = node.parent
+    return "/".join(reversed(names))
+
+"""
+The indexes of the files of a CollectionNode
+the index is registered as collection.index, so it is kept current when the nodes are attached or detached
+(build_collection, rescan_collection, update_folder...) until close()
+@attribute indexes : the HashIndex or SortedIndex by field : artist, album, genre (hash), year, duration, sampleRate (sorted)
+@attribute files : the indexed FileNodes, {id: FileNode}
+"""
+class CollectionIndex:
+
+    # the first 4 digits of a year tag ("1995", "1995-03-01"...)
+    __YEAR = re.compile(r"\s*(\d{4})")
+
+    def __init__(self, collectionNode :node_classes.CollectionNode):
+        if collectionNode.index is not None:
+            raise ValueError("[ERROR][CollectionIndex] the collection [" + collectionNode.name + "] is already indexed")
+        self.collection = collectionNode
+        self.indexes = {"artist": HashIndex(lambda fileNode: fileNode.artist),
+                        "album": HashIndex(lambda fileNode: fileNode.album),
+                        "genre": HashIndex(lambda fileNode: fileNode.genre),
+                        "year": SortedIndex(self.__year),
+                        "duration": SortedIndex(lambda fileNode: fileNode.duration),
+                        "sampleRate": SortedIndex(lambda fileNode: fileNode.sampleRate)}
+        self.files = {}
+        for volumeNode in collectionNode.children:
+            self.add_tree(volumeNode)
+        collectionNode.index = self
+        node_classes.CollectionNode.indexCount += 1
+
+    # private method year
+    # Returns the year of a file as an int, None if its year tag does not start with 4 digits
+    @staticmethod
+    def __year(fileNode):
+        year = fileNode.year
+        if isinstance(year, int):
+            return year
+        match = CollectionIndex.__YEAR.match(year) if isinstance(year, str) else None
+        return int(match.group(1)) if match else None
+
+    # function close
+    # Stops keeping the index current, the collection is not indexed anymore
+    def close(self):
+        if self.collection.index is self:
+            self.collection.index = None
+            node_classes.CollectionNode.indexCount -= 1
+
+    # function add_tree
+    # Indexes the files of the subtree of node (a FileNode, FolderNode or VolumeNode)
+    def add_tree(self, node):
+        for fileNode in self.__tree_files(node):
+            if id(fileNode) not in self.files:
+                self.files[id(fileNode)] = fileNode
+                for index in self.indexes.values():
+                    index.add(fileNode)
+
+    # function remove_tree
+    # Removes the files of the subtree of node from the indexes
+    def remove_tree(self, node):
+        for fileNode in self.__tree_files(node):
+            if self.files.pop(id(fileNode), None) is not None:
+                for index in self.indexes.values():
+                    index.remove(fileNode)
+
+    # private method tree_files
+    # Returns the FileNodes of the subtree of node, without recursion
+    @staticmethod
+    def __tree_files(node):
+        if isinstance(node, node_classes.FileNode):
+            return [node]
+        files = []
+        stack = [node]
+        while stack:
+            for child in stack.pop().children:
+                if isinstance(child, node_classes.FileNode):
+                    files.append(child)
+                else:
+                    stack.append(child)
+        return files
+
+    # function find
+    # Returns the FileNodes matching all the criteria, sorted by path
+    # the candidates are the files of the most selective indexed criterion, the other criteria filter them
+    # param criteria : field=value, the fields are the ones of indexes and "extension" (".flac", ".mp3"...)
+    #                  a value of year, duration or sampleRate can be a range (low, high), bounds included, None is open
+    # returns : the list of FileNodes, every file if there is no criterion
+    def find(self, **criteria):
+        extension = criteria.pop("extension", None)
+        for field in criteria:
+            if field not in self.indexes:
+                raise ValueError("[ERROR][CollectionIndex] unknown field " + field)
+        criteria = {field: value for field, value in criteria.items() if value is not None}
+        candidates = self.files
+        selected = None
+        for field, value in criteria.items():
+            files = self.indexes[field].lookup(value)
+            if len(files) < len(candidates):
+                candidates, selected = files, field
+        result = []
+        for fileNode in candidates.values():
+            if extension is not None and os.path.splitext(fileNode.name)[1].lower() != extension.lower():
+                continue
+            if all(self.indexes[field].matches(fileNode, value) for field, value in criteria.items() if field != selected):
+                result.append(fileNode)
+        result.sort(key=node_path)
+        return result
+
+    # function folders
+    # Returns the paths of the folders having files matching all the criteria (see find), sorted
+    def folders(self, **criteria):
+        return sorted({node_path(fileNode.parent) for fileNode in self.find(**criteria)})
+
+# end class CollectionIndex
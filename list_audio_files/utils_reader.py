@@ -0,0 +1,205 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the functions to read a ".col" export file written by utils_writer
+# * iter_records(sColFilePath, encoding), yielding the lines as flat records, lazily
+# * read_file_count(sColFilePath, encoding), the file count of the collection line
+# * read_collection(sColFilePath, encoding), loading the file back in a CollectionNode
+#
+# the file is memory-mapped and read line by line, so multi-GB files are not loaded whole
+# a compressed file (gzip, bz2, lzma, see utils_compress) is recognized by its first bytes and decompressed by blocks
+# the depth of a line is its amount of TAB, the fields are separated by the utils_ascii control characters
+# see https://mac.sourceforge.net/
+##################################################################
+
+import mmap
+import re
+import node_classes
+import utils_compress
+import utils_writer
+
+# the size of the blocks decoded at once
+__BLOCK_SIZE = 1 << 22
+
+# the kinds of records
+RECORD_COLLECTION = "collection"
+RECORD_VOLUME = "volume"
+RECORD_FOLDER = "folder"
+RECORD_FILE = "file"
+
+# Size (kilobytes), Duration (seconds), Volume count, File count, Date (last change)
+__COLLECTION_LINE = re.compile("\x01(-?\\d+)\x02(-?\\d+)\x03(\\d+)\x04(\\d+)\x05(-?\\d+)\x06")
+# Name, Size, Duration, Folder count, File count, Date, Serial number, Volume Type
+__VOLUME_LINE = re.compile("\t([^\x01]*)\x01(-?\\d+)\x02(-?\\d+)\x03(\\d+)\x04(\\d+)\x05(-?\\d+)\x06(-?\\d+)\x07(\\d+)\x08")
+# Name, Size, Duration, Subfolder count, File count
+__FOLDER_LINE = re.compile("([^\x01]*)\x01(-?\\d+)\x02(-?\\d+)\x03(\\d+)\x04(\\d+)\x05")
+# Name, Size, Duration, Sample Rate, Kanal mode, MPEG Version, MPEG Layer,
+# Title, Artist, Album, Track number, Year, Comment, Genre
+__FILE_LINE = re.compile("([^\x01]*)\x01(-?\\d+)\x02(-?\\d+)\x03(-?\\d+)\x04(\\d+)\x05(\\d+)\x06(\\d+)\x07\x15"
+                         "([^\x16]*)\x16([^\x17]*)\x17([^\x18]*)\x18([^\x19]*)\x19([^\x1a]*)\x1a([^\x1b]*)\x1b([^\x1c]*)\x1c")
+
+# private method parse_line
+# Parses one line (without the new line) of a ".col" file
+# param line : the line
+# param iLine : the line number, for the error message
+# returns : (kind, level, values), see iter_records
+def __parse_line(line :str, iLine :int):
+    iLevel = len(line) - len(line.lstrip("\t"))
+    if iLevel == 0:
+        match = __COLLECTION_LINE.fullmatch(line)
+        if match is not None:
+            return RECORD_COLLECTION, 0, tuple(int(value) for value in match.groups())
+    elif iLevel == 1:
+        match = __VOLUME_LINE.fullmatch(line)
+        if match is not None:
+            values = match.groups()
+            return RECORD_VOLUME, 1, (values[0],) + tuple(int(value) for value in values[1:])
+    else:
+        body = line[iLevel:]
+        # the file lines end with FS, the folder lines with ENQ
+        if body.endswith("\x1c"):
+            match = __FILE_LINE.fullmatch(body)
+            if match is not None:
+                (name, size, duration, sampleRate, kanal, version, layer,
+                 title, artist, album, track, year, comment, genre) = match.groups()
+                return RECORD_FILE, iLevel, (name, int(size), int(duration), int(sampleRate), int(kanal), int(version), int(layer),
+                                             title or None, artist or None, album or None, track or None,
+                                             year or None, comment or None, genre or None)
+        else:
+            match = __FOLDER_LINE.fullmatch(body)
+            if match is not None:
+                name, size, duration, folderCount, fileCount = match.groups()
+                return RECORD_FOLDER, iLevel, (name, int(size), int(duration), int(folderCount), int(fileCount))
+    print("[ERROR][parse_line] Unexpected line " + str(iLine))
+    raise ValueError("[ERROR][parse_line] Unexpected line " + str(iLine) + " : " + repr(line))
+
+# private method line_blocks
+# Yields the content of a col file in blocks of whole lines (the last one can miss its new line)
+# an uncompressed file is memory-mapped, a compressed one is decompressed block by block
+def __line_blocks(sColFilePath :str):
+    compression = utils_compress.detect_compression(sColFilePath)
+    if compression is not None:
+        with utils_compress.open_read(sColFilePath, compression) as stream:
+            rest = b""
+            while True:
+                block = stream.read(__BLOCK_SIZE)
+                if not block:
+                    break
+                block = rest + block
+                # the end of the last line of the block is kept for the next one
+                iEnd = block.rfind(b"\n") + 1
+                rest = block[iEnd:]
+                if iEnd > 0:
+                    yield block[:iEnd]
+            if rest:
+                yield rest
+        return
+    with open(sColFilePath, "rb") as colFile:
+        try:
+            mapped = mmap.mmap(colFile.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can not be mapped
+            return
+        with mapped:
+            iStart = 0
+            iSize = len(mapped)
+            while iStart < iSize:
+                # a block of whole lines is decoded at once
+                iEnd = mapped.rfind(b"\n", iStart, min(iStart + __BLOCK_SIZE, iSize)) + 1
+                if iEnd <= iStart:
+                    # no new line in the block : a long line, or the last line
+                    iEnd = mapped.find(b"\n", iStart) + 1 or iSize
+                yield mapped[iStart:iEnd]
+                iStart = iEnd
+
+# function iter_records
+# Reads a ".col" file lazily, one record per line, the file can be compressed
+# param sColFilePath : the col file path
+# param encoding : the encoding of the col file, utils_writer.COL_ENCODING if None
+# param encodingErrors : the error handler of the encoding, utils_writer.COL_ENCODING_ERRORS if None
+# yields (kind, level, values), the level is the amount of TAB and the values are the fields
+# as written in the file (sizes in kilobytes, sample rate without last 0...), numbers as int, empty tags as None :
+#   RECORD_COLLECTION : (size, duration, volumeCount, fileCount, date)
+#   RECORD_VOLUME : (name, size, duration, folderCount, fileCount, date, serial, volumeType)
+#   RECORD_FOLDER : (name, size, duration, folderCount, fileCount)
+#   RECORD_FILE : (name, size, duration, sampleRate, kanalMode, mpegVersion, mpegLayer,
+#                  title, artist, album, track, year, comment, genre)
+def iter_records(sColFilePath :str, encoding :str = None, encodingErrors :str = None):
+    if encoding is None:
+        encoding = utils_writer.COL_ENCODING
+    if encodingErrors is None:
+        encodingErrors = utils_writer.COL_ENCODING_ERRORS
+    iLine = 0
+    for block in __line_blocks(sColFilePath):
+        # the bytes the encoding has not stop the reading, like the writer does for the characters it has not
+        for line in block.decode(encoding, encodingErrors).split("\n"):
+            iLine += 1
+            line = line.rstrip("\r")
+            if line:
+                yield __parse_line(line, iLine)
+        # the split gives an empty string after the last new line of the block
+        iLine -= 1
+
+# end def iter_records
+
+# function read_file_count
+# Returns the file count of a ".col" file, read from its collection line only (the first line)
+# for instance the amount of files expected by the next scan, for its ETA (see utils_stats.ScanStats.expectedFiles)
+# param sColFilePath : the col file path
+# param encoding : the encoding of the col file, utils_writer.COL_ENCODING if None
+# returns : the file count, None if the file does not exist or does not begin with a collection line
+def read_file_count(sColFilePath :str, encoding :str = None):
+    records = iter_records(sColFilePath, encoding)
+    try:
+        kind, iLevel, values = next(records, (None, 0, None))
+    except (OSError, ValueError):
+        return None
+    finally:
+        records.close()
+    return values[3] if kind == RECORD_COLLECTION else None
+
+# end def read_file_count
+
+# function read_collection
+# Loads a ".col" file back in a CollectionNode
+# the file values are rounded : the FileNode sizes are the kilobytes * 1024, the durations are whole seconds,
+# the sample rates are rounded to 10 Hz, the bitdepth of a mp3 is its MPEG layer
+# the aggregates of the folders, volumes and collection are the ones of the file, until the tree changes
+# so writing the loaded collection with write_collection gives back the same file
+# param sColFilePath : the col file path
+# param encoding : the encoding of the col file, utils_writer.COL_ENCODING if None
+# param encodingErrors : the error handler of the encoding, utils_writer.COL_ENCODING_ERRORS if None
+# returns : the CollectionNode
+def read_collection(sColFilePath :str, encoding :str = None, encodingErrors :str = None):
+    collection = node_classes.CollectionNode("AudioCollection")
+    # the current path : stack[i] is the node at the level i, with the aggregates read from its line
+    stack = [(collection, (0, 0, 0, 0))]
+
+    for kind, iLevel, values in iter_records(sColFilePath, encoding, encodingErrors):
+        if kind == RECORD_COLLECTION:
+            stack[0] = (collection, (values[0] * 1024, values[1], values[2], values[3]))
+            continue
+        # the nodes of the levels >= iLevel are complete
+        while len(stack) > iLevel:
+            node, aggregates = stack.pop()
+            node.preset_aggregates(*aggregates)
+        parent = stack[-1][0]
+        if kind == RECORD_FILE:
+            (name, iSize, iDuration, iSampleRate, iKanal, iVersion, iLayer,
+             title, artist, album, track, year, comment, genre) = values
+            node_classes.FileNode(name, iSize * 1024, abs(iDuration), iSampleRate * 10,
+                                  title, artist, album, track, year, comment, genre,
+                                  None if iLayer == 0 else iLayer, 2 if iKanal == 1 else 1, parent=parent)
+        elif kind == RECORD_VOLUME:
+            node = node_classes.VolumeNode(values[0], parent=parent)
+            stack.append((node, (values[1] * 1024, values[2], values[3], values[4])))
+        else:
+            node = node_classes.FolderNode(values[0], parent=parent)
+            stack.append((node, (values[1] * 1024, values[2], values[3], values[4])))
+
+    while stack:
+        node, aggregates = stack.pop()
+        node.preset_aggregates(*aggregates)
+    return collection
+
+# end def read_collection
@@ -0,0 +1,270 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the binary snapshot of a scanned collection, reloaded without touching the disks
+# * save_snapshot(collection, snapshotPath, compression), from a CollectionNode or a table_classes.TableCollection
+# * load_snapshot(snapshotPath), returning a table_classes.TableCollection, the snapshot can be compressed
+#   which can be written with write_collection, or converted with to_collection_node
+# * to_collection_node(collection), the bigtree model of a loaded snapshot
+#
+# the snapshot is the table_classes layout written as little-endian columns, no pickle :
+# * the header : magic, version, the amount of strings, files and folders, the collection name
+# * the string dictionary : the repeated tags (artist, album, track, year, genre) are ids in it,
+#   with the kind of every value (string, or integer for the track numbers)
+# * the text columns : the file names, titles and comments, and the folder names
+# * the fixed-width file columns (size, duration, sample rate... format code) and folder columns
+#   (parent, position, file range, totals), the folders in the pre-order of the tree
+# every column is loaded with one array.frombytes call, so the load time is mostly the one of the folders
+##################################################################
+
+import os
+import struct
+import sys
+from array import array
+import node_classes
+import table_classes
+import utils_compress
+
+# the first bytes of a snapshot file
+SNAPSHOT_MAGIC = b"LAFSNAP\x00"
+# the format version, a snapshot of another version is refused
+SNAPSHOT_VERSION = 2
+
+# magic, version, string count, file count, folder count
+__HEADER = struct.Struct("<8sHIQI")
+# the length of a block of bytes
+__LENGTH = struct.Struct("<Q")
+# the numeric file columns of table_classes.FileTable, and their array type
+__FILE_COLUMNS = (("size", "q"), ("duration", "d"), ("sampleRate", "i"), ("bitdepth", "h"), ("channels", "h"),
+                  ("artist", "i"), ("album", "i"), ("track", "i"), ("year", "i"), ("genre", "i"))
+# the folder columns : parent folder index (-1 for a volume), amount of files of the parent before the folder,
+# file range in the FileTable, totals
+__FOLDER_COLUMNS = (("parent", "i"), ("position", "q"), ("fileStart", "q"), ("fileEnd", "q"),
+                    ("size", "q"), ("duration", "d"), ("folderCount", "q"), ("fileCount", "q"))
+
+# private method file_tags
+# Returns the tags tuple of a FileNode or a table_classes.FileView (see utils_tag.read_tags)
+def __file_tags(fileNode):
+    return (fileNode.size, fileNode.duration, fileNode.sampleRate, fileNode.title, fileNode.artist, fileNode.album,
+            fileNode.track, fileNode.year, fileNode.comment, fileNode.genre, fileNode.bitdepth, fileNode.channels,
+            fileNode.durationEstimated)
+
+# private method write_array
+# Writes the array values in little-endian, after their length in bytes
+def __write_array(snapshotFile, values :array):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    snapshotFile.write(__LENGTH.pack(len(values) * values.itemsize))
+    values.tofile(snapshotFile)
+
+# private method write_bytes
+# Writes a block of bytes, after its length
+def __write_bytes(snapshotFile, data):
+    snapshotFile.write(__LENGTH.pack(len(data)))
+    snapshotFile.write(data)
+
+# private method write_text
+# Writes a table_classes.TextColumn : its end offsets, its None flags and its encoded strings
+def __write_text(snapshotFile, column :table_classes.TextColumn):
+    __write_array(snapshotFile, column._ends)
+    __write_bytes(snapshotFile, column._none)
+    __write_bytes(snapshotFile, column._data)
+
+# function save_snapshot
+# Writes the collection in a snapshot file, in a temporary file replaced at the end
+# the totals of the folders are saved as they are, so a collection read from a ".col" file keeps its rounded values
+# param collection : the CollectionNode (with its aggregates) or the table_classes.TableCollection to save
+# param sSnapshotPath : the snapshot file path
+# param compression : the compression of the file (see utils_compress.resolve_compression), by its extension if None
+def save_snapshot(collection, sSnapshotPath :str, compression :str = None):
+    table = table_classes.FileTable()
+    folderNames = table_classes.TextColumn()
+    folders = {name: array(typecode) for name, typecode in __FOLDER_COLUMNS}
+    # the folders are numbered in the pre-order, the files of a folder are contiguous in the table
+    stack = [(volume, -1, 0) for volume in reversed(collection.children)]
+    while stack:
+        folderNode, iParent, iPosition = stack.pop()
+        iFolder = len(folderNames)
+        fileStart = len(table)
+        subFolders = []
+        for child in folderNode.children:
+            if isinstance(child, (node_classes.FileNode, table_classes.FileView)):
+                table.append(child.name, __file_tags(child))
+            else:
+                subFolders.append((child, iFolder, len(table) - fileStart))
+        folderNames.append(folderNode.name)
+        for name, value in (("parent", iParent), ("position", iPosition), ("fileStart", fileStart),
+                            ("fileEnd", len(table)), ("size", folderNode.size), ("duration", folderNode.duration),
+                            ("folderCount", folderNode.folderCount), ("fileCount", folderNode.fileCount)):
+            folders[name].append(value)
+        stack.extend(reversed(subFolders))
+
+    # the pooled values are strings, or integers for the track numbers read by TinyTag
+    strings = table_classes.TextColumn()
+    kinds = bytearray()
+    for value in table.strings.values[1:]:
+        if isinstance(value, int):
+            kinds.append(1)
+            value = str(value)
+        else:
+            kinds.append(0)
+        strings.append(value)
+
+    compression = utils_compress.resolve_compression(sSnapshotPath, compression)
+    sTempPath = sSnapshotPath + "." + str(os.getpid()) + ".tmp"
+    with open(sTempPath, "wb") as rawFile:
+        snapshotFile = rawFile if compression is None else utils_compress.open_write(rawFile, compression)
+        snapshotFile.write(__HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(strings), len(table), len(folderNames)))
+        __write_bytes(snapshotFile, collection.name.encode("utf-8", "surrogatepass"))
+        __write_text(snapshotFile, strings)
+        __write_bytes(snapshotFile, kinds)
+        __write_text(snapshotFile, table.name)
+        __write_text(snapshotFile, table.title)
+        __write_text(snapshotFile, table.comment)
+        for name, typecode in __FILE_COLUMNS:
+            __write_array(snapshotFile, getattr(table, name))
+        __write_bytes(snapshotFile, table.durationEstimated)
+        __write_bytes(snapshotFile, table.fileFormat)
+        __write_text(snapshotFile, folderNames)
+        for name, typecode in __FOLDER_COLUMNS:
+            __write_array(snapshotFile, folders[name])
+        # ends the compressed data
+        snapshotFile.close()
+    os.replace(sTempPath, sSnapshotPath)
+    print("[debug][save_snapshot] " + str(len(table)) + " files, " + str(len(folderNames)) + " folders saved in ["
+          + sSnapshotPath + "]")
+
+# end def save_snapshot
+
+"""
+Reads the blocks of a snapshot file loaded in memory, in the order save_snapshot writes them
+@attribute position : the offset of the next block
+"""
+class SnapshotReader:
+
+    # the length of a block of bytes, like the one written by save_snapshot
+    __LENGTH = struct.Struct("<Q")
+
+    def __init__(self, data :bytes, position :int = 0):
+        self._data = memoryview(data)
+        self.position = position
+
+    # function read_bytes
+    # Returns the next block of bytes
+    def read_bytes(self):
+        iLength, = self.__LENGTH.unpack_from(self._data, self.position)
+        iStart = self.position + self.__LENGTH.size
+        self.position = iStart + iLength
+        if self.position > len(self._data):
+            raise ValueError("[ERROR][load_snapshot] truncated snapshot")
+        return self._data[iStart:self.position]
+
+    # function read_array
+    # Returns the next block as an array of typecode, of iCount values
+    def read_array(self, typecode :str, iCount :int):
+        values = array(typecode)
+        values.frombytes(self.read_bytes())
+        if len(values) != iCount:
+            raise ValueError("[ERROR][load_snapshot] unexpected column length")
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    # function read_text
+    # Returns the next table_classes.TextColumn, of iCount values
+    def read_text(self, iCount :int):
+        column = table_classes.TextColumn()
+        column._ends = self.read_array("q", iCount)
+        column._none = bytearray(self.read_bytes())
+        column._data = bytearray(self.read_bytes())
+        if len(column._none) != iCount:
+            raise ValueError("[ERROR][load_snapshot] unexpected column length")
+        return column
+
+# end class SnapshotReader
+
+# function load_snapshot
+# Reads a snapshot file written by save_snapshot
+# param sSnapshotPath : the snapshot file path
+# returns : a table_classes.TableCollection, with the totals saved in the snapshot
+def load_snapshot(sSnapshotPath :str):
+    with utils_compress.open_read(sSnapshotPath) as snapshotFile:
+        data = snapshotFile.read()
+    if len(data) < __HEADER.size:
+        raise ValueError("[ERROR][load_snapshot] [" + sSnapshotPath + "] is not a snapshot")
+    magic, iVersion, iStrings, iFiles, iFolders = __HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("[ERROR][load_snapshot] [" + sSnapshotPath + "] is not a snapshot")
+    if iVersion != SNAPSHOT_VERSION:
+        raise ValueError("[ERROR][load_snapshot] [" + sSnapshotPath + "] has the unsupported version " + str(iVersion))
+    reader = SnapshotReader(data, __HEADER.size)
+
+    collection = table_classes.TableCollection(bytes(reader.read_bytes()).decode("utf-8", "surrogatepass"))
+    table = collection.table
+    strings = reader.read_text(iStrings)
+    kinds = reader.read_bytes()
+    table.strings.values = [None] + [int(strings[i]) if kinds[i] else strings[i] for i in range(iStrings)]
+    table.strings._ids = {value: valueId for valueId, value in enumerate(table.strings.values)}
+    table.name = reader.read_text(iFiles)
+    table.title = reader.read_text(iFiles)
+    table.comment = reader.read_text(iFiles)
+    for name, typecode in __FILE_COLUMNS:
+        setattr(table, name, reader.read_array(typecode, iFiles))
+    table.durationEstimated = bytearray(reader.read_bytes())
+    table.fileFormat = bytearray(reader.read_bytes())
+
+    folderNames = reader.read_text(iFolders)
+    columns = [reader.read_array(typecode, iFolders) for name, typecode in __FOLDER_COLUMNS]
+    folders = []
+    for iFolder, (iParent, iPosition, fileStart, fileEnd, size, duration, folderCount, fileCount) in enumerate(zip(*columns)):
+        if iParent < 0:
+            folder = collection.add_volume(folderNames[iFolder])
+        else:
+            parent = folders[iParent]
+            folder = table_classes.TableFolder(folderNames[iFolder], table, parent.depth + 1)
+            if parent.folders is None:
+                parent.folders = []
+                parent.positions = array("l")
+            parent.folders.append(folder)
+            parent.positions.append(iPosition)
+        folder.fileStart, folder.fileEnd, folder._pending = fileStart, fileEnd, None
+        folder.size, folder.duration, folder.folderCount, folder.fileCount = size, duration, folderCount, fileCount
+        folders.append(folder)
+    print("[debug][load_snapshot] " + str(iFiles) + " files, " + str(iFolders) + " folders loaded from ["
+          + sSnapshotPath + "]")
+    return collection
+
+# end def load_snapshot
+
+# function to_collection_node
+# Converts a table_classes.TableCollection (for instance a loaded snapshot) to the bigtree model
+# the totals are preset once the tree is built, not computed again (see AggregateNode.preset_aggregates)
+# param collection : the TableCollection
+# returns : a CollectionNode
+def to_collection_node(collection :table_classes.TableCollection):
+    collectionNode = node_classes.CollectionNode(collection.name)
+    volumeNodes = [node_classes.VolumeNode(volume.name) for volume in collection.volumes]
+    collectionNode.children = volumeNodes
+    stack = list(zip(collection.volumes, volumeNodes))
+    folders = []
+    while stack:
+        folder, folderNode = stack.pop()
+        folders.append((folder, folderNode))
+        children = []
+        for child in folder.children:
+            if isinstance(child, table_classes.FileView):
+                children.append(node_classes.FileNode(child.name, *__file_tags(child)))
+            else:
+                subFolderNode = node_classes.FolderNode(child.name)
+                children.append(subFolderNode)
+                stack.append((child, subFolderNode))
+        if children:
+            folderNode.children = children
+    # the subtrees are complete, attaching a child would invalidate the preset totals
+    for folder, folderNode in folders:
+        folderNode.preset_aggregates(folder.size, folder.duration, folder.folderCount, folder.fileCount)
+    collectionNode.preset_aggregates(collection.size, collection.duration, collection.folderCount, collection.fileCount)
+    return collectionNode
+
+# end def to_collection_node
@@ -0,0 +1,56 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the scan state used by the incremental rescan
+# * class FolderState
+#   the modification times of the scanned folders, saved next to the ".col" file
+#   a folder whose modification time did not change has the same entries as in the previous scan
+##################################################################
+
+import json
+import os
+
+"""
+The folder modification times of the previous scan and of the current one
+@attribute previous : the modification times read from the state file, by folder path
+@attribute current : the modification times recorded during the current scan, by folder path
+"""
+class FolderState:
+
+    def __init__(self, previous :dict = None):
+        self.previous = {} if previous is None else previous
+        self.current = {}
+
+    # function changed
+    # Returns True if the folder was not scanned before or if its modification time changed
+    # param sPath : the folder path
+    # param mtime : the current modification time of the folder (st_mtime_ns)
+    def changed(self, sPath :str, mtime :int):
+        return self.previous.get(sPath) != mtime
+
+    # function record
+    # Records the modification time of a folder seen during the current scan
+    # param sPath : the folder path
+    # param mtime : the modification time of the folder (st_mtime_ns), read before listing the folder
+    def record(self, sPath :str, mtime :int):
+        self.current[sPath] = mtime
+
+    # function save
+    # Writes the folders of the current scan in a state file, the deleted folders are not kept
+    # param sStatePath : the state file path
+    def save(self, sStatePath :str):
+        with open(sStatePath, "w", encoding="utf-8") as stateFile:
+            json.dump(self.current, stateFile)
+
+    # function load
+    # Reads a state file written by save, an empty state if the file does not exist
+    # param sStatePath : the state file path
+    # returns : a FolderState whose previous modification times are the ones of the file
+    @staticmethod
+    def load(sStatePath :str):
+        if not os.path.exists(sStatePath):
+            return FolderState()
+        with open(sStatePath, "r", encoding="utf-8") as stateFile:
+            return FolderState(json.load(stateFile))
+
+# end class FolderState
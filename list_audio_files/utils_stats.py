@@ -0,0 +1,179 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the instrumentation of the scan and of the export
+# * class ScanStats
+#   the time of every phase (walk, tag, aggregate, write), the counters
+#   (directories, files, bytes read, stat calls, tag errors, cache hits),
+#   the progress callback (files per second, ETA) and the optional cProfile and tracemalloc reports
+# build_collection fills it (see CollectionNode.stats) and write_collection returns it
+# a ScanStats can be started and stopped several times, the elapsed times are added
+##################################################################
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+# the phases, in the run order
+PHASES = ("walk", "tag", "aggregate", "write")
+# the counters, bytesRead is the amount of bytes read by the process while started (Linux only, 0 elsewhere)
+COUNTERS = ("directories", "files", "bytesRead", "statCalls", "tagErrors", "cacheHits", "cacheMisses")
+
+"""
+The statistics of a scan and of its export
+the counters are updated by the scanning threads, the updates are serialized by a lock
+the phase times are summed over the threads (and over the workers for the tag phase)
+so with several devices or tag workers they can be larger than the elapsed time
+@attribute phases : the seconds spent in every phase of PHASES
+@attribute counters : the value of every counter of COUNTERS
+@attribute elapsed : the seconds between start() and stop() (or now, while running), added over the runs
+@attribute expectedFiles : the amount of files expected, for the ETA, None if unknown
+                          (for instance the file count of the previous col file, see utils_reader.read_file_count)
+@attribute progress : function(stats) called every progressInterval seconds while files are added,
+                      and once by every stop() with the stats of the run (running is then False), or None
+                      the library does not print the statistics, the progress callback reports them
+"""
+class ScanStats:
+
+    def __init__(self, progress=None, expectedFiles :int = None, progressInterval :float = 1.0,
+                 profile :bool = False, traceMemory :bool = False, reportFile=None):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.progress = progress
+        self.expectedFiles = expectedFiles
+        self.progressInterval = progressInterval
+        self._profile = cProfile.Profile() if profile else None
+        self._traceMemory = traceMemory
+        # the reports are written in reportFile, the error output if None
+        self._reportFile = reportFile
+        self._lock = threading.Lock()
+        self._elapsed = 0.0
+        # the start time of the current run, None if stopped
+        self._start = None
+        self._readBytes = None
+        self._nextProgress = 0.0
+
+    # private method read_bytes
+    # Returns the amount of bytes read by the process so far (Linux /proc/self/io rchar), or None
+    @staticmethod
+    def __read_bytes():
+        try:
+            with open("/proc/self/io") as ioFile:
+                for line in ioFile:
+                    if line.startswith("rchar:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    # function start
+    # Starts (or restarts) the elapsed time, the bytes read count and the optional profilers
+    def start(self):
+        self._start = time.perf_counter()
+        self._nextProgress = self._start + self.progressInterval
+        self._readBytes = self.__read_bytes()
+        if self._profile is not None:
+            self._profile.enable()
+        if self._traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # function stop
+    # Stops the elapsed time and the optional profilers, writes their reports and calls the progress callback
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._start is not None:
+            self._elapsed += time.perf_counter() - self._start
+            self._start = None
+        readBytes = self.__read_bytes()
+        if readBytes is not None and self._readBytes is not None:
+            self.count("bytesRead", readBytes - self._readBytes)
+        self._readBytes = None
+        reportFile = self._reportFile or sys.stderr
+        if self._profile is not None:
+            stream = io.StringIO()
+            pstats.Stats(self._profile, stream=stream).sort_stats("cumulative").print_stats(30)
+            reportFile.write(stream.getvalue())
+        if self._traceMemory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            reportFile.write("[stats] memory : " + str(current) + " bytes, peak " + str(peak) + " bytes\n")
+            for statistic in snapshot.statistics("lineno")[:20]:
+                reportFile.write("[stats] " + str(statistic) + "\n")
+        if self.progress is not None:
+            self.progress(self)
+
+    # True between start() and stop()
+    @property
+    def running(self):
+        return self._start is not None
+
+    @property
+    def elapsed(self):
+        if self._start is None:
+            return self._elapsed
+        return self._elapsed + time.perf_counter() - self._start
+
+    # function add_time
+    # Adds seconds to a phase
+    def add_time(self, phase :str, seconds :float):
+        with self._lock:
+            self.phases[phase] += seconds
+
+    # function count
+    # Adds value to a counter, and calls the progress callback when a file is added and the interval is over
+    def count(self, counter :str, value :int = 1):
+        with self._lock:
+            self.counters[counter] += value
+        if counter == "files" and self.progress is not None and self._start is not None:
+            now = time.perf_counter()
+            if now >= self._nextProgress:
+                self._nextProgress = now + self.progressInterval
+                self.progress(self)
+
+    @property
+    def filesPerSecond(self):
+        elapsed = self.elapsed
+        return self.counters["files"] / elapsed if elapsed > 0 else 0.0
+
+    # the seconds left to reach expectedFiles at the current speed, None if unknown
+    @property
+    def eta(self):
+        rate = self.filesPerSecond
+        if self.expectedFiles is None or rate <= 0:
+            return None
+        return max(self.expectedFiles - self.counters["files"], 0) / rate
+
+    # function as_dict
+    # Returns the statistics as a dict of plain values (JSON serializable)
+    def as_dict(self):
+        return {"elapsed": round(self.elapsed, 6), "filesPerSecond": round(self.filesPerSecond, 1),
+                "phases": {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+                "counters": dict(self.counters)}
+
+    def __str__(self):
+        return ("[stats] " + str(self.counters["files"]) + " files, " + str(self.counters["directories"]) + " directories in "
+                + "%.1f" % self.elapsed + " s (" + "%.0f" % self.filesPerSecond + " files/s), "
+                + ", ".join(phase + " %.2f s" % seconds for phase, seconds in self.phases.items()) + ", "
+                + ", ".join(counter + " " + str(value) for counter, value in self.counters.items() if counter != "files"
+                            and counter != "directories"))
+
+# end class ScanStats
+
+# function print_progress
+# A progress callback printing the files, the files per second and the ETA while running,
+# then the phase times and the counters once stopped
+def print_progress(stats :ScanStats):
+    if not stats.running:
+        print(str(stats))
+        return
+    eta = stats.eta
+    print("[progress] " + str(stats.counters["files"]) + " files, " + "%.0f" % stats.filesPerSecond + " files/s"
+          + ("" if eta is None else ", ETA " + "%.0f" % eta + " s"))
+
+# end def print_progress
@@ -0,0 +1,205 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the functions reading the audio tags of a file
+# * read_tags(sPath)
+# * read_tags_fast(sPath), reading only the metadata regions (see utils_header)
+# * class TagPool, reading the tags in a thread pool or a process pool
+# the tags are returned as a tuple following the FileNode constructor order
+# so a FileNode is built with FileNode(name, *tags, parent=...)
+##################################################################
+
+import os
+import struct
+import time
+import concurrent.futures
+import functools
+import node_classes
+import utils_format
+import utils_header
+from tinytag import TinyTag
+
+# the FileNode fields returned by read_tags, in the FileNode constructor order
+TAG_FIELDS = ("size", "duration", "sampleRate", "title", "artist", "album", "track",
+              "year", "comment", "genre", "bitdepth", "channels", "durationEstimated")
+
+# function read_tags
+# Reads the audio tags of a file with TinyTag
+# param sPath : the audio file path
+# returns : a tuple (size, duration, sampleRate, title, artist, album, track, year, comment, genre, bitdepth, channels,
+#           durationEstimated), durationEstimated is always False
+def read_tags(sPath :str):
+    tag = TinyTag.get(sPath)
+    return (tag.filesize, tag.duration, tag.samplerate, tag.title, tag.artist, tag.album, tag.track,
+            tag.year, tag.comment, tag.genre, tag.bitdepth, tag.channels, False)
+
+# end def read_tags
+
+# function read_tags_fast
+# Reads the audio tags of a file from its metadata regions only, with utils_header.read_header_tags
+# the duration of a VBR mp3 without Xing/VBRI header is estimated, durationEstimated is then True
+# a file the header parser can not read, or whose format it does not read (see utils_format.FORMATS), is read with TinyTag
+# param sPath : the audio file path
+# returns : a tuple like read_tags
+def read_tags_fast(sPath :str):
+    if not utils_format.FORMATS[utils_format.format_of(sPath)][4]:
+        return read_tags(sPath)
+    try:
+        return utils_header.read_header_tags(sPath)
+    except (ValueError, IndexError, struct.error):
+        return read_tags(sPath)
+
+# end def read_tags_fast
+
+"""
+Reads the tags of the audio files in a thread pool (or a process pool)
+while the folders are walked, and attaches the FileNodes to their parent
+in the same order as the serial walk
+the walk submits the reads, at most maxPending of them are waiting : beyond, add_file handles the finished
+reads until half of them are left, so the memory of the pool is bounded whatever the size of the library
+and the folders are attached as soon as their reads are done, during the walk
+@attribute maxPending : the maximum amount of submitted reads not handled yet
+@attribute useProcesses : True to use a process pool instead of a thread pool
+@attribute tagCache : the utils_cache.TagCache to use, or None
+@attribute fastTags : True to read the tags with read_tags_fast instead of read_tags
+@attribute stats : the utils_stats.ScanStats to update, or None
+@attribute errors : the utils_errors.ScanErrors of the tolerant mode, or None
+                    in a thread pool the reads are run by errors.read_tags (timeout, retries),
+                    in a process pool the failed reads are only recorded
+"""
+class TagPool:
+
+    # param workers : the amount of tag reads in flight
+    # param maxPending : see the attribute, workers * 16 if None
+    def __init__(self, workers :int, useProcesses :bool = False, tagCache=None, fastTags :bool = False, stats=None,
+                 errors=None, maxPending :int = None):
+        if useProcesses:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.tagCache = tagCache
+        self.fastTags = fastTags
+        self.stats = stats
+        self.errors = errors
+        self._useProcesses = useProcesses
+        self.maxPending = maxPending if maxPending is not None else workers * 16
+        # future -> (layout, slot index, path, stat)
+        self._pending = {}
+
+    # function new_layout
+    # Starts the children list of parentNode, the children are attached once all their tags are read
+    # param parentNode : the FolderNode or VolumeNode whose children are added
+    # returns : the layout to give to add_folder, add_file and close_layout
+    def new_layout(self, parentNode):
+        # [parent, slots, amount of pending reads, closed]
+        return [parentNode, [], 0, False]
+
+    # function add_folder
+    # Adds a FolderNode (without parent) to the children list
+    def add_folder(self, layout, folderNode):
+        layout[1].append(folderNode)
+
+    # function add_file
+    # Adds an audio file to the children list, its tags are taken from the cache or submitted to the pool
+    # param layout : the layout returned by new_layout
+    # param entry : the os.DirEntry of the audio file
+    def add_file(self, layout, entry :os.DirEntry):
+        st = None
+        if self.tagCache is not None:
+            try:
+                st = entry.stat()
+            except OSError as error:
+                if self.errors is None:
+                    raise
+                # a file removed or unreadable since the listing fails like a tag read, a skipped file has no slot
+                tags, failed = self.errors.failed(entry.path, error, 1)
+                if tags is not None:
+                    layout[1].append(node_classes.FileNode(entry.name, *tags))
+                return
+            tags = self.tagCache.get(entry.path, st, not self.fastTags)
+            if self.stats is not None:
+                self.stats.count("statCalls")
+                self.stats.count("cacheMisses" if tags is None else "cacheHits")
+            if tags is not None:
+                layout[1].append(node_classes.FileNode(entry.name, *tags))
+                return
+        readTags = read_tags_fast if self.fastTags else read_tags
+        if self.errors is not None and not self._useProcesses:
+            readTags = functools.partial(self.errors.read_tags, readTags, st=st)
+        future = self._executor.submit(TagPool._read_timed, readTags, entry.path)
+        self._pending[future] = (layout, len(layout[1]), entry.path, st)
+        layout[1].append(entry.name)
+        layout[2] += 1
+        if len(self._pending) >= self.maxPending:
+            # waits for the workers, the walk goes on once half of the reads are handled
+            self.__drain(self.maxPending // 2)
+
+    # function close_layout
+    # Ends the children list, it is attached now if no tag read is pending
+    def close_layout(self, layout):
+        layout[3] = True
+        if layout[2] == 0:
+            self.__attach(layout)
+
+    # function join
+    # Waits for the pending tag reads, attaches the last FileNodes and shuts the pool down
+    def join(self):
+        self.__drain(0)
+        self._executor.shutdown()
+
+    # function cancel
+    # Shuts the pool down without waiting for the pending reads, after a failed walk
+    def cancel(self):
+        self._pending.clear()
+        self._executor.shutdown(cancel_futures=True)
+
+    # private method drain
+    # Handles the finished reads as they come back, until at most iLimit reads are pending
+    def __drain(self, iLimit :int):
+        while len(self._pending) > iLimit:
+            done, notDone = concurrent.futures.wait(self._pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                self.__complete(future)
+
+    # private method complete
+    # Puts the result of a finished read in its slot, the folder is attached once its last read is done
+    def __complete(self, future):
+        layout, index, sPath, st = self._pending.pop(future)
+        failed = False
+        try:
+            tags, seconds = future.result()
+        except Exception as error:
+            if self.errors is None:
+                if self.stats is not None:
+                    self.stats.count("tagErrors")
+                raise
+            (tags, failed), seconds = self.errors.failed(sPath, error, 1, st), 0.0
+        else:
+            if self.errors is not None:
+                # the thread pool runs errors.read_tags, the process pool the plain reads
+                tags, failed = self.errors.validate(sPath, tags, 1, st) if self._useProcesses else tags
+        if self.stats is not None:
+            self.stats.add_time("tag", seconds)
+        if self.tagCache is not None and not failed:
+            self.tagCache.put(sPath, st, tags)
+        # a skipped file leaves an empty slot
+        layout[1][index] = None if tags is None else node_classes.FileNode(layout[1][index], *tags)
+        layout[2] -= 1
+        if layout[2] == 0 and layout[3]:
+            self.__attach(layout)
+
+    # the tag read run by the workers, with its duration (a static method, so the process pool can pickle it)
+    @staticmethod
+    def _read_timed(readTags, sPath :str):
+        start = time.perf_counter()
+        return readTags(sPath), time.perf_counter() - start
+
+    def __attach(self, layout):
+        if None in layout[1]:
+            layout[1] = [child for child in layout[1] if child is not None]
+        if layout[1]:
+            layout[0].children = layout[1]
+        # the slots are not needed anymore
+        layout[1] = None
+
+# end class TagPool
@@ -0,0 +1,87 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the traversal of a built collection, for the writer and the other exporters and reports
+# * walk_collection(collection, withLeave), the nodes in pre-order with their kind and depth, without recursion
+# * class CollectionVisitor, calling a method per kind of node during the walk
+# the collections of node_classes and of table_classes are walked the same way
+# the depth is counted by the walk (the collection is at the depth 1, like bigtree), not read from the nodes
+##################################################################
+
+import node_classes
+import table_classes
+
+# the kinds of the walked nodes
+VISIT_COLLECTION = 0
+VISIT_VOLUME = 1
+VISIT_FOLDER = 2
+VISIT_FILE = 3
+# the end of a volume or a folder, once its subtree is walked (see walk_collection withLeave)
+VISIT_LEAVE = 4
+
+# private method kind_of
+# Returns the kind of a child of a volume or a folder
+def __kind_of(node):
+    if isinstance(node, (node_classes.FileNode, table_classes.FileView)):
+        return VISIT_FILE
+    if isinstance(node, (node_classes.FolderNode, table_classes.TableFolder)):
+        return VISIT_FOLDER
+    print("[ERROR][walk_collection] unknown node [" + node.name + "]")
+    raise Exception("[ERROR][walk_collection] unknown node [" + node.name + "]")
+
+# function walk_collection
+# Walks a collection in pre-order : the collection, then every volume followed by its subtree, in the children order
+# an explicit stack is used instead of recursion, so the depth of the tree is not limited by the recursion limit
+# param collection : the node_classes.CollectionNode or table_classes.TableCollection
+# param withLeave : True to yield a VISIT_LEAVE item after the subtree of every volume and folder
+# yield (kind, depth, node), the kind is one of the VISIT_ values, the depth is the bigtree one (1 for the collection)
+def walk_collection(collection, withLeave :bool = False):
+    yield VISIT_COLLECTION, 1, collection
+    # the children are pushed reversed, so they are popped in order, None marks the end of a subtree
+    stack = [(VISIT_VOLUME, 2, volume) for volume in reversed(collection.children)]
+    while stack:
+        kind, iDepth, node = stack.pop()
+        yield kind, iDepth, node
+        if kind == VISIT_VOLUME or kind == VISIT_FOLDER:
+            if withLeave:
+                stack.append((VISIT_LEAVE, iDepth, node))
+            iChildDepth = iDepth + 1
+            stack.extend((__kind_of(child), iChildDepth, child) for child in reversed(node.children))
+
+# end def walk_collection
+
+"""
+A visitor of a collection : visit walks the collection and calls the method of the kind of every node
+the methods do nothing, a visitor overrides the ones it needs (a report, an exporter...)
+the depth given to the methods is the bigtree one (1 for the collection, 2 for the volumes)
+"""
+class CollectionVisitor:
+
+    def visit_collection(self, collection):
+        pass
+
+    def visit_volume(self, volume, iDepth :int):
+        pass
+
+    def visit_folder(self, folder, iDepth :int):
+        pass
+
+    def visit_file(self, file, iDepth :int):
+        pass
+
+    # function leave_folder
+    # Called once the subtree of a volume or a folder is walked
+    def leave_folder(self, folder, iDepth :int):
+        pass
+
+    # function visit
+    # Walks the collection (see walk_collection) and calls the methods of the visitor
+    # returns : the visitor
+    def visit(self, collection):
+        methods = (lambda node, iDepth: self.visit_collection(node), self.visit_volume, self.visit_folder,
+                   self.visit_file, self.leave_folder)
+        for kind, iDepth, node in walk_collection(collection, True):
+            methods[kind](node, iDepth)
+        return self
+
+# end class CollectionVisitor
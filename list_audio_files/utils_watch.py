@@ -0,0 +1,374 @@
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the watch mode, keeping the ".col" file current while the collection changes
+# * class Inotify
+#   a small ctypes binding of the Linux inotify API, one watch per folder
+# * class CollectionWatcher
+#   keeps the CollectionNode in memory, patches only the notified folders (see main_functions.update_folder)
+#   and rewrites the ".col" file once the changes stop for a while (debounce), replacing it atomically
+#   without inotify (not Linux, too many folders...) the folders are checked by polling, with rescan_collection :
+#   the files added, removed or renamed are seen, not the files rewritten in place (their folder does not change)
+##################################################################
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+import main_functions
+import node_classes
+import utils_filter
+import utils_state
+
+# the inotify event masks, see <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+"""
+Linux inotify, through the C library
+@attribute paths : the folder path of every watch descriptor
+"""
+class Inotify:
+
+    # the inotify_event header : wd, mask, cookie, len
+    __EVENT = struct.Struct("iIII")
+    # the events watched on every folder : the entries added, removed or renamed, and the files written
+    __MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    def __init__(self):
+        sLibrary = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(sLibrary, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self._fd < 0:
+            iErrno = ctypes.get_errno()
+            raise OSError(iErrno, os.strerror(iErrno))
+        self.paths = {}
+
+    # function add_watch
+    # Watches the folder sPath, a folder moved in the tree is watched again with its new path
+    def add_watch(self, sPath :str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(sPath), self.__MASK)
+        if wd < 0:
+            iErrno = ctypes.get_errno()
+            raise OSError(iErrno, os.strerror(iErrno), sPath)
+        self.paths[wd] = sPath
+
+    # function read
+    # Waits at most timeout seconds for events
+    # returns : the list of (folder path, entry name, mask), empty after the timeout,
+    #           the folder path is None for IN_Q_OVERFLOW (events were lost)
+    def read(self, timeout :float):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = []
+        iPos = 0
+        while iPos + self.__EVENT.size <= len(data):
+            wd, mask, cookie, iLength = self.__EVENT.unpack_from(data, iPos)
+            iPos += self.__EVENT.size
+            name = os.fsdecode(data[iPos:iPos + iLength].rstrip(b"\x00"))
+            iPos += iLength
+            if mask & IN_IGNORED:
+                # the folder was deleted or moved, its watch is removed
+                self.paths.pop(wd, None)
+                continue
+            events.append((self.paths.get(wd), name, mask))
+        return events
+
+    # function close
+    def close(self):
+        os.close(self._fd)
+
+# end class Inotify
+
+"""
+Keeps a collection and its ".col" file current
+the changes are noted as they are notified, then the folders are patched and the file is written
+once no change was notified for debounce seconds
+@attribute collection : the CollectionNode, built by start()
+@attribute folderState : the utils_state.FolderState of the collection
+@attribute polling : True if the folders are checked by polling instead of inotify
+@attribute scanFilter : the utils_filter.ScanFilter of the collection, or None : the rejected folders are not watched
+                        and the rejected entries are not part of the collection, in every update
+@attribute writes : the amount of ".col" files written
+"""
+class CollectionWatcher:
+
+    # param sBasePath : the root folder path, or a list of root folder paths (see build_collection)
+    # param sColFilePath : the col file path, replaced at every write
+    # param tagCache : optional utils_cache.TagCache
+    # param debounce : the seconds without change before the col file is written
+    # param pollInterval : the seconds between two checks, when polling
+    # param usePolling : True to poll even when inotify is available
+    # param folderStatePath : optional path where the folder state is saved after every write,
+    #                         for a later incremental run
+    # param scanFilter : optional utils_filter.ScanFilter, the rules of build_collection
+    def __init__(self, sBasePath, sColFilePath :str, tagCache=None, debounce :float = 2.0, pollInterval :float = 10.0,
+                 usePolling :bool = False, folderStatePath :str = None, scanFilter :utils_filter.ScanFilter = None):
+        self.basePaths = [sBasePath] if isinstance(sBasePath, str) else list(sBasePath)
+        self.sColFilePath = sColFilePath
+        self.tagCache = tagCache
+        self.scanFilter = scanFilter
+        self.debounce = debounce
+        self.pollInterval = pollInterval
+        self.folderStatePath = folderStatePath
+        # the files written by the watcher under a root, their changes are not changes of the collection :
+        # folder path (as walked) -> names
+        self._ownFiles = {}
+        for sPath in (sColFilePath, folderStatePath):
+            sFolderPath = self.__walked_path(os.path.dirname(os.path.abspath(sPath))) if sPath is not None else None
+            if sFolderPath is not None:
+                self._ownFiles.setdefault(sFolderPath, set()).add(os.path.basename(sPath))
+        self.collection = None
+        self.folderState = None
+        self.writes = 0
+        self._inotify = None
+        self.polling = True
+        if not usePolling:
+            try:
+                self._inotify = Inotify()
+                self.polling = False
+            except OSError as error:
+                print("[debug][CollectionWatcher] inotify not available, polling : " + str(error))
+        # the notified folders to patch : folder path -> names of the files written in place
+        self._dirty = {}
+        self._writeTime = None
+
+    # function start
+    # Builds the collection, writes the col file and starts watching the folders
+    def start(self):
+        self.folderState = utils_state.FolderState()
+        self.collection = main_functions.build_collection(self.basePaths, self.tagCache, folderState=self.folderState,
+                                                          scanFilter=self.scanFilter)
+        if self._inotify is not None:
+            try:
+                for sPath in self.basePaths:
+                    self.__watch_tree(sPath)
+            except OSError as error:
+                # for instance the limit of watches is reached
+                print("[debug][CollectionWatcher] inotify failed, polling : " + str(error))
+                self._inotify.close()
+                self._inotify = None
+                self.polling = True
+        self.__write()
+
+    # function run
+    # Watches until stopEvent is set (a threading.Event), or forever if None
+    def run(self, stopEvent=None):
+        if self.collection is None:
+            self.start()
+        nextPoll = time.monotonic() + self.pollInterval
+        while stopEvent is None or not stopEvent.is_set():
+            now = time.monotonic()
+            timeout = nextPoll - now if self.polling else 1.0
+            if self._writeTime is not None:
+                timeout = min(timeout, self._writeTime - now)
+            timeout = max(timeout, 0.0)
+            if self.polling:
+                if stopEvent is not None:
+                    stopEvent.wait(timeout)
+                else:
+                    time.sleep(timeout)
+                if time.monotonic() >= nextPoll:
+                    self.__poll()
+                    nextPoll = time.monotonic() + self.pollInterval
+            else:
+                events = self._inotify.read(timeout)
+                if events and self.__note(events):
+                    self._writeTime = time.monotonic() + self.debounce
+            if self._writeTime is not None and time.monotonic() >= self._writeTime:
+                self.__patch()
+                self.__write()
+
+    # function close
+    # Stops watching, the pending changes are written
+    def close(self):
+        if self._dirty or self._writeTime is not None:
+            self.__patch()
+            self.__write()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    # private method walked_path
+    # Returns the path of a folder as the walk gives it (a root joined with the relative path), None if it is
+    # not under a root
+    def __walked_path(self, sAbsolutePath :str):
+        for sBasePath in self.basePaths:
+            sRelativePath = os.path.relpath(sAbsolutePath, os.path.abspath(sBasePath))
+            if sRelativePath == os.curdir:
+                return sBasePath
+            if not sRelativePath.startswith(os.pardir):
+                return os.path.join(sBasePath, sRelativePath)
+        return None
+
+    # private method root_position
+    # Returns (the length of the root path with its final separator, the depth of the sub folders) of a walked folder path
+    # (see main_functions.update_folder), None if it is not under a root
+    def __root_position(self, sFolderPath :str):
+        for sBasePath in self.basePaths:
+            sRelativePath = os.path.relpath(sFolderPath, sBasePath)
+            if sRelativePath == os.curdir:
+                return len(os.path.join(sBasePath, "")), 1
+            if not sRelativePath.startswith(os.pardir):
+                return len(os.path.join(sBasePath, "")), sRelativePath.count(os.sep) + 2
+        return None
+
+    # private method accept_folder
+    # Returns True if the sub folder entry of sFolderPath is part of the collection (see scanFilter)
+    def __accept_folder(self, sFolderPath :str, entry :os.DirEntry):
+        if self.scanFilter is None:
+            return True
+        position = self.__root_position(sFolderPath)
+        if position is None:
+            return False
+        iRootLength, iDepth = position
+        return self.scanFilter.accept_folder(entry, utils_filter.relative_path(entry, iRootLength), iDepth)
+
+    # private method own_file
+    # Returns True if the entry is written by the watcher : the col file, its temporary file
+    # (see utils_writer.ColWriter) or the folder state file
+    def __own_file(self, sFolderPath :str, name :str):
+        names = self._ownFiles.get(sFolderPath)
+        if names is None:
+            return False
+        return name in names or (name.endswith(".tmp") and any(name.startswith(own + ".") for own in names))
+
+    # private method watch_tree
+    # Watches sPath and all its sub folders, except the ones rejected by scanFilter
+    def __watch_tree(self, sPath :str):
+        stack = [sPath]
+        while stack:
+            sFolderPath = stack.pop()
+            self._inotify.add_watch(sFolderPath)
+            with os.scandir(sFolderPath) as it:
+                stack.extend(entry.path for entry in it
+                             if entry.is_dir(follow_symlinks=False) and self.__accept_folder(sFolderPath, entry))
+
+    # private method watch_new_folder
+    # Watches a folder created in (or moved to) sFolderPath, with its sub folders, if scanFilter accepts it
+    # returns : False if the folder is rejected, its changes are not changes of the collection
+    def __watch_new_folder(self, sFolderPath :str, name :str):
+        with os.scandir(sFolderPath) as it:
+            entry = next((entry for entry in it if entry.name == name), None)
+        if entry is None:
+            # already removed, the patch of sFolderPath will not find it either
+            return True
+        if not self.__accept_folder(sFolderPath, entry):
+            return False
+        self.__watch_tree(entry.path)
+        return True
+
+    # private method note
+    # Notes the folders to patch, the new folders are watched at once so their content is not missed
+    # returns : True if a folder was noted, the events of the files written by the watcher are ignored
+    def __note(self, events):
+        noted = False
+        for sFolderPath, name, mask in events:
+            if sFolderPath is None:
+                # events were lost, every folder is checked
+                print("[debug][CollectionWatcher] inotify queue overflow, rescanning")
+                self.__poll()
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # noted in the parent folder
+                continue
+            if self.__own_file(sFolderPath, name):
+                # written by __write, noting it would write the col file again and again
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    if not self.__watch_new_folder(sFolderPath, name):
+                        # a folder rejected by scanFilter, not watched and not part of the collection
+                        continue
+                except OSError:
+                    # already removed, the patch of sFolderPath will not find it either
+                    pass
+            noted = True
+            changedNames = self._dirty.setdefault(sFolderPath, set())
+            if not mask & IN_ISDIR and mask & (IN_CLOSE_WRITE | IN_ATTRIB):
+                changedNames.add(name)
+        return noted
+
+    # private method patch
+    # Updates the noted folders, the parent folders first
+    def __patch(self):
+        dirty = self._dirty
+        self._dirty = {}
+        for sFolderPath in sorted(dirty, key=lambda sPath: sPath.count(os.sep)):
+            folderNode = self.__find_node(sFolderPath)
+            if folderNode is not None and os.path.isdir(sFolderPath):
+                iRootLength, iDepth = self.__root_position(sFolderPath)
+                main_functions.update_folder(sFolderPath, folderNode, self.folderState, self.tagCache,
+                                             dirty[sFolderPath], self.scanFilter, iRootLength, iDepth)
+        if dirty:
+            print("[debug][CollectionWatcher] " + str(len(dirty)) + " folders updated")
+
+    # private method poll
+    # Checks the modification time of every folder and updates the changed ones (see rescan_collection)
+    # the changes are written after the debounce time
+    def __poll(self):
+        before = self.collection.aggregates()
+        previous = self.folderState.current
+        self.folderState = utils_state.FolderState(previous)
+        main_functions.rescan_collection(self.basePaths, self.collection, self.folderState, self.tagCache,
+                                         self.scanFilter)
+        if self.folderState.current != previous or self.collection.aggregates() != before:
+            self._writeTime = time.monotonic() + self.debounce
+
+    # private method find_node
+    # Returns the FolderNode (or VolumeNode) of the folder sPath, None if it is not in the collection
+    def __find_node(self, sPath :str):
+        for sBasePath, volumeNode in zip(self.basePaths, self.collection.children):
+            sRelativePath = os.path.relpath(sPath, sBasePath)
+            if sRelativePath == os.curdir:
+                return volumeNode
+            if sRelativePath.startswith(os.pardir):
+                continue
+            node = volumeNode
+            for name in sRelativePath.split(os.sep):
+                node = next((child for child in node.children
+                             if child.name == name and isinstance(child, node_classes.FolderNode)), None)
+                if node is None:
+                    return None
+            return node
+        return None
+
+    # private method write
+    # Writes the col file, write_collection replaces it once complete (a reader never sees a partial file)
+    def __write(self):
+        self._writeTime = None
+        main_functions.write_collection(self.collection, self.sColFilePath, False)
+        self.writes += 1
+        if self.folderStatePath is not None:
+            self.folderState.save(self.folderStatePath)
+        # the files written changed the modification time of their folder, the polling must not see it as a change
+        for sFolderPath in self._ownFiles:
+            if sFolderPath in self.folderState.current:
+                self.folderState.record(sFolderPath, os.stat(sFolderPath).st_mtime_ns)
+        print("[debug][CollectionWatcher] [" + self.sColFilePath + "] written, "
+              + str(self.collection.fileCount) + " files")
+
+# end class CollectionWatcher
@@ -1,241 +1,274 @@
-##################################################################
-# How to write a audio file (mp3, flac) collection in a export file?
-#
-# This file gathers the functions to write the ".col" export file
-# * write_collection_line(colFile, collectionNode: CollectionNode)
-# * write_volume_line(tFile, vn: VolumeNode)
-# * write_folder_line(tFile, cn: FolderNode)
-# * write_file_line(tFile, fn: FileNode)
-#
-# These methods are following the MAC col file description
-# see https://mac.sourceforge.net/
-##################################################################
-
-import utils_ascii
-from math import floor
-from node_classes import CollectionNode, VolumeNode, FolderNode, FileNode
-
-# function write_fileTag
-# write a file (one line) in a ".col" file as described in https://mac.sourceforge.net/
-# param tFile : the stream on the ".col" file
-# param fn : the FileNode to write in colFile
-def write_file_line(tFile, fn: FileNode):
-    iLevel = fn.depth - 1
-    for x in range(iLevel):
-        tFile.write(utils_ascii.TAB)
-
-    # File name(max. 250 characters)
-    tFile.write(fn.name)
-    tFile.write(utils_ascii.SOH)
-    # Size(kilobytes)
-    iSize = floor(fn.size / 1024)
-    tFile.write( str(iSize) )
-    tFile.write(utils_ascii.STX)
-    # Duration(seconds), a negative number means "VBR" - coded with variable bit rate
-    iDuration = floor(fn.duration)
-    if fn.name.endswith(".mp3"):
-        tFile.write( str( floor(iDuration)) )
-    elif fn.name.endswith(".flac"):
-        tFile.write( "-" + str( floor(iDuration)) )
-    else:
-        tFile.write( str( floor(iDuration)) )
-    tFile.write(utils_ascii.ETX)
-    # Sample Rate(without last 0 - e.g. 4410)
-    iSampleRate = floor(fn.sampleRate / 10)
-    tFile.write( str(iSampleRate))
-    tFile.write(utils_ascii.EOT)
-    # Kanal mode:
-    #     Stereo = 1
-    #     Joint Stereo = 2
-    #     Dual Channel = 3
-    #     Mono = 4
-
-    # stereo else mono
-    if fn.channels is not None and fn.channels == 2:
-        tFile.write("1")
-    else:
-        tFile.write("4")
-
-    tFile.write(utils_ascii.ENQ)
-    # MPEG Version:
-    #     Unknown = 0
-    #     V1 = 1
-    #     V2 = 2
-    #     V2.5 = 3
-    #     MPEG + SV4..7 = 4..7
-    #     Windows PCM = 9
-    #     TwinVQ = 10
-    #     Ogg Vorbis = 20
-    #     Windows Media Audio = 25
-    #     Monkeys Audio = 30
-    #     FLAC = 35
-    #     OptimFROG = 40
-    #     AAC = 45
-    #     WavPack = 50
-    if fn.name.endswith(".mp3"):
-        tFile.write("1")
-    elif fn.name.endswith(".flac"):
-        tFile.write("35")
-    else:
-        tFile.write("0")
-
-    tFile.write(utils_ascii.ACK)
-    # MPEG Layer:
-    #     Unknown = 0
-    #     L1..3 = 1..3 or MPEG + SV7 Profile 1..5 = 1..5
-    #     Windows PCM, Monkey 's Audio or FLAC = 8, 16 (bit)
-    #     TwinVQ = 10
-    #     Ogg Vorbis = 20
-    #     Windows Media Audio = 25
-
-    if fn.bitdepth is not None:
-        if fn.name.endswith(".flac"):
-            tFile.write( str(fn.bitdepth) )
-        elif fn.name.endswith(".mp3"):
-            tFile.write("3")
-        else:
-            tFile.write("0")
-    else:
-        tFile.write("0")
-
-    tFile.write(utils_ascii.BEL)
-    tFile.write(utils_ascii.NAK)
-    # ID3 - tag: Title(can be empty)
-    if fn.title is not None:
-        tFile.write(fn.title)
-    tFile.write(utils_ascii.SYN)
-    # ID3 - tag: Artist(can be empty)
-    if fn.artist is not None:
-        tFile.write(fn.artist)
-    tFile.write(utils_ascii.ETB)
-    # ID3 - tag: Album(can be empty)
-    if fn.album is not None:
-        tFile.write(fn.album);
-    tFile.write(utils_ascii.CAN)
-    # ID3 - tag: Track number(can be empty)
-    if fn.track is not None:
-        tFile.write(str(fn.track));
-    tFile.write(utils_ascii.EM)
-    # ID3 - tag: Year(can be empty)
-    if fn.year is not None:
-        tFile.write(fn.year)
-    tFile.write(utils_ascii.SUB)
-    # ID3 - tag: Comment(can be empty)
-    if fn.comment is not None:
-        tFile.write(fn.comment)
-
-    tFile.write(utils_ascii.ESC)
-    # ID3 - tag: Genre (can be empty)
-    if fn.genre is not None:
-        tFile.write(fn.genre)
-
-    tFile.write(utils_ascii.FS)
-
-    # new line
-    tFile.write(utils_ascii.NL)
-
-    # end def write_fileTag
-
-
-# function write_folder
-# write a folder (one line) in a ".col" file as described in https://mac.sourceforge.net/
-# param tFile : the stream on the ".col" file
-# param cn : the CollectionNode to write in colFile
-def write_folder_line(tFile, cn: FolderNode):
-    iLevel = cn.depth - 1
-    for x in range(iLevel):
-        tFile.write(utils_ascii.TAB)
-
-    # Name(max.  250 characters)
-    tFile.write(cn.name)
-    tFile.write(utils_ascii.SOH)
-    # Size(kilobytes)
-    iSize = floor(cn.size / 1024)
-    tFile.write( str(iSize) )
-    tFile.write(utils_ascii.STX)
-    # Duration(seconds)
-    iDurationInSeconds = floor(cn.duration)
-    tFile.write( str(iDurationInSeconds))
-    tFile.write(utils_ascii.ETX)
-    # Subfolder count
-    tFile.write( str(cn.folderCount) )
-    tFile.write(utils_ascii.EOT)
-    # File count
-    tFile.write( str(cn.fileCount) )
-    tFile.write(utils_ascii.ENQ)
-
-    # new line
-    tFile.write(utils_ascii.NL)
-
-    # end of def write_folder
-
-# function write_volume
-# write a volume (one line) in a ".col" file as described in https://mac.sourceforge.net/
-# param tFile : the stream on the ".col" file
-# param vn : the VolumeNode to write in colFile
-def write_volume_line(tFile, vn: VolumeNode):
-
-    tFile.write(utils_ascii.TAB)
-    # Name(CD - Label and Path, if not Root)
-    tFile.write(vn.name)
-    tFile.write(utils_ascii.SOH)
-    # Size(kilobytes)
-    iSize = floor(vn.size / 1024)
-    tFile.write( str(iSize) )
-    tFile.write(utils_ascii.STX)
-    iDurationInSeconds = floor(vn.duration)
-    tFile.write( str(iDurationInSeconds))
-    tFile.write(utils_ascii.ETX)
-    #Folder count
-    tFile.write(  str(vn.folderCount))
-    tFile.write(utils_ascii.EOT)
-    # File count
-    tFile.write( str(vn.fileCount) )
-    tFile.write(utils_ascii.ENQ)
-    # TODO handle last change date
-    tFile.write("45641")
-    tFile.write(utils_ascii.ACK)
-    # Serial number of CD / HDD
-    # TODO handle serial number
-    tFile.write("-1832560112")
-    tFile.write(utils_ascii.BEL)
-    # Volume Type : \
-    #    1 - Removable
-    #    2 - Fixed(HDD)
-    #    3 - Remote(Network)
-    #    4 - CD - ROM
-    #    5 - RAM disk
-    #    6 - Audio CD
-    # TODO volume type
-    tFile.write("2")
-    tFile.write(utils_ascii.BS)
-
-    # new line
-    tFile.write(utils_ascii.NL)
-
-    # end of def write_volume
-
-# function write_collection
-# write a collection (one line) in a ".col" file as described in https://mac.sourceforge.net/
-# param colFile : the stream on the ".col" file
-# param collectionNode : the collectionNode to write in colFile
-def write_collection_line(colFile, collectionNode: CollectionNode):
-    colFile.write(utils_ascii.SOH)
-    iSize = floor(collectionNode.size / 1024)
-    colFile.write( str(iSize) )      # Size (kilobytes)
-    colFile.write(utils_ascii.STX)
-    fDuration = floor(collectionNode.duration)
-    colFile.write( str(fDuration) )        # Duration (seconds)
-    colFile.write(utils_ascii.ETX)
-    colFile.write( str(collectionNode.folderCount) )            # Volume count
-    colFile.write(utils_ascii.EOT)
-    colFile.write( str(collectionNode.fileCount) )          # File count
-    colFile.write(utils_ascii.ENQ)
-    # TODO handle last change date
-    colFile.write("45641")        # Date (last change)
-    colFile.write(utils_ascii.ACK)
-
-    # new line
-    colFile.write(utils_ascii.NL)
-
-    # end of def write_col
\ No newline at end of file
+##################################################################
+# How to write a audio file (mp3, flac) collection in a export file?
+#
+# This file gathers the functions to write the ".col" export file
+# * write_collection_line(colFile, collectionNode: CollectionNode)
+# * write_volume_line(tFile, vn: VolumeNode)
+# * write_folder_line(tFile, cn: FolderNode)
+# * write_file_line(tFile, fn: FileNode)
+# the lines are formatted from plain values by the format_*_line functions
+# so they can be written without a complete tree (see main_functions.stream_collection)
+# * col_name(name), a name as it is read back from the file
+# * class ColWriter, the buffered ".col" file stream, compressed or not, replaced atomically
+#
+# These methods are following the MAC col file description
+# see https://mac.sourceforge.net/
+##################################################################
+
+import utils_ascii
+import utils_format
+from utils_ascii import TAB, SOH, STX, ETX, EOT, ENQ, ACK, BEL, NAK, SYN, ETB, CAN, EM, SUB, ESC, FS, NL
+import io
+import os
+import utils_compress
+from math import floor
+from node_classes import CollectionNode, VolumeNode, FolderNode, FileNode
+
+# the MAC fields of the audio formats (duration sign, MPEG version, MPEG layer or None if the layer is the bitdepth),
+# by format code (see utils_format.FORMATS)
+__FILE_FORMATS = tuple(audioFormat[1:4] for audioFormat in utils_format.FORMATS)
+
+# private method one_line
+# Returns a text without its new lines (CR, LF), replaced by a space : a tag value (a comment...) or a name
+# with new lines would split its line of the ".col" file, which has no escape sequence
+def __one_line(text :str):
+    return text.replace("\r\n", " ").replace("\r", " ").replace("\n", " ")
+
+# function col_name
+# Returns a name as it is read back from a ".col" file : its new lines are spaces (see one_line), and the characters
+# the encoding has not are "?" if the file was written with encodingErrors="replace"
+# the real names of the folder entries are paired with the names read back by this form (see main_functions.rescan_folder)
+# param encoding : the encoding of the col file, COL_ENCODING if None
+def col_name(name :str, encoding :str = None):
+    if encoding is None:
+        encoding = COL_ENCODING
+    return __one_line(name).encode(encoding, "replace").decode(encoding, "replace")
+
+# end def col_name
+
+# function format_file_line
+# format a file (one line) of a ".col" file as described in https://mac.sourceforge.net/
+# the line is built in one step (one f-string), the format fields are the ones of the format code of the file
+# the new lines of the values are replaced by spaces (see one_line)
+# param iLevel : the amount of TAB before the name (the depth of the FileNode - 1)
+# param fn : the FileNode (or any object with the FileNode properties) to format
+# returns : the line as a string, new line included
+def format_file_line(iLevel :int, fn: FileNode):
+    name = fn.name
+    sDurationSign, sMpegVersion, sMpegLayer = __FILE_FORMATS[fn.fileFormat]
+    bitdepth = fn.bitdepth
+    if bitdepth is None:
+        sMpegLayer = "0"
+    elif sMpegLayer is None:
+        sMpegLayer = str(bitdepth)
+    # File name, Size(kilobytes), Duration(seconds), ... then the ID3 - tags, which can be empty
+    title, artist, album, track, year, comment, genre = fn.title, fn.artist, fn.album, fn.track, fn.year, fn.comment, fn.genre
+    line = (f"{TAB * iLevel}{name}{SOH}{floor(fn.size / 1024)}{STX}{sDurationSign}{floor(fn.duration)}{ETX}"
+            # Sample Rate(without last 0 - e.g. 4410)
+            f"{floor(fn.sampleRate / 10)}{EOT}"
+            # Kanal mode : Stereo = 1, Joint Stereo = 2, Dual Channel = 3, Mono = 4 (stereo else mono)
+            f"{'1' if fn.channels == 2 else '4'}{ENQ}{sMpegVersion}{ACK}{sMpegLayer}{BEL}{NAK}"
+            f"{'' if title is None else title}{SYN}{'' if artist is None else artist}{ETB}"
+            f"{'' if album is None else album}{CAN}{'' if track is None else track}{EM}"
+            f"{'' if year is None else year}{SUB}{'' if comment is None else comment}{ESC}"
+            f"{'' if genre is None else genre}{FS}")
+    # one scan of the line in the usual case, without new line in the values
+    if "\n" in line or "\r" in line:
+        line = __one_line(line)
+    return line + NL
+
+    # end def format_file_line
+
+# function write_fileTag
+# write a file (one line) in a ".col" file as described in https://mac.sourceforge.net/
+# param tFile : the stream on the ".col" file
+# param fn : the FileNode to write in colFile
+# param iDepth : the depth of the FileNode when it is known (see utils_visit.walk_collection), else it is read
+def write_file_line(tFile, fn: FileNode, iDepth :int = None):
+    tFile.write(format_file_line((fn.depth if iDepth is None else iDepth) - 1, fn))
+
+    # end def write_fileTag
+
+# the folder line template : Name(max.  250 characters), Size(kilobytes), Duration(seconds), Subfolder count, File count
+__FOLDER_LINE = ("{}" + utils_ascii.SOH + "{}" + utils_ascii.STX + "{}" + utils_ascii.ETX + "{}" + utils_ascii.EOT
+                 + "{}" + utils_ascii.ENQ + utils_ascii.NL)
+
+# function format_folder_line
+# format a folder (one line) of a ".col" file as described in https://mac.sourceforge.net/
+# param iLevel : the amount of TAB before the name (the depth of the FolderNode - 1)
+# param name, size, duration, folderCount, fileCount : the FolderNode values
+# returns : the line as a string, new line included
+def format_folder_line(iLevel :int, name :str, size, duration, folderCount :int, fileCount :int):
+    if "\n" in name or "\r" in name:
+        name = __one_line(name)
+    return utils_ascii.TAB * iLevel + __FOLDER_LINE.format(name, floor(size / 1024), floor(duration), folderCount, fileCount)
+
+    # end of def format_folder_line
+
+# function write_folder
+# write a folder (one line) in a ".col" file as described in https://mac.sourceforge.net/
+# param tFile : the stream on the ".col" file
+# param cn : the CollectionNode to write in colFile
+# param iDepth : the depth of the FolderNode when it is known (see utils_visit.walk_collection), else it is read
+def write_folder_line(tFile, cn: FolderNode, iDepth :int = None):
+    tFile.write(format_folder_line((cn.depth if iDepth is None else iDepth) - 1, cn.name, cn.size, cn.duration,
+                                   cn.folderCount, cn.fileCount))
+
+    # end of def write_folder
+
+# the volume line template : Name(CD - Label and Path, if not Root), Size(kilobytes), Duration(seconds), Folder count,
+# File count, Date (last change), Serial number of CD / HDD, Volume Type :
+#    1 - Removable
+#    2 - Fixed(HDD)
+#    3 - Remote(Network)
+#    4 - CD - ROM
+#    5 - RAM disk
+#    6 - Audio CD
+# TODO handle last change date, serial number and volume type
+__VOLUME_LINE = (utils_ascii.TAB + "{}" + utils_ascii.SOH + "{}" + utils_ascii.STX + "{}" + utils_ascii.ETX + "{}"
+                 + utils_ascii.EOT + "{}" + utils_ascii.ENQ + "45641" + utils_ascii.ACK + "-1832560112" + utils_ascii.BEL
+                 + "2" + utils_ascii.BS + utils_ascii.NL)
+
+# function format_volume_line
+# format a volume (one line) of a ".col" file as described in https://mac.sourceforge.net/
+# param name, size, duration, folderCount, fileCount : the VolumeNode values
+# returns : the line as a string, new line included
+def format_volume_line(name :str, size, duration, folderCount :int, fileCount :int):
+    if "\n" in name or "\r" in name:
+        name = __one_line(name)
+    return __VOLUME_LINE.format(name, floor(size / 1024), floor(duration), folderCount, fileCount)
+
+    # end of def format_volume_line
+
+# function write_volume
+# write a volume (one line) in a ".col" file as described in https://mac.sourceforge.net/
+# param tFile : the stream on the ".col" file
+# param vn : the VolumeNode to write in colFile
+def write_volume_line(tFile, vn: VolumeNode):
+    tFile.write(format_volume_line(vn.name, vn.size, vn.duration, vn.folderCount, vn.fileCount))
+
+    # end of def write_volume
+
+# the collection line template : Size (kilobytes), Duration (seconds), Volume count, File count, Date (last change)
+# TODO handle last change date
+__COLLECTION_LINE = (utils_ascii.SOH + "{}" + utils_ascii.STX + "{}" + utils_ascii.ETX + "{}" + utils_ascii.EOT + "{}"
+                     + utils_ascii.ENQ + "45641" + utils_ascii.ACK + utils_ascii.NL)
+
+# function format_collection_line
+# format a collection (one line) of a ".col" file as described in https://mac.sourceforge.net/
+# param size, duration, folderCount, fileCount : the CollectionNode values
+# returns : the line as a string, new line included
+def format_collection_line(size, duration, folderCount :int, fileCount :int):
+    return __COLLECTION_LINE.format(floor(size / 1024), floor(duration), folderCount, fileCount)
+
+    # end of def format_collection_line
+
+# function write_collection
+# write a collection (one line) in a ".col" file as described in https://mac.sourceforge.net/
+# param colFile : the stream on the ".col" file
+# param collectionNode : the collectionNode to write in colFile
+def write_collection_line(colFile, collectionNode: CollectionNode):
+    colFile.write(format_collection_line(collectionNode.size, collectionNode.duration,
+                                         collectionNode.folderCount, collectionNode.fileCount))
+
+    # end of def write_col
+
+# the encoding of the ".col" file : the Windows code page MAC reads, whatever the platform writing the file
+# it can be changed with the encoding parameter of ColWriter, write_collection, stream_collection and utils_reader
+COL_ENCODING = "cp1252"
+# the handling of the characters the encoding has not (see codecs error handlers) : the writing fails on them
+# (see ColWriter.flush), the ".col" file never holds a name it can not give back, which a rescan could not find
+# a library with such names is written with another encoding (encoding="utf-8") or handler (encodingErrors="replace")
+COL_ENCODING_ERRORS = "strict"
+
+"""
+Buffered stream on a ".col" file : the lines are gathered in memory
+and written in large chunks, instead of one write call per field
+the chunks go through a streaming compressor when the file is compressed (see utils_compress)
+the file is written in a temporary file next to it, which replaces it once closed,
+so a reader never sees a partial file and an existing file is replaced (abort drops the temporary file)
+@attribute encoding : the encoding of the file
+@attribute encodingErrors : the error handler of the encoding
+@attribute compression : the name of the compression in utils_compress.COMPRESSIONS, None if the file is not compressed
+"""
+class ColWriter:
+
+    # param encoding : the encoding of the file, COL_ENCODING if None
+    # param compression : a name of utils_compress.COMPRESSIONS, utils_compress.COMPRESSION_NONE,
+    #                     or None to choose it by the extension of sColFilePath (".gz", ".bz2", ".xz")
+    # param encodingErrors : the error handler of the encoding, COL_ENCODING_ERRORS if None
+    def __init__(self, sColFilePath :str, encoding :str = None, iBufferSize :int = 1 << 20, compression :str = None,
+                 encodingErrors :str = None):
+        self.encoding = COL_ENCODING if encoding is None else encoding
+        self.encodingErrors = COL_ENCODING_ERRORS if encodingErrors is None else encodingErrors
+        self.compression = utils_compress.resolve_compression(sColFilePath, compression)
+        self._path = sColFilePath
+        self._tempPath = sColFilePath + "." + str(os.getpid()) + ".tmp"
+        self._raw = open(self._tempPath, "wb")
+        stream = self._raw if self.compression is None else utils_compress.open_write(self._raw, self.compression)
+        # the new lines are translated like open() does
+        self._file = io.TextIOWrapper(stream, encoding=self.encoding, errors=self.encodingErrors)
+        self._buffer = []
+        self._length = 0
+        self._bufferSize = iBufferSize
+
+    # function write
+    # Adds text to the buffer, the buffer is flushed once it is larger than the buffer size
+    def write(self, text :str):
+        self._buffer.append(text)
+        self._length += len(text)
+        if self._length >= self._bufferSize:
+            self.flush()
+
+    # function flush
+    # Writes the buffer in the file as one chunk
+    # a character the encoding has not raises a ValueError giving its line, the file is then aborted (see __exit__)
+    def flush(self):
+        if self._buffer:
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._length = 0
+            try:
+                self._file.write(text)
+            except UnicodeEncodeError as error:
+                # the name of the line, the characters up to the first field
+                iEnd = text.find(NL, error.start)
+                line = text[text.rfind(NL, 0, error.start) + 1:len(text) if iEnd < 0 else iEnd].lstrip(TAB)
+                message = ("[ERROR][ColWriter] the line of [" + line.split(SOH, 1)[0] + "] can not be written in "
+                           + self.encoding + ", write the file with another encoding (utf-8) or encodingErrors")
+                print(message)
+                raise ValueError(message) from error
+
+    # function close
+    # Flushes the buffer, ends the compressed data and replaces the col file with the written one
+    def close(self):
+        try:
+            self.flush()
+        except BaseException:
+            # the last chunk failed, the col file is left as it was
+            self.abort()
+            raise
+        self._file.close()
+        self._raw.close()
+        os.replace(self._tempPath, self._path)
+
+    # function abort
+    # Closes and deletes the written file, the col file is left as it was
+    def abort(self):
+        self._buffer = []
+        try:
+            self._file.close()
+        finally:
+            self._raw.close()
+            os.remove(self._tempPath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
+
+# end class ColWriter